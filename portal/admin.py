@@ -1,7 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
-from .models import Attendance, FeeRecord, Homework, Notice, ParentProfile, StudentProfile, User
+from .models import (
+    Attendance,
+    AttendanceDailySummary,
+    FeeRecord,
+    Homework,
+    Notice,
+    ParentNotification,
+    ParentProfile,
+    SchoolClass,
+    Section,
+    StudentProfile,
+    User,
+)
 
 
 @admin.register(User)
@@ -11,9 +23,23 @@ class UserAdmin(DjangoUserAdmin):
     list_filter = ("role", "is_staff", "is_superuser", "is_active")
 
 
+class SectionInline(admin.TabularInline):
+    model = Section
+    extra = 1
+
+
+@admin.register(SchoolClass)
+class SchoolClassAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
+    inlines = [SectionInline]
+
+
 @admin.register(StudentProfile)
 class StudentProfileAdmin(admin.ModelAdmin):
-    list_display = ("admission_no", "user", "class_name", "section", "parent")
+    list_display = ("admission_no", "user", "section", "parent")
+    list_filter = ("school_class",)
+    list_select_related = ("user", "section__school_class", "parent__user")
     search_fields = ("admission_no", "user__first_name", "user__last_name", "user__username")
 
 
@@ -30,6 +56,21 @@ class AttendanceAdmin(admin.ModelAdmin):
     search_fields = ("student__admission_no", "student__user__first_name", "student__user__last_name")
 
 
+@admin.register(AttendanceDailySummary)
+class AttendanceDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ("date", "section", "enrolled", "present", "qr_count", "manual_count")
+    list_filter = ("date", "section__school_class")
+    list_select_related = ("section__school_class",)
+
+
+@admin.register(ParentNotification)
+class ParentNotificationAdmin(admin.ModelAdmin):
+    list_display = ("parent", "kind", "date", "status", "attempts", "sent_at", "last_error")
+    list_filter = ("status", "kind", "date")
+    list_select_related = ("parent__user",)
+    raw_id_fields = ("parent",)
+
+
 @admin.register(Notice)
 class NoticeAdmin(admin.ModelAdmin):
     list_display = ("title", "audience", "created_by", "created_at")
@@ -38,8 +79,8 @@ class NoticeAdmin(admin.ModelAdmin):
 
 @admin.register(Homework)
 class HomeworkAdmin(admin.ModelAdmin):
-    list_display = ("title", "class_name", "subject", "due_date", "created_by")
-    list_filter = ("class_name", "due_date")
+    list_display = ("title", "school_class", "subject", "due_date", "created_by")
+    list_filter = ("school_class", "due_date")
 
 
 @admin.register(FeeRecord)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PortalConfig(AppConfig):
     name = 'portal'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,222 @@
+"""Hot/cold split of attendance: closed academic years leave the live table.
+
+``archive_year`` packs every Attendance row of one academic year into one
+``AttendanceArchive`` row per student (a day bitmap, a manual-mark bitmap
+and the minute each mark was made) and deletes the live rows, so the
+Attendance table only ever holds the current year and the scan path stays
+fast. Marked-by and the seconds of ``marked_at`` are not kept.
+
+History pages, exports and registers read both: :func:`archived_history`
+and :func:`archived_marks` return :class:`ArchivedAttendance` values shaped
+like Attendance rows, which the callers merge with their live queries.
+:func:`archive_boundary` (cached per archive version) lets them skip the
+archive query when the requested range is entirely live.
+"""
+import struct
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Attendance, AttendanceArchive, AttendanceMethod
+from .versions import bump_version_on_commit, current_version
+
+
+ARCHIVE_VERSION = "attendance-archive"
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_READ_CHUNK_SIZE = 5000
+
+
+class ArchivedAttendance(namedtuple("ArchivedAttendance", ["student_id", "date", "marked_at", "method"])):
+    """An archived mark with the attributes templates and history items read from Attendance."""
+
+    __slots__ = ()
+    # Archived marks sort after live rows of the same day in ("-date", "-id") order.
+    id = 0
+
+    def get_method_display(self):
+        return AttendanceMethod(self.method).label
+
+
+def academic_year_start(day):
+    month = settings.ACADEMIC_YEAR_START_MONTH
+    return date(day.year if day.month >= month else day.year - 1, month, 1)
+
+
+def next_academic_year(year_start):
+    return year_start.replace(year=year_start.year + 1)
+
+
+def _has_bit(bitmap, offset):
+    return bitmap[offset >> 3] & (1 << (offset & 7))
+
+
+def _set_bit(bitmap, offset):
+    bitmap[offset >> 3] |= 1 << (offset & 7)
+
+
+def pack_marks(archive, marks):
+    """Store ``marks`` (ArchivedAttendance, sorted by date) on ``archive``; a second mark on a day is dropped."""
+    year_days = (next_academic_year(archive.year_start) - archive.year_start).days
+    days = bytearray((year_days + 7) // 8)
+    manual_days = bytearray(len(days))
+    minutes = []
+    for mark in marks:
+        offset = (mark.date - archive.year_start).days
+        if _has_bit(days, offset):
+            continue
+        _set_bit(days, offset)
+        if mark.method == AttendanceMethod.MANUAL:
+            _set_bit(manual_days, offset)
+        local = timezone.localtime(mark.marked_at)
+        minutes.append(local.hour * 60 + local.minute)
+    archive.days = bytes(days)
+    archive.manual_days = bytes(manual_days)
+    archive.times = struct.pack(f">{len(minutes)}H", *minutes)
+    archive.present = len(minutes)
+    return archive
+
+
+def unpack_marks(archive, start=None, end=None):
+    """The archive's marks in date order, optionally only those within ``[start, end]``."""
+    days = bytes(archive.days)
+    manual_days = bytes(archive.manual_days)
+    minutes = struct.unpack(f">{archive.present}H", bytes(archive.times))
+    marks = []
+    position = 0
+    for offset in range(len(days) * 8):
+        if not _has_bit(days, offset):
+            continue
+        day = archive.year_start + timedelta(days=offset)
+        minute = minutes[position]
+        position += 1
+        if (start is not None and day < start) or (end is not None and day > end):
+            continue
+        marked_at = timezone.make_aware(datetime.combine(day, time(minute // 60, minute % 60)))
+        method = AttendanceMethod.MANUAL if _has_bit(manual_days, offset) else AttendanceMethod.QR
+        marks.append(ArchivedAttendance(archive.student_id, day, marked_at, method))
+    return marks
+
+
+def archive_boundary():
+    """First day after the newest archived year, or ``None`` while nothing is archived."""
+    key = f"archive-boundary:{current_version(ARCHIVE_VERSION)}"
+    cached = cache.get(key)
+    if cached is None:
+        newest = AttendanceArchive.objects.aggregate(newest=Max("year_start"))["newest"]
+        cached = (next_academic_year(newest) if newest else None,)
+        cache.set(key, cached, None)
+    return cached[0]
+
+
+def archived_history(student, before=None, limit=20):
+    """Up to ``limit`` archived marks of ``student`` in ("-date", "-id") order, after the ``before`` cursor values."""
+    archives = AttendanceArchive.objects.filter(student=student).order_by("-year_start")
+    before_date = None
+    if before is not None:
+        before_date = date.fromisoformat(before[0])
+        archives = archives.filter(year_start__lte=before_date)
+
+    marks = []
+    for archive in archives:
+        for mark in reversed(unpack_marks(archive)):
+            # (date, 0) comes after the cursor when the date is earlier, or equal with a live id above 0.
+            if before_date is not None and (mark.date > before_date or (mark.date == before_date and before[1] <= 0)):
+                continue
+            marks.append(mark)
+            if len(marks) == limit:
+                return marks
+    return marks
+
+
+def archived_marks(start, end, archives):
+    """Marks from ``archives`` (an AttendanceArchive queryset) within ``[start, end]``, in date order.
+
+    One academic year is loaded at a time and walked day by day, so memory
+    stays at one year's packed rows however long the range.
+    """
+    boundary = archive_boundary()
+    if boundary is None or start >= boundary:
+        return
+    year_start = academic_year_start(start)
+    while year_start <= end and year_start < boundary:
+        year = list(archives.filter(year_start=year_start).order_by("student_id"))
+        unpacked = [unpack_marks(archive, start, end) for archive in year]
+        positions = [0] * len(unpacked)
+        day = max(start, year_start)
+        last_day = min(end, next_academic_year(year_start) - timedelta(days=1))
+        while day <= last_day:
+            for index, marks in enumerate(unpacked):
+                position = positions[index]
+                if position < len(marks) and marks[position].date == day:
+                    positions[index] = position + 1
+                    yield marks[position]
+            day += timedelta(days=1)
+        year_start = next_academic_year(year_start)
+
+
+def _delete_live_rows(year_start, year_end):
+    # QuerySet.delete() would send post_delete per row, which decrements the daily summary;
+    # the archived days still count there.
+    quote = connection.ops.quote_name
+    table = quote(Attendance._meta.db_table)
+    column = quote(Attendance._meta.get_field("date").column)
+    adapt = connection.ops.adapt_datefield_value
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {column} >= %s AND {column} < %s", [adapt(year_start), adapt(year_end)]
+        )
+        return cursor.rowcount
+
+
+def archive_year(year_start):
+    """Move the live Attendance rows of the academic year starting ``year_start`` into the archive.
+
+    Rows added to an already archived year (late corrections) are merged into
+    its archive rows. Returns the number of live rows moved.
+    """
+    year_end = next_academic_year(year_start)
+    with transaction.atomic():
+        existing = {archive.student_id: archive for archive in AttendanceArchive.objects.filter(year_start=year_start)}
+        rows = (
+            Attendance.objects.filter(date__gte=year_start, date__lt=year_end)
+            .order_by("student_id", "date", "id")
+            .values_list("student_id", "date", "marked_at", "method")
+            .iterator(chunk_size=ARCHIVE_READ_CHUNK_SIZE)
+        )
+        created = []
+        updated = []
+        for student_id, student_rows in groupby(rows, key=itemgetter(0)):
+            marks = [ArchivedAttendance(*row) for row in student_rows]
+            archive = existing.get(student_id)
+            if archive is None:
+                created.append(pack_marks(AttendanceArchive(student_id=student_id, year_start=year_start), marks))
+            else:
+                merged = sorted(unpack_marks(archive) + marks, key=lambda mark: mark.date)
+                updated.append(pack_marks(archive, merged))
+        AttendanceArchive.objects.bulk_create(created, batch_size=ARCHIVE_BATCH_SIZE)
+        AttendanceArchive.objects.bulk_update(
+            updated, ["present", "days", "manual_days", "times"], batch_size=ARCHIVE_BATCH_SIZE
+        )
+        moved = _delete_live_rows(year_start, year_end)
+        bump_version_on_commit(ARCHIVE_VERSION)
+    return moved
+
+
+def closed_years(before):
+    """Start dates of the academic years with live rows that end on or before ``before``."""
+    oldest = Attendance.objects.order_by("date").values_list("date", flat=True).first()
+    if oldest is None:
+        return []
+    years = []
+    year_start = academic_year_start(oldest)
+    while next_academic_year(year_start) <= before:
+        years.append(year_start)
+        year_start = next_academic_year(year_start)
+    return years
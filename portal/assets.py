@@ -0,0 +1,13 @@
+"""Third-party browser assets, vendored under ``static/vendor/`` and served by the static pipeline."""
+from django.templatetags.static import static
+
+
+HTML5_QRCODE_VERSION = "2.3.8"
+HTML5_QRCODE_STATIC = f"vendor/html5-qrcode-{HTML5_QRCODE_VERSION}.min.js"
+# Where the vendored copy comes from; pages never load it from here.
+HTML5_QRCODE_URL = f"https://unpkg.com/html5-qrcode@{HTML5_QRCODE_VERSION}/html5-qrcode.min.js"
+
+
+def scanner_library_url():
+    """Hashed URL of the vendored ``html5-qrcode`` (see ``portal.checks.check_vendored_assets``)."""
+    return static(HTML5_QRCODE_STATIC)
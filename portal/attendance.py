@@ -0,0 +1,318 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .metrics import metrics
+from .models import Attendance, AttendanceMethod
+from .qr import resolve_student_id_from_qr
+from .roster import roster_cache
+from .summaries import adjust_attendance_summary
+from .versions import bump_version_on_commit, current_version
+from .writebehind import attendance_writer
+
+
+ATTENDANCE_VERSION = "attendance"
+MAX_SCAN_BATCH_SIZE = 200
+# Client scan timestamps older than this are treated as clock skew and replaced by server time.
+MAX_SCAN_CLOCK_SKEW = timedelta(minutes=10)
+
+
+class DailyPresence:
+    """Per-process record of who is already marked today, so repeat scans skip the database.
+
+    Seeded with one query per day from today's Attendance rows and updated on
+    every mark. A student missing here may still have been marked by another
+    worker, so a miss always falls through to the database. Deleting
+    attendance bumps the ``attendance`` version stamp, which forces a reseed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._version = None
+        self._marked = {}
+
+    def _ensure_current(self, day):
+        version = current_version(ATTENDANCE_VERSION)
+        if self._day == day and self._version == version:
+            return
+        with self._lock:
+            if self._day == day and self._version == version:
+                return
+            self._marked = dict(Attendance.objects.filter(date=day).values_list("student_id", "marked_at"))
+            self._day = day
+            self._version = version
+
+    def lookup(self, student_id, day):
+        """Return when ``student_id`` was marked on ``day``, or ``None`` if unknown to this process."""
+        self._ensure_current(day)
+        return self._marked.get(student_id)
+
+    def lookup_many(self, student_ids, day):
+        """``{student_id: marked_at}`` for the ids this process knows were marked on ``day``.
+
+        Checks the version stamp once for the whole batch.
+        """
+        self._ensure_current(day)
+        marked = self._marked
+        return {student_id: marked[student_id] for student_id in student_ids if student_id in marked}
+
+    def record(self, student_id, day, marked_at):
+        if self._day == day:
+            self._marked.setdefault(student_id, marked_at)
+
+    def invalidate(self):
+        with self._lock:
+            self._day = None
+        bump_version_on_commit(ATTENDANCE_VERSION)
+
+
+daily_presence = DailyPresence()
+
+
+def student_display_name(user):
+    return user.get_full_name() or user.username
+
+
+def parse_scanned_at(value, now):
+    try:
+        scanned_at = datetime.fromtimestamp(float(value) / 1000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+
+    if scanned_at > now or now - scanned_at > MAX_SCAN_CLOCK_SKEW:
+        return now
+    if timezone.localdate(scanned_at) != timezone.localdate(now):
+        return now
+    return scanned_at
+
+
+def _invalid_result(message):
+    return {"ok": False, "status": "invalid", "message": message}
+
+
+def _already_marked_result(marked_at):
+    marked_time = timezone.localtime(marked_at).strftime("%I:%M %p")
+    return {"status": "already_marked", "message": f"Already marked today at {marked_time}"}
+
+
+def mark_attendance(student_id, day, method, marked_by):
+    """Mark one student present on ``day``, returning ``(marked_at, created)``.
+
+    With ``ATTENDANCE_WRITE_BEHIND`` the new row is journalled and acknowledged
+    before it reaches the Attendance table.
+    """
+    marked_at = daily_presence.lookup(student_id, day)
+    if marked_at is not None:
+        return marked_at, False
+
+    if settings.ATTENDANCE_WRITE_BEHIND:
+        marked_at = (
+            Attendance.objects.filter(student_id=student_id, date=day).values_list("marked_at", flat=True).first()
+        )
+        created = marked_at is None
+        if created:
+            marked_at = timezone.now()
+            attendance_writer.enqueue(
+                Attendance(student_id=student_id, date=day, marked_at=marked_at, method=method, marked_by=marked_by)
+            )
+    else:
+        attendance, created = Attendance.objects.get_or_create(
+            student_id=student_id,
+            date=day,
+            defaults={"method": method, "marked_by": marked_by},
+        )
+        marked_at = attendance.marked_at
+
+    daily_presence.record(student_id, day, marked_at)
+    return marked_at, created
+
+
+async def amark_attendance(student_id, day, method, marked_by):
+    """Async :func:`mark_attendance` for the scan view under ASGI.
+
+    The presence lookup can reseed from the database and the write-behind
+    journal fsyncs, so both run off the event loop like the ORM calls do.
+    """
+    marked_at = await sync_to_async(daily_presence.lookup)(student_id, day)
+    if marked_at is not None:
+        return marked_at, False
+
+    if settings.ATTENDANCE_WRITE_BEHIND:
+        marked_at = await (
+            Attendance.objects.filter(student_id=student_id, date=day).values_list("marked_at", flat=True).afirst()
+        )
+        created = marked_at is None
+        if created:
+            marked_at = timezone.now()
+            await sync_to_async(attendance_writer.enqueue)(
+                Attendance(student_id=student_id, date=day, marked_at=marked_at, method=method, marked_by=marked_by)
+            )
+    else:
+        attendance, created = await Attendance.objects.aget_or_create(
+            student_id=student_id,
+            date=day,
+            defaults={"method": method, "marked_by": marked_by},
+        )
+        marked_at = attendance.marked_at
+
+    daily_presence.record(student_id, day, marked_at)
+    return marked_at, created
+
+
+def mark_qr_batch(scans, marked_by):
+    """Verify and mark a burst of QR scans, returning one result dict per scan in input order."""
+    now = timezone.now()
+    today = timezone.localdate(now)
+    results = []
+    pending = []
+
+    for scan in scans:
+        if not isinstance(scan, dict):
+            results.append(_invalid_result("QR payload is malformed."))
+            continue
+        try:
+            student_id = resolve_student_id_from_qr(scan.get("qr_data", ""), today)
+        except signing.BadSignature:
+            metrics.invalid_signatures.inc()
+            results.append(_invalid_result("QR is invalid or tampered."))
+            continue
+        except ValueError:
+            results.append(_invalid_result("QR payload is malformed."))
+            continue
+
+        result = {"ok": True}
+        results.append(result)
+        pending.append((result, student_id, parse_scanned_at(scan.get("scanned_at"), now)))
+
+    if not pending:
+        return results
+
+    students = roster_cache.get_many({student_id for _, student_id, _ in pending})
+    marked = daily_presence.lookup_many(students, today)
+    unknown_ids = students.keys() - marked.keys()
+    if unknown_ids:
+        marked.update(
+            Attendance.objects.filter(date=today, student_id__in=unknown_ids).values_list("student_id", "marked_at")
+        )
+
+    new_rows = []
+    for result, student_id, scanned_at in pending:
+        student = students.get(student_id)
+        if student is None:
+            result.update(_invalid_result("Student not found."))
+            continue
+
+        result["student"] = student.admission_no
+        marked_at = marked.get(student_id)
+        if marked_at is None:
+            marked[student_id] = scanned_at
+            attendance = Attendance(
+                student_id=student_id,
+                date=today,
+                marked_at=scanned_at,
+                method=AttendanceMethod.QR,
+                marked_by=marked_by,
+            )
+            new_rows.append((result, attendance))
+            result["status"] = "marked"
+            result["message"] = f"Attendance marked for {student.display_name}"
+        else:
+            result.update(_already_marked_result(marked_at))
+
+    if new_rows and settings.ATTENDANCE_WRITE_BEHIND:
+        attendance_writer.enqueue_many([attendance for _, attendance in new_rows])
+    elif new_rows:
+        try:
+            with transaction.atomic():
+                created = Attendance.objects.bulk_create([attendance for _, attendance in new_rows])
+                adjust_attendance_summary(today, created)
+        except IntegrityError:
+            # Another scanner marked one of these students since the SELECT above; fall back to
+            # get_or_create per row so each result reflects what is actually stored.
+            for result, attendance in new_rows:
+                stored, created = Attendance.objects.get_or_create(
+                    student_id=attendance.student_id,
+                    date=today,
+                    defaults={"marked_at": attendance.marked_at, "method": attendance.method, "marked_by": marked_by},
+                )
+                if not created:
+                    marked[attendance.student_id] = stored.marked_at
+                    result.update(_already_marked_result(stored.marked_at))
+
+    for student_id, marked_at in marked.items():
+        daily_presence.record(student_id, today, marked_at)
+    return results
+
+
+MAX_FEED_ROWS = 200
+
+
+def attendance_feed_row(attendance):
+    student = attendance.student
+    return {
+        "id": attendance.id,
+        "student": student.admission_no,
+        "name": student_display_name(student.user),
+        "time": timezone.localtime(attendance.marked_at).strftime("%H:%M:%S"),
+        "method": attendance.get_method_display(),
+    }
+
+
+def attendance_feed_since(day, after_id, limit=MAX_FEED_ROWS):
+    """Rows marked on ``day`` with an id above the client's cursor, oldest first.
+
+    Ids are a safe cursor on SQLite because writers are serialized, so a row
+    with a lower id can never become visible after a higher one.
+    """
+    rows = (
+        Attendance.objects.select_related("student", "student__user")
+        .filter(date=day, id__gt=after_id)
+        .order_by("id")[:limit]
+    )
+    return [attendance_feed_row(attendance) for attendance in rows]
+
+
+ROSTER_SNAPSHOT_FIELDS = ("id", "admission_no", "name", "class_name", "section", "present")
+
+
+def roster_snapshot_version(day, roster_version):
+    """Short token that changes with the date, any student record, or deleted attendance."""
+    key = f"{day.isoformat()}|{roster_version}|{current_version(ATTENDANCE_VERSION)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def roster_snapshot(day, since=None, after_id=0):
+    """Every student with a present-on-``day`` flag, for scanner devices to cache.
+
+    Students are ``ROSTER_SNAPSHOT_FIELDS`` arrays rather than objects. A
+    client whose ``since`` still matches the current version only gets the
+    ids of students marked after ``after_id``; ``cursor`` is the id to send
+    next time.
+    """
+    roster_version, rows = roster_cache.snapshot()
+    version = roster_snapshot_version(day, roster_version)
+    delta = since == version
+    marks = Attendance.objects.filter(date=day)
+    if delta:
+        marks = marks.filter(id__gt=after_id)
+    marks = list(marks.values_list("id", "student_id").order_by())
+    present = {student_id for _, student_id in marks}
+    snapshot = {
+        "date": day.isoformat(),
+        "version": version,
+        "cursor": max((pk for pk, _ in marks), default=after_id if delta else 0),
+        "delta": delta,
+    }
+    if delta:
+        snapshot["present"] = sorted(present)
+    else:
+        snapshot["fields"] = ROSTER_SNAPSHOT_FIELDS
+        snapshot["students"] = [[*row, int(row[0] in present)] for row in rows]
+    return snapshot
@@ -0,0 +1,255 @@
+"""View-level benchmarks: every URL in ``portal.urls`` requested as the right role.
+
+Each request is timed with the test client and its SQL queries counted.
+Results are plain dicts so they can be saved as JSON and compared against
+a stored baseline by the ``benchmark_views`` command.
+"""
+import json
+import math
+import platform
+import statistics
+import time
+from dataclasses import dataclass, field
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Attendance, ParentProfile, StudentProfile, User, UserRole
+from .qr import (
+    build_compact_qr_token,
+    build_student_qr_payload,
+    build_student_qr_token,
+    qr_version,
+    resolve_student_id_from_qr,
+)
+from .urls import urlpatterns
+
+
+# Latency regressions smaller than this are treated as noise.
+LATENCY_NOISE_MS = 2.0
+
+
+@dataclass
+class BenchmarkRequest:
+    role: str
+    method: str = "get"
+    kwargs: dict = field(default_factory=dict)
+    data: dict = field(default_factory=dict)
+    json_body: object = None
+    # Views that log the client out need a fresh login before every run.
+    relogin: bool = False
+
+
+class _Rollback(Exception):
+    pass
+
+
+def benchmark_fixtures():
+    """Pick one admin, one student with a parent, and that parent from the current database."""
+    admin = User.objects.filter(role=UserRole.ADMIN).order_by("id").first() or User.objects.filter(
+        is_superuser=True
+    ).order_by("id").first()
+    student = (
+        StudentProfile.objects.select_related("user", "parent__user")
+        .filter(parent__isnull=False)
+        .order_by("id")
+        .first()
+    )
+    if admin is None or student is None:
+        raise ValueError("The database needs an admin and a student linked to a parent; run seed_school first.")
+    return {"admin": admin, "student": student, "parent": ParentProfile.objects.get(pk=student.parent_id)}
+
+
+def benchmark_requests(fixtures):
+    student = fixtures["student"]
+    today = timezone.localdate()
+    qr_payload = build_student_qr_payload(student)
+    return {
+        "login": BenchmarkRequest(role="anonymous"),
+        "logout": BenchmarkRequest(role="admin", relogin=True),
+        "role_redirect": BenchmarkRequest(role="student"),
+        "admin_dashboard": BenchmarkRequest(role="admin"),
+        "manage_students": BenchmarkRequest(role="admin"),
+        "lookup_students": BenchmarkRequest(role="admin", data={"q": student.user.first_name[:3]}),
+        "lookup_parents": BenchmarkRequest(role="admin", data={"q": fixtures["parent"].user.first_name[:3]}),
+        "manage_parents": BenchmarkRequest(role="admin"),
+        "manage_academics": BenchmarkRequest(role="admin"),
+        "manage_fees": BenchmarkRequest(role="admin"),
+        "qr_cards": BenchmarkRequest(role="admin"),
+        "class_register": BenchmarkRequest(
+            role="admin", data={"school_class": student.school_class_id, "month": today.strftime("%Y-%m")}
+        ),
+        "exports": BenchmarkRequest(role="admin"),
+        "export_attendance": BenchmarkRequest(
+            role="admin",
+            data={
+                "start": today.replace(day=1).isoformat(),
+                "end": today.isoformat(),
+                "school_class": student.school_class_id,
+                "format": "csv",
+            },
+        ),
+        "export_fees": BenchmarkRequest(role="admin", data={"status": "unpaid", "format": "csv"}),
+        "attendance_scanner": BenchmarkRequest(role="admin"),
+        "attendance_feed": BenchmarkRequest(role="admin", data={"after": 0}),
+        "scanner_roster": BenchmarkRequest(role="admin"),
+        "manual_attendance_mark": BenchmarkRequest(role="admin", method="post", data={"student_id": student.id}),
+        "scan_qr_attendance": BenchmarkRequest(role="admin", method="post", json_body={"qr_data": qr_payload}),
+        # Under the test client this measures the async view driven from a sync caller, as WSGI would.
+        "scan_qr_attendance_async": BenchmarkRequest(role="admin", method="post", json_body={"qr_data": qr_payload}),
+        "scan_qr_attendance_batch": BenchmarkRequest(
+            role="admin", method="post", json_body={"scans": [{"qr_data": qr_payload}]}
+        ),
+        "scan_qr_attendance_batch_async": BenchmarkRequest(
+            role="admin", method="post", json_body={"scans": [{"qr_data": qr_payload}]}
+        ),
+        "roster_cache_stats": BenchmarkRequest(role="admin"),
+        "student_dashboard": BenchmarkRequest(role="student"),
+        "history_page": BenchmarkRequest(role="parent", kwargs={"kind": "attendance"}, data={"student": student.id}),
+        "student_qr_image": BenchmarkRequest(role="student", kwargs={"token": build_student_qr_token(student.id)}),
+        "parent_dashboard": BenchmarkRequest(role="parent"),
+        "metrics": BenchmarkRequest(role="admin"),
+    }
+
+
+def url_names():
+    return [pattern.name for pattern in urlpatterns if pattern.name]
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _run_one(client, user, name, request):
+    if request.relogin:
+        client.force_login(user)
+    url = reverse(name, kwargs=request.kwargs)
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        if request.method == "post" and request.json_body is not None:
+            response = client.post(url, data=json.dumps(request.json_body), content_type="application/json")
+        else:
+            response = getattr(client, request.method)(url, data=request.data)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    return (time.perf_counter() - started) * 1000, len(queries), response.status_code
+
+
+def run_benchmarks(iterations=20, warmup=2, names=None):
+    """Time every URL ``iterations`` times after ``warmup`` untimed runs.
+
+    Everything runs inside one transaction that is rolled back, so the
+    attendance marks made by the scan views do not pile up in the database.
+    """
+    fixtures = benchmark_fixtures()
+    requests = benchmark_requests(fixtures)
+    missing = sorted(set(url_names()) - set(requests))
+    if missing:
+        raise ValueError(f"No benchmark defined for: {', '.join(missing)}")
+
+    clients = {"anonymous": Client()}
+    for role in ("admin", "student", "parent"):
+        user = fixtures[role] if role == "admin" else fixtures[role].user
+        clients[role] = Client()
+        clients[role].force_login(user)
+    users = {"admin": fixtures["admin"], "student": fixtures["student"].user, "parent": fixtures["parent"].user}
+
+    results = {}
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]), transaction.atomic():
+            for name in names or url_names():
+                request = requests[name]
+                user = users.get(request.role)
+                # A client that gets logged out must not be shared with the other URLs for its role.
+                client = Client() if request.relogin else clients[request.role]
+                for _ in range(warmup):
+                    _run_one(client, user, name, request)
+                timings = []
+                query_counts = []
+                for _ in range(iterations):
+                    elapsed, query_count, status = _run_one(client, user, name, request)
+                    timings.append(elapsed)
+                    query_counts.append(query_count)
+                results[name] = {
+                    "role": request.role,
+                    "status": status,
+                    "p50_ms": round(statistics.median(timings), 3),
+                    "p95_ms": round(_percentile(timings, 0.95), 3),
+                    "queries": max(query_counts),
+                }
+            raise _Rollback
+    except _Rollback:
+        pass
+
+    return {"meta": benchmark_meta(iterations), "results": results}
+
+
+def benchmark_meta(iterations):
+    return {
+        "created": timezone.now().isoformat(timespec="seconds"),
+        "iterations": iterations,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "students": StudentProfile.objects.count(),
+        "attendance": Attendance.objects.count(),
+    }
+
+
+def compare_to_baseline(current, baseline, latency_tolerance=0.25):
+    """Return ``(name, message)`` pairs for every URL slower or chattier than the baseline."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append((name, f"queries {before['queries']} -> {result['queries']}"))
+        limit = before["p95_ms"] * (1 + latency_tolerance)
+        if result["p95_ms"] > limit and result["p95_ms"] - before["p95_ms"] > LATENCY_NOISE_MS:
+            regressions.append((name, f"p95 {before['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms"))
+        if result["status"] != before["status"]:
+            regressions.append((name, f"status {before['status']} -> {result['status']}"))
+    return regressions
+
+
+def qr_token_samples(student_id=123456):
+    """One payload per QR format for the same student, as they appear on printed cards."""
+    today = timezone.localdate()
+    legacy_token = build_student_qr_token(student_id)
+    legacy_json = json.dumps(
+        {"token": legacy_token, "admission_no": "ADM-2025-00042", "name": "Firstname Middlename Lastname"},
+        separators=(",", ":"),
+    )
+    return {
+        "legacy_json": legacy_json,
+        "legacy_token": legacy_token,
+        "compact": build_compact_qr_token(student_id),
+        "compact_window": build_compact_qr_token(student_id, today, today.replace(year=today.year + 1)),
+    }
+
+
+def run_qr_token_benchmarks(iterations=20000):
+    """Time ``resolve_student_id_from_qr`` (decode and verify) on each QR format."""
+    today = timezone.localdate()
+    results = {}
+    for name, payload in qr_token_samples().items():
+        resolve_student_id_from_qr(payload, today)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            resolve_student_id_from_qr(payload, today)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            "chars": len(payload),
+            "qr_version": qr_version(payload),
+            "us_per_verify": round(elapsed / iterations * 1_000_000, 3),
+            "verifies_per_second": round(iterations / elapsed),
+        }
+    return results
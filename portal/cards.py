@@ -0,0 +1,150 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from itertools import groupby
+
+from django.conf import settings
+from django.utils.text import slugify
+from PIL import Image, ImageDraw, ImageFont
+
+from .files import write_atomic
+from .models import StudentProfile
+from .qr import build_student_qr_payload, render_qr_png
+
+
+# A4 at 150 dpi, 2 x 4 cards per sheet.
+SHEET_SIZE = (1240, 1754)
+CARD_SIZE = (600, 400)
+CARDS_PER_ROW = 2
+CARDS_PER_SHEET = 8
+QR_SIZE = 300
+
+
+def card_spec(student):
+    spec = {
+        "payload": build_student_qr_payload(student),
+        "admission_no": student.admission_no,
+        "name": student.user.get_full_name() or student.user.username,
+        "class_label": str(student.section),
+    }
+    spec["digest"] = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+    return spec
+
+
+def _card_path(digest):
+    return settings.QR_CARD_DIR / "cards" / f"{digest}.png"
+
+
+def render_card(spec):
+    """Render one ID card to the on-disk card cache; returns ``(path, rendered)``.
+
+    Runs in pool workers, so it only takes and returns picklable values.
+    """
+    path = _card_path(spec["digest"])
+    if path.exists():
+        return path, False
+
+    card = Image.new("RGB", CARD_SIZE, "white")
+    draw = ImageDraw.Draw(card)
+    draw.rectangle((0, 0, CARD_SIZE[0] - 1, CARD_SIZE[1] - 1), outline="#00796b", width=4)
+    qr_image = Image.open(BytesIO(render_qr_png(spec["payload"]))).convert("RGB").resize((QR_SIZE, QR_SIZE))
+    card.paste(qr_image, (20, (CARD_SIZE[1] - QR_SIZE) // 2))
+
+    title_font = ImageFont.load_default(size=30)
+    body_font = ImageFont.load_default(size=24)
+    text_x = QR_SIZE + 40
+    draw.text((text_x, 90), spec["name"][:22], fill="#122929", font=title_font)
+    draw.text((text_x, 150), spec["admission_no"], fill="#122929", font=body_font)
+    draw.text((text_x, 190), f"Class {spec['class_label']}", fill="#507071", font=body_font)
+
+    buffer = BytesIO()
+    card.save(buffer, format="PNG")
+    write_atomic(path, buffer.getvalue())
+    return path, True
+
+
+def class_sheet_path(class_name):
+    return settings.QR_CARD_DIR / f"class-{slugify(class_name) or 'unnamed'}.zip"
+
+
+def _read_digest(path):
+    try:
+        return path.read_text()
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _class_lock(zip_path):
+    """Hold an exclusive ``flock`` for one class, so concurrent builds leave its ZIP and digest in step."""
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(zip_path.with_suffix(".lock"), "ab") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _write_sheets(specs, archive, mapper):
+    """Compose cards into sheets one at a time, so only the current sheet is held in memory."""
+    rendered = 0
+    sheet = None
+    sheet_number = 0
+    for index, (path, was_rendered) in enumerate(mapper(render_card, specs)):
+        rendered += was_rendered
+        slot = index % CARDS_PER_SHEET
+        if slot == 0:
+            sheet = Image.new("RGB", SHEET_SIZE, "white")
+        column, row = slot % CARDS_PER_ROW, slot // CARDS_PER_ROW
+        with Image.open(path) as card:
+            sheet.paste(card, (20 + column * (CARD_SIZE[0] + 20), 20 + row * (CARD_SIZE[1] + 32)))
+        if slot == CARDS_PER_SHEET - 1 or index == len(specs) - 1:
+            sheet_number += 1
+            with archive.open(f"sheet-{sheet_number:03d}.png", "w") as handle:
+                sheet.save(handle, format="PNG")
+            sheet = None
+    return rendered
+
+
+def build_class_sheets(class_name, students, pool=None):
+    """Write the class's card sheets as a ZIP of PNGs and return ``(path, cards_rendered)``.
+
+    Cards already in the card cache are reused, and if no card in the class
+    changed since the last run the existing ZIP is kept as is. The digest of
+    the class's cards is kept next to its ZIP, and both are written under the
+    class's lock, so builds of other classes never touch them.
+    """
+    specs = [card_spec(student) for student in students]
+    set_digest = hashlib.sha256("".join(spec["digest"] for spec in specs).encode("ascii")).hexdigest()
+    zip_path = class_sheet_path(class_name)
+    digest_path = zip_path.with_suffix(".digest")
+    with _class_lock(zip_path):
+        if _read_digest(digest_path) == set_digest and zip_path.exists():
+            return zip_path, 0
+
+        mapper = (lambda func, items: pool.imap(func, items, chunksize=8)) if pool else map
+        fd, tmp_path = tempfile.mkstemp(dir=zip_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle, zipfile.ZipFile(handle, "w", zipfile.ZIP_STORED) as archive:
+                # PNGs are already compressed, so the archive only stores them.
+                rendered = _write_sheets(specs, archive, mapper)
+            os.replace(tmp_path, zip_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        write_atomic(digest_path, set_digest.encode("ascii"))
+    return zip_path, rendered
+
+
+def students_by_class(class_names=None):
+    students = StudentProfile.objects.select_related("user", "section__school_class").order_by(
+        "school_class__name", "section__name", "admission_no"
+    )
+    if class_names:
+        students = students.filter(school_class__name__in=class_names)
+    for _, group in groupby(students.iterator(chunk_size=500), key=lambda student: student.school_class_id):
+        group = list(group)
+        yield group[0].section.school_class.name, group
@@ -0,0 +1,19 @@
+"""System checks for files the app needs but does not generate."""
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+
+from .assets import HTML5_QRCODE_STATIC, HTML5_QRCODE_URL
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_vendored_assets(app_configs, **kwargs):
+    """The scanner library has to be vendored: there is no CDN fallback to hide its absence."""
+    if finders.find(HTML5_QRCODE_STATIC):
+        return []
+    return [
+        Error(
+            f"static/{HTML5_QRCODE_STATIC} is missing, so the attendance scanner cannot load.",
+            hint=f"curl -fsSL --create-dirs -o static/{HTML5_QRCODE_STATIC} {HTML5_QRCODE_URL}",
+            id="portal.E001",
+        )
+    ]
@@ -0,0 +1,49 @@
+"""Class and section lookups: selector choices for forms, and resolution by name for imports and seeding."""
+from django.core.cache import cache
+
+from .models import SchoolClass, Section
+from .roster import ROSTER_VERSION
+from .versions import current_version
+
+
+def class_choices():
+    """``(class choices, section choices)`` for the selectors, from one query cached per roster version.
+
+    Class and section saves bump the roster version, so a renamed class shows up at once.
+    """
+    key = f"class-choices:{current_version(ROSTER_VERSION)}"
+    cached = cache.get(key)
+    if cached is None:
+        classes = {}
+        sections = []
+        for section in Section.objects.select_related("school_class"):
+            classes.setdefault(section.school_class_id, section.school_class.name)
+            sections.append((section.id, str(section)))
+        cached = (list(classes.items()), sections)
+        cache.set(key, cached, None)
+    return cached
+
+
+def resolve_sections(pairs):
+    """Map ``(class name, section name)`` pairs to ``(school_class_id, section_id)``, creating what is missing.
+
+    Names are stripped first, so ``"5 "`` and ``"5"`` land in the same class.
+    Runs a fixed number of queries however many pairs are given.
+    """
+    pairs = list(pairs)
+    wanted = {(class_name.strip(), section.strip()) for class_name, section in pairs}
+    class_names = {class_name for class_name, _ in wanted}
+    SchoolClass.objects.bulk_create([SchoolClass(name=name) for name in sorted(class_names)], ignore_conflicts=True)
+    class_ids = dict(SchoolClass.objects.filter(name__in=class_names).values_list("name", "id"))
+    Section.objects.bulk_create(
+        [Section(school_class_id=class_ids[class_name], name="") for class_name in class_names]
+        + [Section(school_class_id=class_ids[class_name], name=section) for class_name, section in wanted if section],
+        ignore_conflicts=True,
+    )
+    sections = {
+        (class_name, section): (class_id, section_id)
+        for class_name, section, class_id, section_id in Section.objects.filter(
+            school_class_id__in=class_ids.values()
+        ).values_list("school_class__name", "name", "school_class_id", "id")
+    }
+    return {(class_name, section): sections[class_name.strip(), section.strip()] for class_name, section in pairs}
@@ -0,0 +1,20 @@
+"""Version stamps for dashboard content that changes a few times a day but is read on every load.
+
+Dashboards cache their notice and homework panels with ``{% cache %}``,
+keyed on these stamps; Notice and Homework signals bump them on commit, so
+a publish is visible on the very next request from any worker.
+"""
+from .versions import current_version
+
+
+NOTICES_VERSION = "notices"
+HOMEWORK_VERSION = "homework"
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+
+def fragment_cache_context():
+    return {
+        "fragment_cache_timeout": FRAGMENT_CACHE_TIMEOUT,
+        "notices_version": current_version(NOTICES_VERSION),
+        "homework_version": current_version(HOMEWORK_VERSION),
+    }
@@ -1,18 +1,93 @@
+import logging
 from functools import wraps
 
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 
+from .metrics import QueryCounter, observe_queries
+
+
+logger = logging.getLogger(__name__)
+
+
+def _forbidden():
+    return HttpResponseForbidden("You do not have permission to view this page.")
+
 
 def role_required(*roles):
+    """Allow only users with one of ``roles`` (or superusers); works on sync and async views."""
+
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @login_required
+            @wraps(view_func)
+            async def async_wrapped_view(request, *args, **kwargs):
+                user = await request.auser()
+                if user.role not in roles and not user.is_superuser:
+                    return _forbidden()
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapped_view
+
         @login_required
         @wraps(view_func)
         def wrapped_view(request, *args, **kwargs):
             if request.user.role not in roles and not request.user.is_superuser:
-                return HttpResponseForbidden("You do not have permission to view this page.")
+                return _forbidden()
             return view_func(request, *args, **kwargs)
 
         return wrapped_view
 
     return decorator
+
+
+def _check_budget(request, view_func, counter, max_queries):
+    if counter.count > max_queries:
+        logger.warning(
+            "%s %s ran %s SQL queries; %s allows %s.",
+            request.method,
+            request.path,
+            counter.count,
+            view_func.__name__,
+            max_queries,
+        )
+
+
+def query_budget(max_queries):
+    """Declare the most SQL queries a view may run, session and user lookups included.
+
+    Apply it outermost so the budget is readable as ``view.query_budget`` from
+    the URL resolver. With ``DEBUG`` on, requests that exceed it are logged.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapped_view(request, *args, **kwargs):
+                if not settings.DEBUG:
+                    return await view_func(request, *args, **kwargs)
+                with observe_queries(QueryCounter()) as counter:
+                    response = await view_func(request, *args, **kwargs)
+                _check_budget(request, view_func, counter, max_queries)
+                return response
+
+            async_wrapped_view.query_budget = max_queries
+            return async_wrapped_view
+
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if not settings.DEBUG:
+                return view_func(request, *args, **kwargs)
+            with observe_queries(QueryCounter()) as counter:
+                response = view_func(request, *args, **kwargs)
+            _check_budget(request, view_func, counter, max_queries)
+            return response
+
+        wrapped_view.query_budget = max_queries
+        return wrapped_view
+
+    return decorator
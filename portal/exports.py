@@ -0,0 +1,369 @@
+"""Streaming CSV/XLSX extracts of attendance and fee records.
+
+Rows come from ``QuerySet.iterator()`` and are written out chunk by chunk,
+so an export of any size runs in constant memory and the download starts
+as soon as the first rows are fetched. XLSX files are assembled with
+``zipfile`` on a non-seekable buffer, one worksheet per 1,048,575 rows.
+"""
+import csv
+import heapq
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from operator import itemgetter
+from xml.sax.saxutils import escape
+
+from django.db.models import F
+from django.utils import timezone
+
+from .archive import archive_boundary, archived_marks
+from .models import Attendance, AttendanceArchive, AttendanceMethod, FeeRecord, StudentProfile
+
+
+EXPORT_CHUNK_SIZE = 2000
+# Bytes collected before a chunk is handed to the response.
+STREAM_CHUNK_BYTES = 64 * 1024
+XLSX_MAX_SHEET_ROWS = 1_048_576
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+ATTENDANCE_EXPORT_HEADER = [
+    "Date",
+    "Admission No",
+    "Student",
+    "Class",
+    "Section",
+    "Method",
+    "Marked At",
+    "Marked By",
+]
+FEE_EXPORT_HEADER = [
+    "Admission No",
+    "Student",
+    "Class",
+    "Section",
+    "Term",
+    "Total Amount",
+    "Paid Amount",
+    "Due Amount",
+    "Due Date",
+    "Status",
+]
+
+
+def _full_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def _archived_export_rows(start, end, school_class_id, section_id, method):
+    """Archived marks as export rows; they carry no marker and their time to the minute."""
+    students = StudentProfile.objects.all()
+    if school_class_id:
+        students = students.filter(school_class_id=school_class_id)
+    if section_id:
+        students = students.filter(section_id=section_id)
+    info = {
+        student_id: (admission_no, _full_name(first, last, username), row_class, row_section)
+        for student_id, admission_no, first, last, username, row_class, row_section in students.values_list(
+            "id",
+            "admission_no",
+            "user__first_name",
+            "user__last_name",
+            "user__username",
+            "school_class__name",
+            "section__name",
+        )
+    }
+    archives = AttendanceArchive.objects.filter(student_id__in=students.values("id"))
+    method_labels = dict(AttendanceMethod.choices)
+    for mark in archived_marks(start, end, archives):
+        if method and mark.method != method:
+            continue
+        admission_no, name, row_class, row_section = info[mark.student_id]
+        yield [
+            mark.date,
+            admission_no,
+            name,
+            row_class,
+            row_section,
+            method_labels[mark.method],
+            timezone.localtime(mark.marked_at),
+            "",
+        ]
+
+
+def _live_export_rows(start, end, school_class_id, section_id, method):
+    queryset = Attendance.objects.filter(date__range=(start, end))
+    if school_class_id:
+        queryset = queryset.filter(student__school_class_id=school_class_id)
+    if section_id:
+        queryset = queryset.filter(student__section_id=section_id)
+    if method:
+        queryset = queryset.filter(method=method)
+
+    rows = queryset.order_by("date", "id").values_list(
+        "date",
+        "student__admission_no",
+        "student__user__first_name",
+        "student__user__last_name",
+        "student__user__username",
+        "student__school_class__name",
+        "student__section__name",
+        "method",
+        "marked_at",
+        "marked_by__username",
+    )
+    method_labels = dict(AttendanceMethod.choices)
+    for day, admission_no, first, last, username, row_class, row_section, row_method, marked_at, marked_by in (
+        rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    ):
+        yield [
+            day,
+            admission_no,
+            _full_name(first, last, username),
+            row_class,
+            row_section,
+            method_labels.get(row_method, row_method),
+            timezone.localtime(marked_at),
+            marked_by or "",
+        ]
+
+
+def attendance_export_rows(start, end, school_class_id=None, section_id=None, method=""):
+    rows = _live_export_rows(start, end, school_class_id, section_id, method)
+    boundary = archive_boundary()
+    if boundary is None or start >= boundary:
+        return rows
+    # Both sources are in date order; the merge keeps memory at one archived year.
+    archived = _archived_export_rows(start, end, school_class_id, section_id, method)
+    return heapq.merge(rows, archived, key=itemgetter(0))
+
+
+def fee_export_rows(term="", status=""):
+    queryset = FeeRecord.objects.all()
+    if term:
+        queryset = queryset.filter(term=term)
+    if status == "paid":
+        queryset = queryset.filter(paid_amount__gte=F("total_amount"))
+    elif status == "unpaid":
+        queryset = queryset.filter(paid_amount__lt=F("total_amount"))
+
+    rows = queryset.order_by("student__admission_no", "due_date", "id").values_list(
+        "student__admission_no",
+        "student__user__first_name",
+        "student__user__last_name",
+        "student__user__username",
+        "student__school_class__name",
+        "student__section__name",
+        "term",
+        "total_amount",
+        "paid_amount",
+        "due_date",
+    )
+    for admission_no, first, last, username, row_class, row_section, row_term, total, paid, due_date in (
+        rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    ):
+        due = max(total - paid, 0)
+        yield [
+            admission_no,
+            _full_name(first, last, username),
+            row_class,
+            row_section,
+            row_term,
+            total,
+            paid,
+            due,
+            due_date,
+            "Paid" if due == 0 else "Unpaid",
+        ]
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_chunks(header, rows):
+    writer = csv.writer(_Echo())
+    parts = [writer.writerow(header)]
+    size = 0
+    for row in rows:
+        line = writer.writerow([_text(value) for value in row])
+        parts.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    yield "".join(parts).encode("utf-8")
+
+
+class _ChunkBuffer:
+    """Write-only file object for ``zipfile``; having no ``tell()`` makes it stream with data descriptors."""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SHEET_START = (
+    _XML_DECLARATION + '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = "</sheetData></worksheet>"
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return ("<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>").encode("utf-8")
+
+
+def _xlsx_package_parts(sheet_titles):
+    sheets = "".join(
+        f'<sheet name="{escape(title)}" sheetId="{index}" r:id="rId{index}"/>'
+        for index, title in enumerate(sheet_titles, start=1)
+    )
+    sheet_rels = "".join(
+        f'<Relationship Id="rId{index}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{index}.xml"/>'
+        for index in range(1, len(sheet_titles) + 1)
+    )
+    sheet_types = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for index in range(1, len(sheet_titles) + 1)
+    )
+    return {
+        "xl/workbook.xml": (
+            _XML_DECLARATION + '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{sheets}</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            _XML_DECLARATION + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{sheet_rels}</Relationships>"
+        ),
+        "_rels/.rels": (
+            _XML_DECLARATION + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "[Content_Types].xml": (
+            _XML_DECLARATION + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f"{sheet_types}</Types>"
+        ),
+    }
+
+
+def _close_sheet(sheet):
+    sheet.write(_SHEET_END.encode("utf-8"))
+    sheet.close()
+
+
+def _open_sheet(archive, sheet_titles, title, header):
+    sheet_titles.append(title if not sheet_titles else f"{title} {len(sheet_titles) + 1}")
+    # Sizes are unknown up front on a non-seekable stream, so allow sheets past 2 GiB.
+    sheet = archive.open(f"xl/worksheets/sheet{len(sheet_titles)}.xml", "w", force_zip64=True)
+    sheet.write(_SHEET_START.encode("utf-8") + _xlsx_row(header))
+    return sheet
+
+
+def xlsx_chunks(header, rows, title):
+    buffer = _ChunkBuffer()
+    sheet_titles = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        sheet = None
+        sheet_rows = XLSX_MAX_SHEET_ROWS
+        for row in rows:
+            if sheet_rows == XLSX_MAX_SHEET_ROWS:
+                if sheet is not None:
+                    _close_sheet(sheet)
+                sheet = _open_sheet(archive, sheet_titles, title, header)
+                sheet_rows = 1
+            sheet.write(_xlsx_row(row))
+            sheet_rows += 1
+            if buffer.size >= STREAM_CHUNK_BYTES:
+                yield buffer.drain()
+        if sheet is None:
+            sheet = _open_sheet(archive, sheet_titles, title, header)
+        _close_sheet(sheet)
+        for name, content in _xlsx_package_parts(sheet_titles).items():
+            archive.writestr(name, content)
+    yield buffer.drain()
+
+
+def export_chunks(export_format, header, rows, title):
+    if export_format == "xlsx":
+        return xlsx_chunks(header, rows, title)
+    return csv_chunks(header, rows)
+
+
+def attendance_export(options):
+    """Return ``(filename, chunks)`` for a cleaned AttendanceExportForm."""
+    rows = attendance_export_rows(
+        options["start"],
+        options["end"],
+        school_class_id=options["school_class"].id if options["school_class"] else None,
+        section_id=options["section"].id if options["section"] else None,
+        method=options["method"],
+    )
+    export_format = options["format"]
+    filename = f"attendance-{options['start']}-to-{options['end']}.{export_format}"
+    return filename, export_chunks(export_format, ATTENDANCE_EXPORT_HEADER, rows, "Attendance")
+
+
+def fee_export(options):
+    """Return ``(filename, chunks)`` for a cleaned FeeExportForm."""
+    rows = fee_export_rows(term=options["term"], status=options["status"])
+    export_format = options["format"]
+    filename = f"fees-{options['status'] or 'all'}.{export_format}"
+    return filename, export_chunks(export_format, FEE_EXPORT_HEADER, rows, "Fees")
+
+
+def write_export(path, chunks):
+    """Write export chunks to ``path`` and return the number of bytes written."""
+    size = 0
+    with open(path, "wb") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+            size += len(chunk)
+    return size
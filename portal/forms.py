@@ -1,7 +1,60 @@
+from datetime import date, timedelta
+
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import (
+    AttendanceMethod,
+    FeeRecord,
+    Homework,
+    Notice,
+    ParentProfile,
+    SchoolClass,
+    Section,
+    StudentProfile,
+    User,
+)
+from .classes import class_choices
+from .registers import MAX_REGISTER_DAYS
+
+
+class LookupInput(forms.Widget):
+    """Type-ahead picker backed by a JSON lookup endpoint (see static/js/lookup.js).
+
+    Unlike a <select>, rendering it never iterates the field's queryset; only
+    the currently selected object (if any) is loaded to show its label.
+    """
 
-from .models import FeeRecord, Homework, Notice, ParentProfile, StudentProfile, User
+    def __init__(self, lookup_url_name, model, placeholder="Type to search", attrs=None):
+        super().__init__(attrs)
+        self.lookup_url_name = lookup_url_name
+        self.model = model
+        self.placeholder = placeholder
+
+    def _label(self, value):
+        if value in (None, ""):
+            return ""
+        try:
+            obj = self.model._default_manager.select_related("user").filter(pk=value).first()
+        except (TypeError, ValueError):
+            return ""
+        return str(obj) if obj else ""
+
+    def render(self, name, value, attrs=None, renderer=None):
+        return format_html(
+            '<div class="lookup" data-lookup-url="{}">'
+            '<input type="hidden" name="{}" value="{}" />'
+            '<input type="search" class="lookup-input" placeholder="{}" value="{}" autocomplete="off" />'
+            '<ul class="lookup-results" hidden></ul>'
+            "</div>",
+            reverse(self.lookup_url_name),
+            name,
+            "" if value is None else value,
+            self.placeholder,
+            self._label(value),
+        )
 
 
 class StyledAuthenticationForm(AuthenticationForm):
@@ -48,12 +101,16 @@ class StudentCreateForm(forms.ModelForm):
 
     class Meta:
         model = StudentProfile
-        fields = ["admission_no", "class_name", "section", "parent", "date_of_birth", "address"]
+        fields = ["admission_no", "section", "parent", "date_of_birth", "address"]
+        labels = {"section": "Class / section"}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields["parent"].queryset = ParentProfile.objects.select_related("user").order_by("user__first_name")
+        self.fields["section"].queryset = Section.objects.select_related("school_class")
+        self.fields["section"].choices = [("", "---------")] + class_choices()[1]
+        self.fields["parent"].queryset = ParentProfile.objects.all()
         self.fields["parent"].required = False
+        self.fields["parent"].widget = LookupInput("lookup_parents", ParentProfile, "Search parent by name")
 
     def clean_username(self):
         username = self.cleaned_data["username"]
@@ -85,11 +142,15 @@ class NoticeForm(forms.ModelForm):
 class HomeworkForm(forms.ModelForm):
     class Meta:
         model = Homework
-        fields = ["class_name", "subject", "title", "description", "due_date"]
+        fields = ["school_class", "subject", "title", "description", "due_date"]
         widgets = {
             "due_date": forms.DateInput(attrs={"type": "date"}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["school_class"].choices = [("", "---------")] + class_choices()[0]
+
 
 class FeeRecordForm(forms.ModelForm):
     class Meta:
@@ -101,4 +162,95 @@ class FeeRecordForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields["student"].queryset = StudentProfile.objects.select_related("user").order_by("admission_no")
+        self.fields["student"].queryset = StudentProfile.objects.all()
+        self.fields["student"].widget = LookupInput(
+            "lookup_students", StudentProfile, "Search by admission no or name"
+        )
+
+
+EXPORT_FORMAT_CHOICES = [("csv", "CSV"), ("xlsx", "Excel (XLSX)")]
+
+
+def _section_field():
+    return forms.ModelChoiceField(Section.objects.select_related("school_class"), required=False, empty_label="Any")
+
+
+def _use_cached_class_choices(form, blank_class):
+    # Validation still looks the picked ids up; only rendering the options comes from the cache.
+    classes, sections = class_choices()
+    form.fields["school_class"].choices = ([("", "Any")] if blank_class else []) + classes
+    form.fields["section"].choices = [("", "Any")] + sections
+
+
+def _clean_class_and_section(form, cleaned_data):
+    """A chosen section must belong to the chosen class; a section alone implies its class."""
+    school_class = cleaned_data.get("school_class")
+    section = cleaned_data.get("section")
+    if section is not None:
+        if school_class is not None and section.school_class_id != school_class.id:
+            form.add_error("section", f"Section {section} is not part of class {school_class}.")
+            return
+        cleaned_data["school_class"] = section.school_class
+
+
+class AttendanceExportForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    school_class = forms.ModelChoiceField(SchoolClass.objects.all(), required=False, empty_label="Any")
+    section = _section_field()
+    method = forms.ChoiceField(choices=[("", "Any")] + AttendanceMethod.choices, required=False)
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES, initial="csv")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _use_cached_class_choices(self, blank_class=True)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+        if start and end and end < start:
+            raise forms.ValidationError("End date must not be before start date.")
+        _clean_class_and_section(self, cleaned_data)
+        return cleaned_data
+
+
+class FeeExportForm(forms.Form):
+    term = forms.CharField(max_length=40, required=False)
+    status = forms.ChoiceField(choices=[("", "Any"), ("paid", "Paid"), ("unpaid", "Unpaid")], required=False)
+    format = forms.ChoiceField(choices=EXPORT_FORMAT_CHOICES, initial="csv")
+
+
+class RegisterForm(forms.Form):
+    school_class = forms.ModelChoiceField(SchoolClass.objects.all(), empty_label=None)
+    section = _section_field()
+    month = forms.CharField(required=False, widget=forms.DateInput(attrs={"type": "month"}))
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    format = forms.ChoiceField(choices=[("html", "Web page"), ("csv", "CSV")], required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _use_cached_class_choices(self, blank_class=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        month = cleaned_data.get("month")
+        if month:
+            try:
+                start = date.fromisoformat(f"{month}-01")
+            except ValueError:
+                raise forms.ValidationError("Month must be in YYYY-MM format.")
+            next_month = (start + timedelta(days=32)).replace(day=1)
+            cleaned_data["start"] = start
+            cleaned_data["end"] = next_month - timedelta(days=1)
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+        if not start or not end:
+            raise forms.ValidationError("Pick a month, or both a start and an end date for a term.")
+        if end < start:
+            raise forms.ValidationError("End date must not be before start date.")
+        if (end - start).days >= MAX_REGISTER_DAYS:
+            raise forms.ValidationError(f"A register can cover at most {MAX_REGISTER_DAYS} days.")
+        _clean_class_and_section(self, cleaned_data)
+        return cleaned_data
@@ -0,0 +1,68 @@
+import hashlib
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .archive import archive_boundary, archived_history
+from .pagination import decode_cursor, keyset_page, keyset_paginate, keyset_queryset
+from .versions import current_version
+
+
+ATTENDANCE_HISTORY_ORDERING = ("-date", "-id")
+FEE_HISTORY_ORDERING = ("due_date", "-created_at", "id")
+FEES_VERSION = "fees"
+FEE_PAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def _history_key(record):
+    return record.date, record.id
+
+
+def attendance_history_page(student, cursor=None, page_size=20):
+    """Live rows first; archived years are only read once a page reaches past the archive boundary."""
+    live = list(keyset_queryset(student.attendance_records.all(), ATTENDANCE_HISTORY_ORDERING, cursor)[: page_size + 1])
+    boundary = archive_boundary()
+    if boundary is None or (len(live) > page_size and live[-1].date >= boundary):
+        return keyset_page(live, ATTENDANCE_HISTORY_ORDERING, page_size)
+
+    before = decode_cursor(cursor, len(ATTENDANCE_HISTORY_ORDERING)) if cursor else None
+    archived = archived_history(student, before, page_size + 1)
+    merged = heapq.merge(live, archived, key=_history_key, reverse=True)
+    return keyset_page(islice(merged, page_size + 1), ATTENDANCE_HISTORY_ORDERING, page_size)
+
+
+def fee_history_page(student, cursor=None, page_size=10):
+    """Fee records change rarely, so pages are cached until any FeeRecord is saved or deleted."""
+    cursor_digest = hashlib.sha256((cursor or "").encode("utf-8")).hexdigest()[:16]
+    key = f"fees:{current_version(FEES_VERSION)}:{student.pk}:{page_size}:{cursor_digest}"
+    page = cache.get(key)
+    if page is None:
+        page = keyset_paginate(student.fee_records.all(), FEE_HISTORY_ORDERING, cursor, page_size)
+        cache.set(key, page, FEE_PAGE_CACHE_TIMEOUT)
+    return page
+
+
+def attendance_history_item(attendance):
+    return {
+        "date": attendance.date.isoformat(),
+        "method": attendance.get_method_display(),
+        "time": timezone.localtime(attendance.marked_at).strftime("%H:%M"),
+    }
+
+
+def fee_history_item(fee):
+    return {
+        "term": fee.term,
+        "total_amount": str(fee.total_amount),
+        "paid_amount": str(fee.paid_amount),
+        "due_amount": str(fee.due_amount),
+        "due_date": fee.due_date.isoformat(),
+    }
+
+
+HISTORY_KINDS = {
+    "attendance": (attendance_history_page, attendance_history_item),
+    "fees": (fee_history_page, fee_history_item),
+}
@@ -0,0 +1,96 @@
+"""Cached users for the session auth path.
+
+Without this every request loads the ``User`` row, and the dashboards then
+load the student or parent profile (and ``student.user`` again) on top.
+``CachedModelBackend`` serves the user, with its profile already attached
+and an :data:`Identity` summary, from the default cache. Entries are keyed
+on the global ``identity`` stamp, which class and section saves bump, and on
+a per-user stamp that the user's own and profile saves bump, so an edit made
+in any worker is seen by all of them without dropping everyone else's entry.
+
+The default cache may be files under ``var/cache``, so cached users carry
+their session auth hash instead of the password hash.
+"""
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import User
+from .versions import bump_version_on_commit, current_version
+
+
+IDENTITY_VERSION = "identity"
+IDENTITY_CACHE_TIMEOUT = 60 * 60
+
+Identity = namedtuple("Identity", ["role", "display_name", "student_id", "parent_id", "children_ids"])
+
+
+def build_identity(user):
+    student = getattr(user, "student_profile", None)
+    parent = getattr(user, "parent_profile", None)
+    children_ids = frozenset(parent.children.values_list("id", flat=True)) if parent is not None else frozenset()
+    return Identity(
+        user.role,
+        user.get_full_name() or user.username,
+        student.id if student is not None else None,
+        parent.id if parent is not None else None,
+        children_ids,
+    )
+
+
+def user_identity(user):
+    """The user's :data:`Identity`, computed on the spot for users that did not come from the cache."""
+    identity = getattr(user, "identity", None)
+    if identity is None:
+        identity = user.identity = build_identity(user)
+    return identity
+
+
+def load_user(user_id):
+    user = (
+        User.objects.select_related("student_profile__section__school_class", "parent_profile")
+        .filter(pk=user_id)
+        .first()
+    )
+    if user is not None:
+        user.identity = build_identity(user)
+        # Read back by User.get_session_auth_hash; a later access to the password reloads it.
+        user.session_auth_hash = user.get_session_auth_hash()
+        del user.password
+    return user
+
+
+def _user_version(user_id):
+    return f"{IDENTITY_VERSION}-{user_id}"
+
+
+def cached_user(user_id):
+    key = f"identity:{current_version(IDENTITY_VERSION)}:{current_version(_user_version(user_id))}:{user_id}"
+    user = cache.get(key)
+    if user is None:
+        user = load_user(user_id)
+        if user is not None:
+            cache.set(key, user, IDENTITY_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_identity(user_id):
+    bump_version_on_commit(_user_version(user_id))
+
+
+def invalidate_identities():
+    """Drop every cached user, for changes such as class renames that reach many profiles at once."""
+    bump_version_on_commit(IDENTITY_VERSION)
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose per-request user lookup is served from the identity cache."""
+
+    def get_user(self, user_id):
+        user = cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
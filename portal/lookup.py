@@ -0,0 +1,109 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+from .models import ParentProfile, StudentProfile
+from .roster import ROSTER_VERSION
+from .versions import current_version
+
+
+LOOKUP_LIMIT = 10
+LOOKUP_CACHE_TIMEOUT = 300
+PARENTS_VERSION = "parents"
+# Prefix searches are written as index range scans (col >= q AND col < q + U+10FFFF);
+# LIKE 'q%' cannot use a plain index on SQLite because LIKE is case-insensitive there.
+PREFIX_END = "\U0010ffff"
+
+
+def _prefix(field, prefix):
+    return {f"{field}__gte": prefix, f"{field}__lt": prefix + PREFIX_END}
+
+
+def _display_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def _name_querysets(queryset, user_path, query):
+    lowered = query.lower()
+    first_name = Lower(f"{user_path}first_name")
+    last_name = Lower(f"{user_path}last_name")
+    querysets = [
+        queryset.alias(first=first_name).filter(**_prefix("first", lowered)).order_by("first"),
+        queryset.alias(last=last_name).filter(**_prefix("last", lowered)).order_by("last"),
+    ]
+    first_word, _, rest = lowered.partition(" ")
+    if rest:
+        querysets.insert(
+            0,
+            queryset.alias(first=first_name, last=last_name)
+            .filter(first=first_word, **_prefix("last", rest))
+            .order_by("last"),
+        )
+    return querysets
+
+
+def _collect(querysets, limit):
+    matches = {}
+    for queryset in querysets:
+        for row in queryset[:limit]:
+            matches.setdefault(row[0], row)
+        if len(matches) >= limit:
+            break
+    return list(matches.values())[:limit]
+
+
+def _cached(kind, version_name, query, limit, search):
+    query = " ".join(query.split())
+    if not query:
+        return []
+    digest = hashlib.sha256(query.lower().encode("utf-8")).hexdigest()[:24]
+    key = f"lookup:{kind}:{current_version(version_name)}:{limit}:{digest}"
+    results = cache.get(key)
+    if results is None:
+        results = search(query, limit)
+        cache.set(key, results, LOOKUP_CACHE_TIMEOUT)
+    return results
+
+
+def _search_students(query, limit):
+    rows = StudentProfile.objects.values_list(
+        "id",
+        "admission_no",
+        "user__first_name",
+        "user__last_name",
+        "user__username",
+        "school_class__name",
+        "section__name",
+    )
+    querysets = [rows.filter(**_prefix("admission_no", query)).order_by("admission_no")]
+    if query.upper() != query:
+        querysets.append(rows.filter(**_prefix("admission_no", query.upper())).order_by("admission_no"))
+    querysets += _name_querysets(rows, "user__", query)
+    return [
+        {
+            "id": pk,
+            "label": f"{admission_no} - {_display_name(first, last, username)} ({f'{class_name} {section}'.strip()})",
+        }
+        for pk, admission_no, first, last, username, class_name, section in _collect(querysets, limit)
+    ]
+
+
+def _search_parents(query, limit):
+    rows = ParentProfile.objects.values_list("id", "user__first_name", "user__last_name", "user__username")
+    querysets = _name_querysets(rows, "user__", query)
+    querysets.append(rows.filter(**_prefix("user__username", query)).order_by("user__username"))
+    return [
+        {"id": pk, "label": f"{_display_name(first, last, username)} ({username})"}
+        for pk, first, last, username in _collect(querysets, limit)
+    ]
+
+
+def search_students(query, limit=LOOKUP_LIMIT):
+    """Top ``limit`` students by admission-number prefix, then first/last name prefix."""
+    return _cached("students", ROSTER_VERSION, query, limit, _search_students)
+
+
+def search_parents(query, limit=LOOKUP_LIMIT):
+    """Top ``limit`` parents by first/last name prefix, then username prefix."""
+    return _cached("parents", PARENTS_VERSION, query, limit, _search_parents)
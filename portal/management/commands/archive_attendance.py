@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from portal.archive import academic_year_start, archive_year, closed_years, next_academic_year
+from portal.models import Attendance
+
+
+class Command(BaseCommand):
+    help = "Move the attendance of closed academic years from the live table into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            help="Archive academic years that end on or before this date (YYYY-MM-DD). "
+            "Defaults to the start of the current academic year.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report what would move without changing anything.")
+        parser.add_argument("--vacuum", action="store_true", help="Run VACUUM afterwards to return the space (SQLite).")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                before = date.fromisoformat(options["before"])
+            except ValueError:
+                raise CommandError("--before must be a date in YYYY-MM-DD format.")
+        else:
+            before = academic_year_start(timezone.localdate())
+
+        years = closed_years(before)
+        if not years:
+            self.stdout.write("No closed academic years with live attendance.")
+            return
+
+        total = 0
+        for year_start in years:
+            if options["dry_run"]:
+                moved = Attendance.objects.filter(date__gte=year_start, date__lt=next_academic_year(year_start)).count()
+            else:
+                moved = archive_year(year_start)
+            total += moved
+            self.stdout.write(f"{year_start.year}-{year_start.year + 1}: {moved} rows")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Would archive {total} attendance rows."))
+            return
+        if options["vacuum"] and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} attendance rows."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.benchmarks import run_qr_token_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compare decode-and-verify throughput and QR size of the legacy and compact QR token formats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000, help="Verifications per format (default: 20000).")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive.")
+
+        results = run_qr_token_benchmarks(options["iterations"])
+        self.stdout.write(f"{'format':<16} {'chars':>6} {'QR ver':>7} {'us/verify':>10} {'verifies/s':>11}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<16} {result['chars']:>6} {result['qr_version'] or '-':>7} "
+                f"{result['us_per_verify']:>10.2f} {result['verifies_per_second']:>11}"
+            )
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.benchmarks import compare_to_baseline, run_benchmarks, url_names
+
+
+class Command(BaseCommand):
+    help = "Request every portal URL as the right role and record p50/p95 latency and SQL query counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per URL (default: 20).")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per URL first (default: 2).")
+        parser.add_argument("--only", nargs="+", metavar="URL_NAME", help="Benchmark only these URL names.")
+        parser.add_argument(
+            "--output",
+            default=str(settings.BASE_DIR / "var" / "benchmarks" / "latest.json"),
+            help="Where to save the results as JSON.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(settings.BASE_DIR / "benchmarks" / "baseline.json"),
+            help="Stored results to compare against.",
+        )
+        parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p95 slowdown before it counts as a regression (default: 0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or options["warmup"] < 0:
+            raise CommandError("--iterations must be positive and --warmup must not be negative.")
+        unknown = sorted(set(options["only"] or []) - set(url_names()))
+        if unknown:
+            raise CommandError(f"Unknown URL names: {', '.join(unknown)}")
+
+        try:
+            report = run_benchmarks(options["iterations"], options["warmup"], options["only"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"{'URL name':<28} {'role':<10} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+        for name, result in report["results"].items():
+            self.stdout.write(
+                f"{name:<28} {result['role']:<10} {result['status']:>6} "
+                f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['queries']:>8}"
+            )
+
+        self._save(Path(options["output"]), report)
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"]:
+            self._save(baseline_path, report)
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; pass --update-baseline to record one.")
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressions = compare_to_baseline(report, baseline, options["tolerance"])
+        if regressions:
+            for name, message in regressions:
+                self.stderr.write(f"{name}: {message}")
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline_path}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}."))
+
+    def _save(self, path, report):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        self.stdout.write(f"Saved results to {path}.")
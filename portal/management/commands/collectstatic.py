@@ -0,0 +1,14 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.checks import Tags
+
+
+class Command(CollectStaticCommand):
+    """``collectstatic`` that refuses to run while a vendored asset is missing.
+
+    The staticfiles deployment checks (``portal.checks``) run first, so a
+    deploy fails here instead of shipping a scanner page with no library.
+    """
+
+    def handle(self, **options):
+        self.check(tags=[Tags.staticfiles], include_deployment_checks=True)
+        return super().handle(**options)
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.exports import EXPORT_CONTENT_TYPES, attendance_export, write_export
+from portal.forms import AttendanceExportForm
+from portal.models import AttendanceMethod, SchoolClass
+
+
+class Command(BaseCommand):
+    help = "Stream attendance records for a date range to a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Destination file; the format follows its .csv/.xlsx suffix.")
+        parser.add_argument("--start", required=True, help="First date (YYYY-MM-DD).")
+        parser.add_argument("--end", required=True, help="Last date (YYYY-MM-DD).")
+        parser.add_argument("--class", dest="class_name", default="", help="Only this class.")
+        parser.add_argument("--section", default="", help="Only this section of --class.")
+        parser.add_argument("--method", default="", choices=["", *AttendanceMethod.values], help="Only this method.")
+
+    def handle(self, *args, **options):
+        export_format = Path(options["output"]).suffix.lower().lstrip(".")
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise CommandError("Output file must end in .csv or .xlsx.")
+        school_class = section = None
+        if options["class_name"]:
+            school_class = SchoolClass.objects.filter(name=options["class_name"]).first()
+            if school_class is None:
+                raise CommandError(f"No class named {options['class_name']!r}.")
+        if options["section"]:
+            if school_class is None:
+                raise CommandError("--section needs --class.")
+            section = school_class.sections.filter(name=options["section"]).first()
+            if section is None:
+                raise CommandError(f"Class {school_class} has no section {options['section']!r}.")
+        form = AttendanceExportForm(
+            {
+                "start": options["start"],
+                "end": options["end"],
+                "school_class": school_class.id if school_class else "",
+                "section": section.id if section else "",
+                "method": options["method"],
+                "format": export_format,
+            }
+        )
+        if not form.is_valid():
+            raise CommandError(" ".join(error for errors in form.errors.values() for error in errors))
+
+        _, chunks = attendance_export(form.cleaned_data)
+        size = write_export(options["output"], chunks)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}."))
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.exports import EXPORT_CONTENT_TYPES, fee_export, write_export
+from portal.forms import FeeExportForm
+
+
+class Command(BaseCommand):
+    help = "Stream fee records to a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Destination file; the format follows its .csv/.xlsx suffix.")
+        parser.add_argument("--term", default="", help="Only this term.")
+        parser.add_argument("--status", default="", choices=["", "paid", "unpaid"], help="Only paid or unpaid records.")
+
+    def handle(self, *args, **options):
+        export_format = Path(options["output"]).suffix.lower().lstrip(".")
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise CommandError("Output file must end in .csv or .xlsx.")
+        form = FeeExportForm(
+            {
+                "term": options["term"],
+                "status": options["status"],
+                "format": export_format,
+            }
+        )
+        if not form.is_valid():
+            raise CommandError(" ".join(error for errors in form.errors.values() for error in errors))
+
+        _, chunks = fee_export(form.cleaned_data)
+        size = write_export(options["output"], chunks)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}."))
@@ -0,0 +1,55 @@
+import os
+import time
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.cards import build_class_sheets, students_by_class
+from portal.qr import QR_RENDERING_AVAILABLE
+
+
+def _init_render_worker():
+    # Spawned workers start without configured settings; forked ones already have them.
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Generate printable QR ID-card sheets (a ZIP of PNG sheets per class)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--class",
+            dest="class_names",
+            action="append",
+            help="Only this class (repeatable). Defaults to the whole school.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used for card rendering (default: CPU count).",
+        )
+
+    def handle(self, *args, **options):
+        if not QR_RENDERING_AVAILABLE:
+            raise CommandError("The qrcode package is required to render QR cards.")
+        if options["workers"] < 1:
+            raise CommandError("--workers must be positive.")
+
+        started = time.perf_counter()
+        classes = 0
+        rendered = 0
+        with Pool(processes=options["workers"], initializer=_init_render_worker) as pool:
+            for class_name, students in students_by_class(options["class_names"]):
+                path, class_rendered = build_class_sheets(class_name, students, pool=pool)
+                classes += 1
+                rendered += class_rendered
+                status = f"{class_rendered} cards rendered" if class_rendered else "unchanged"
+                self.stdout.write(f"{class_name}: {len(students)} students, {status} -> {path}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {classes} classes in {time.perf_counter() - started:.2f}s; {rendered} cards rendered."
+            )
+        )
@@ -0,0 +1,282 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from portal.classes import resolve_sections
+from portal.identity import invalidate_identity
+from portal.lookup import PARENTS_VERSION
+from portal.models import ParentProfile, StudentProfile, User, UserRole
+from portal.roster import roster_cache
+from portal.summaries import refresh_enrolled
+from portal.versions import bump_version
+
+
+ROLES = {"student": UserRole.STUDENT, "parent": UserRole.PARENT}
+REQUIRED_FIELDS = {
+    UserRole.PARENT: ("username", "password", "first_name"),
+    UserRole.STUDENT: ("username", "password", "first_name", "admission_no", "class_name"),
+}
+MAX_LENGTHS = {
+    "username": 150,
+    "first_name": 150,
+    "last_name": 150,
+    "email": 254,
+    "phone": 20,
+    "occupation": 120,
+    "emergency_contact": 20,
+    "admission_no": 25,
+    "class_name": 25,
+    "section": 10,
+    "address": 255,
+}
+username_validator = UnicodeUsernameValidator()
+
+
+def _init_hash_worker():
+    # Spawned workers start without configured settings; forked ones already have them.
+    django.setup()
+
+
+def _hash_password(raw_password):
+    return make_password(raw_password)
+
+
+def read_rows(path, errors):
+    """Yield ``(line_number, row)`` pairs; CSV and JSON Lines files are streamed, JSON arrays are loaded whole.
+
+    JSON Lines that do not parse are appended to ``errors`` as ``(line_number, message)`` and skipped.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+        return
+    if suffix in {".jsonl", ".ndjson"}:
+        with path.open(encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    errors.append((line_number, f"invalid JSON: {exc}"))
+                    continue
+                yield line_number, row
+        return
+    if suffix == ".json":
+        with path.open(encoding="utf-8") as handle:
+            for index, row in enumerate(json.load(handle), start=1):
+                yield index, row
+        return
+    raise CommandError("Roster file must be .csv, .jsonl/.ndjson or .json.")
+
+
+class Command(BaseCommand):
+    help = "Bulk-create parent and student accounts from a CSV or JSON roster file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Roster file (.csv, .jsonl/.ndjson or .json).")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Rows validated and inserted per transaction.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used for password hashing (default: CPU count).",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--chunk-size and --workers must be positive.")
+
+        self.errors = []
+        self.created = {UserRole.PARENT: 0, UserRole.STUDENT: 0}
+        self.hash_seconds = 0.0
+        self.parent_ids = {}
+        self.linked_parent_ids = set()
+        started = time.perf_counter()
+        processed = 0
+
+        rows = read_rows(path, self.errors)
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_hash_worker) as pool:
+            while chunk := list(islice(rows, options["chunk_size"])):
+                processed += len(chunk)
+                self._import_chunk(chunk, pool)
+
+        if self.created[UserRole.PARENT]:
+            bump_version(PARENTS_VERSION)
+        if self.created[UserRole.STUDENT]:
+            roster_cache.invalidate()
+            refresh_enrolled(timezone.localdate())
+        # bulk_create sends no signals, so parents who gained a child still have the old children cached.
+        for user_id in ParentProfile.objects.filter(pk__in=self.linked_parent_ids).values_list("user_id", flat=True):
+            invalidate_identity(user_id)
+
+        for line_number, message in sorted(self.errors):
+            self.stderr.write(f"line {line_number}: {message}")
+
+        elapsed = time.perf_counter() - started
+        created = sum(self.created.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {processed} rows in {elapsed:.2f}s ({processed / elapsed if elapsed else 0:.0f} rows/s): "
+                f"{self.created[UserRole.PARENT]} parents, {self.created[UserRole.STUDENT]} students created, "
+                f"{len(self.errors)} rows rejected. Password hashing took {self.hash_seconds:.2f}s "
+                f"across {options['workers']} workers; {created / elapsed if elapsed else 0:.0f} accounts/s overall."
+            )
+        )
+
+    def _clean_row(self, row):
+        if not isinstance(row, dict):
+            raise ValidationError("Row must be an object.")
+        row = {key.strip().lower(): str(value).strip() for key, value in row.items() if key and value is not None}
+        role = ROLES.get(row.get("role", "").lower())
+        if role is None:
+            raise ValidationError("role must be 'student' or 'parent'.")
+
+        missing = [field for field in REQUIRED_FIELDS[role] if not row.get(field)]
+        if missing:
+            raise ValidationError(f"Missing required fields: {', '.join(missing)}.")
+        for field, max_length in MAX_LENGTHS.items():
+            if len(row.get(field, "")) > max_length:
+                raise ValidationError(f"{field} is longer than {max_length} characters.")
+        username_validator(row["username"])
+
+        if row.get("date_of_birth"):
+            try:
+                row["date_of_birth"] = date.fromisoformat(row["date_of_birth"])
+            except ValueError:
+                raise ValidationError("date_of_birth must be YYYY-MM-DD.")
+        row["role"] = role
+        return row
+
+    def _validate_chunk(self, chunk):
+        valid = []
+        for line_number, row in chunk:
+            try:
+                valid.append((line_number, self._clean_row(row)))
+            except ValidationError as exc:
+                self.errors.append((line_number, " ".join(exc.messages)))
+
+        usernames = [row["username"] for _, row in valid]
+        admission_nos = [row["admission_no"] for _, row in valid if row["role"] == UserRole.STUDENT]
+        taken_usernames = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        taken_admissions = set(
+            StudentProfile.objects.filter(admission_no__in=admission_nos).values_list("admission_no", flat=True)
+        )
+        wanted_parents = {
+            row["parent_username"] for _, row in valid if row.get("parent_username")
+        } - set(self.parent_ids)
+        self.parent_ids.update(
+            ParentProfile.objects.filter(user__username__in=wanted_parents).values_list("user__username", "id")
+        )
+        chunk_parents = {row["username"] for _, row in valid if row["role"] == UserRole.PARENT}
+
+        accepted = []
+        for line_number, row in valid:
+            error = None
+            if row["username"] in taken_usernames:
+                error = f"username {row['username']!r} is already taken."
+            elif row["role"] == UserRole.STUDENT and row["admission_no"] in taken_admissions:
+                error = f"admission_no {row['admission_no']!r} already exists."
+            elif (
+                row.get("parent_username")
+                and row["parent_username"] not in self.parent_ids
+                and row["parent_username"] not in chunk_parents
+            ):
+                error = f"parent_username {row['parent_username']!r} does not match a parent."
+            if error:
+                self.errors.append((line_number, error))
+                continue
+            taken_usernames.add(row["username"])
+            if row["role"] == UserRole.STUDENT:
+                taken_admissions.add(row["admission_no"])
+            accepted.append((line_number, row))
+        return accepted
+
+    def _import_chunk(self, chunk, pool):
+        accepted = self._validate_chunk(chunk)
+        if not accepted:
+            return
+
+        # Parents first so students later in the same chunk can link to them.
+        accepted.sort(key=lambda item: item[1]["role"] != UserRole.PARENT)
+        hash_started = time.perf_counter()
+        hashes = list(pool.map(_hash_password, [row["password"] for _, row in accepted], chunksize=32))
+        self.hash_seconds += time.perf_counter() - hash_started
+
+        users = [
+            User(
+                username=row["username"],
+                password=password_hash,
+                first_name=row["first_name"],
+                last_name=row.get("last_name", ""),
+                email=User.objects.normalize_email(row.get("email", "")),
+                phone=row.get("phone", ""),
+                role=row["role"],
+            )
+            for (_, row), password_hash in zip(accepted, hashes)
+        ]
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                parents = [
+                    ParentProfile(
+                        user=user,
+                        occupation=row.get("occupation", ""),
+                        emergency_contact=row.get("emergency_contact", ""),
+                    )
+                    for (_, row), user in zip(accepted, users)
+                    if row["role"] == UserRole.PARENT
+                ]
+                ParentProfile.objects.bulk_create(parents)
+                new_parent_ids = {parent.user.username: parent.id for parent in parents}
+
+                sections = resolve_sections(
+                    (row["class_name"], row.get("section", ""))
+                    for _, row in accepted
+                    if row["role"] == UserRole.STUDENT
+                )
+                students = [
+                    StudentProfile(
+                        user=user,
+                        admission_no=row["admission_no"],
+                        school_class_id=sections[row["class_name"], row.get("section", "")][0],
+                        section_id=sections[row["class_name"], row.get("section", "")][1],
+                        parent_id=new_parent_ids.get(row.get("parent_username"))
+                        or self.parent_ids.get(row.get("parent_username")),
+                        date_of_birth=row.get("date_of_birth") or None,
+                        address=row.get("address", ""),
+                    )
+                    for (_, row), user in zip(accepted, users)
+                    if row["role"] == UserRole.STUDENT
+                ]
+                StudentProfile.objects.bulk_create(students)
+        except DatabaseError as exc:
+            # Usually a concurrent insert of the same username/admission number; keep going with later chunks.
+            for line_number, _ in accepted:
+                self.errors.append((line_number, f"chunk rolled back: {exc}"))
+            return
+
+        self.parent_ids.update(new_parent_ids)
+        self.linked_parent_ids.update(student.parent_id for student in students if student.parent_id)
+        self.created[UserRole.PARENT] += len(parents)
+        self.created[UserRole.STUDENT] += len(students)
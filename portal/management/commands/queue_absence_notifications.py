@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from portal.notifications import queue_absence_notifications
+
+
+class Command(BaseCommand):
+    help = "Queue an absence notice for every parent whose child was not marked present on a day."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to check (YYYY-MM-DD). Defaults to today.")
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                day = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be a date in YYYY-MM-DD format.")
+        else:
+            day = timezone.localdate()
+
+        queued = queue_absence_notifications(day)
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} parent notifications for {day}."))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from portal.summaries import rebuild_daily_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild AttendanceDailySummary rows for a date range from the Attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First date to rebuild (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--end", help="Last date to rebuild (YYYY-MM-DD). Defaults to --start.")
+
+    def _parse_date(self, value, option):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"{option} must be a date in YYYY-MM-DD format.")
+
+    def handle(self, *args, **options):
+        start = self._parse_date(options["start"], "--start") if options["start"] else timezone.localdate()
+        end = self._parse_date(options["end"], "--end") if options["end"] else start
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+
+        written = rebuild_daily_summary(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} summary rows for {start} to {end}."))
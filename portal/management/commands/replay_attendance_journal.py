@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from portal.writebehind import attendance_writer
+
+
+class Command(BaseCommand):
+    help = "Store attendance marks left in the write-behind journal by processes that stopped before flushing."
+
+    def handle(self, *args, **options):
+        recovered = attendance_writer.recover()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {recovered} attendance marks."))
@@ -0,0 +1,298 @@
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from portal.attendance import ATTENDANCE_VERSION
+from portal.classes import resolve_sections
+from portal.content import HOMEWORK_VERSION, NOTICES_VERSION
+from portal.history import FEES_VERSION
+from portal.identity import invalidate_identities
+from portal.lookup import PARENTS_VERSION
+from portal.models import (
+    Attendance,
+    AttendanceMethod,
+    FeeRecord,
+    Homework,
+    Notice,
+    NoticeAudience,
+    ParentProfile,
+    StudentProfile,
+    User,
+    UserRole,
+)
+from portal.registers import register_version_name
+from portal.roster import roster_cache
+from portal.signals import row_delete_receivers_disconnected
+from portal.summaries import rebuild_daily_summary, refresh_enrolled
+from portal.versions import bump_version
+
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Anika", "Arjun", "Bikash", "Deepa", "Diya", "Gita", "Hari", "Ishaan",
+    "Kabir", "Kavya", "Laxmi", "Manish", "Maya", "Nabin", "Nisha", "Priya", "Rahul", "Rajesh",
+    "Riya", "Rohan", "Sabina", "Sanjay", "Sita", "Sunil", "Tara", "Usha", "Vivek", "Yash",
+]
+LAST_NAMES = [
+    "Acharya", "Adhikari", "Basnet", "Bhandari", "Chaudhary", "Dahal", "Gautam", "Gurung", "Joshi",
+    "Karki", "Khadka", "Koirala", "Lama", "Magar", "Neupane", "Niraula", "Pandey", "Poudel", "Rai",
+    "Sharma", "Shrestha", "Tamang", "Thapa",
+]
+SUBJECTS = ["English", "Mathematics", "Science", "Social Studies", "Nepali", "Computer"]
+SECTIONS = ["A", "B"]
+CLASSES = [str(number) for number in range(1, 13)]
+TERMS_PER_YEAR = 3
+BATCH_SIZE = 5000
+SQLITE_CACHE_KIB = 512 * 1024
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic school (users, attendance, notices, homework, fees) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=5000, help="Number of students (default: 5000).")
+        parser.add_argument("--days", type=int, default=3 * 365, help="Calendar days of attendance history (default: 3 years).")
+        parser.add_argument("--end", help="Last day of generated history (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed produces the same school.")
+        parser.add_argument("--prefix", default="seed", help="Username/admission-number prefix for generated accounts.")
+        parser.add_argument("--password", default="seed-password", help="Password for every generated account.")
+        parser.add_argument("--replace", action="store_true", help="Delete accounts from an earlier run with this prefix first.")
+
+    def handle(self, *args, **options):
+        if options["students"] < 1 or options["days"] < 1:
+            raise CommandError("--students and --days must be positive.")
+        try:
+            end = datetime.strptime(options["end"], "%Y-%m-%d").date() if options["end"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--end must be a date in YYYY-MM-DD format.")
+
+        prefix = options["prefix"]
+        existing = User.objects.filter(username__startswith=f"{prefix}-")
+        if existing.exists():
+            if not options["replace"]:
+                raise CommandError(f"Accounts prefixed '{prefix}-' already exist; pass --replace to regenerate them.")
+            self.stdout.write(f"Deleting {existing.count()} accounts from an earlier run...")
+            # Summaries, rosters and caches are refreshed once below instead of once per deleted row.
+            with transaction.atomic(), row_delete_receivers_disconnected():
+                Attendance.objects.filter(student__user__in=existing).delete()
+                FeeRecord.objects.filter(student__user__in=existing).delete()
+                Notice.objects.filter(created_by__in=existing).delete()
+                Homework.objects.filter(created_by__in=existing).delete()
+                existing.delete()
+
+        self.random = random.Random(options["seed"])
+        self.prefix = prefix
+        self.start = end - timedelta(days=options["days"] - 1)
+        self.end = end
+        started = time.perf_counter()
+
+        password = make_password(options["password"])
+        if connection.vendor == "sqlite":
+            # Rows arrive day by day but the (student, date) indexes are student-first, so every batch
+            # touches pages all over them; keep those pages in memory instead of re-reading them.
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KIB}")
+        with transaction.atomic():
+            self.sections = resolve_sections((class_name, section) for class_name in CLASSES for section in SECTIONS)
+            self.class_ids = {class_name: self.sections[class_name, SECTIONS[0]][0] for class_name in CLASSES}
+            admin, parents = self._create_parents(password, options["students"])
+            students = self._create_students(password, options["students"], parents)
+            notices = self._create_notices(admin)
+            homework = self._create_homework(admin)
+            fees = self._create_fees(students)
+            attendance = self._create_attendance(admin, students)
+        rebuild_daily_summary(self.start, self.end)
+
+        roster_cache.invalidate()
+        invalidate_identities()
+        refresh_enrolled(timezone.localdate())
+        for version in (ATTENDANCE_VERSION, PARENTS_VERSION, NOTICES_VERSION, HOMEWORK_VERSION, FEES_VERSION):
+            bump_version(version)
+        for class_id in self.class_ids.values():
+            bump_version(register_version_name(class_id))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(students)} students, {len(parents)} parents, {attendance} attendance rows, "
+                f"{notices} notices, {homework} homework items and {fees} fee records "
+                f"for {self.start} to {self.end} in {time.perf_counter() - started:.1f}s. "
+                f"Admin login: {admin.username}"
+            )
+        )
+
+    def _name(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def _create_parents(self, password, student_count):
+        admin = User.objects.create(
+            username=f"{self.prefix}-admin",
+            password=password,
+            first_name="Seed",
+            last_name="Admin",
+            role=UserRole.ADMIN,
+        )
+        # Siblings share a parent account, so there are fewer parents than students.
+        users = []
+        for number in range(max(student_count * 2 // 3, 1)):
+            first_name, last_name = self._name()
+            users.append(
+                User(
+                    username=f"{self.prefix}-p{number:05d}",
+                    password=password,
+                    first_name=first_name,
+                    last_name=last_name,
+                    phone=f"98{self.random.randrange(10**8):08d}",
+                    role=UserRole.PARENT,
+                )
+            )
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        parents = ParentProfile.objects.bulk_create(
+            [ParentProfile(user=user, occupation="", emergency_contact=user.phone) for user in users],
+            batch_size=BATCH_SIZE,
+        )
+        return admin, parents
+
+    def _create_students(self, password, count, parents):
+        users = []
+        profiles = []
+        for number in range(count):
+            parent = self.random.choice(parents)
+            first_name, _ = self._name()
+            users.append(
+                User(
+                    username=f"{self.prefix}-s{number:05d}",
+                    password=password,
+                    first_name=first_name,
+                    last_name=parent.user.last_name,
+                    role=UserRole.STUDENT,
+                )
+            )
+            class_id, section_id = self.sections[
+                CLASSES[number % len(CLASSES)], SECTIONS[(number // len(CLASSES)) % len(SECTIONS)]
+            ]
+            profiles.append(
+                StudentProfile(
+                    admission_no=f"{self.prefix.upper()}{number:05d}",
+                    school_class_id=class_id,
+                    section_id=section_id,
+                    parent=parent,
+                    date_of_birth=self.end - timedelta(days=self.random.randrange(5 * 365, 18 * 365)),
+                    address=f"Ward {self.random.randrange(1, 33)}, Kathmandu",
+                )
+            )
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        for user, profile in zip(users, profiles):
+            profile.user = user
+        return StudentProfile.objects.bulk_create(profiles, batch_size=BATCH_SIZE)
+
+    def _school_days(self):
+        day = self.start
+        while day <= self.end:
+            # Saturday is the weekly holiday; a few other days are festivals or closures.
+            if day.weekday() != 5 and self.random.random() > 0.04:
+                yield day
+            day += timedelta(days=1)
+
+    def _create_attendance(self, admin, students):
+        # Millions of rows: skip model instances and insert plain parameter tuples with executemany.
+        fields = [Attendance._meta.get_field(name) for name in ("student", "date", "marked_at", "method", "marked_by")]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            connection.ops.quote_name(Attendance._meta.db_table),
+            ", ".join(connection.ops.quote_name(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        rates = [self.random.uniform(0.7, 0.99) for _ in students]
+        tz = timezone.get_current_timezone()
+        created = 0
+        batch = []
+        with connection.cursor() as cursor:
+            for day in self._school_days():
+                opening = datetime.combine(day, dt_time(7, 30), tzinfo=tz)
+                db_day = connection.ops.adapt_datefield_value(day)
+                for student, rate in zip(students, rates):
+                    if self.random.random() >= rate:
+                        continue
+                    manual = self.random.random() < 0.08
+                    marked_at = opening + timedelta(seconds=self.random.randrange(90 * 60))
+                    batch.append(
+                        (
+                            student.id,
+                            db_day,
+                            connection.ops.adapt_datetimefield_value(marked_at),
+                            AttendanceMethod.MANUAL if manual else AttendanceMethod.QR,
+                            admin.id,
+                        )
+                    )
+                if len(batch) >= BATCH_SIZE:
+                    cursor.executemany(sql, batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+        return created + len(batch)
+
+    def _create_notices(self, admin):
+        audiences = [NoticeAudience.ALL, NoticeAudience.ALL, NoticeAudience.STUDENT, NoticeAudience.PARENT]
+        notices = []
+        for week in range((self.end - self.start).days // 7 + 1):
+            notices.append(
+                Notice(
+                    title=f"Week {week + 1} announcement",
+                    message="Please read the attached schedule and circulars.",
+                    audience=self.random.choice(audiences),
+                    created_by=admin,
+                )
+            )
+        Notice.objects.bulk_create(notices, batch_size=BATCH_SIZE)
+        return len(notices)
+
+    def _create_homework(self, admin):
+        homework = []
+        day = self.start
+        while day <= self.end:
+            for class_name in CLASSES:
+                subject = self.random.choice(SUBJECTS)
+                homework.append(
+                    Homework(
+                        school_class_id=self.class_ids[class_name],
+                        subject=subject,
+                        title=f"{subject} worksheet",
+                        description="Complete the exercises from the textbook.",
+                        due_date=day + timedelta(days=self.random.randrange(2, 8)),
+                        created_by=admin,
+                    )
+                )
+            day += timedelta(days=7)
+        Homework.objects.bulk_create(homework, batch_size=BATCH_SIZE)
+        return len(homework)
+
+    def _create_fees(self, students):
+        term_days = 365 // TERMS_PER_YEAR
+        term_starts = []
+        day = self.start
+        while day <= self.end:
+            term_starts.append(day)
+            day += timedelta(days=term_days)
+
+        class_names = {class_id: class_name for class_name, class_id in self.class_ids.items()}
+        fees = []
+        for student in students:
+            total = Decimal(1500 + 250 * int(class_names[student.school_class_id]))
+            for number, term_start in enumerate(term_starts, start=1):
+                paid = total if self.random.random() < 0.8 else Decimal(self.random.randrange(0, int(total), 100))
+                fees.append(
+                    FeeRecord(
+                        student=student,
+                        term=f"Term {number} ({term_start.year})",
+                        total_amount=total,
+                        paid_amount=paid,
+                        due_date=term_start + timedelta(days=30),
+                    )
+                )
+        FeeRecord.objects.bulk_create(fees, batch_size=BATCH_SIZE)
+        return len(fees)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.notifications import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_WORKERS,
+    drain_outbox,
+    get_transport_class,
+)
+
+
+class Command(BaseCommand):
+    help = "Deliver every due parent notification in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--transport",
+            help="console, file, email or a dotted path to a transport class. "
+            "Defaults to the PARENT_NOTIFICATION_TRANSPORT setting.",
+        )
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE, help="Notifications claimed at once.")
+        parser.add_argument("--workers", type=int, default=OUTBOX_WORKERS, help="Transports sending concurrently.")
+        parser.add_argument(
+            "--max-attempts", type=int, default=OUTBOX_MAX_ATTEMPTS, help="Attempts before a notification fails."
+        )
+
+    def handle(self, *args, **options):
+        for option in ("batch_size", "workers", "max_attempts"):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be positive.")
+        try:
+            transport_class = get_transport_class(options["transport"])
+        except ImportError as exc:
+            raise CommandError(f"Unknown transport: {exc}")
+
+        started = time.perf_counter()
+        sent, failed = drain_outbox(
+            transport_class,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            max_attempts=options["max_attempts"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {sent} notifications in {time.perf_counter() - started:.2f}s; {failed} failed.")
+        )
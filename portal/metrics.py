@@ -0,0 +1,262 @@
+"""In-process request metrics: Server-Timing values and Prometheus histograms.
+
+Each worker process keeps its own histograms and counters; ``/metrics``
+reports the process that serves it (its pid is exported so scrapes from
+several workers can be told apart).
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SCAN_RATE_WINDOW = 60
+
+_current_timings = ContextVar("request_timings", default=None)
+_query_observers = ContextVar("query_observers", default=())
+
+
+def _observe_query(execute, sql, params, many, context):
+    observers = _query_observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for observer in observers:
+            observer.record_query(elapsed)
+
+
+def install_query_observer(connection):
+    """Attach the query observer to a new database connection (see ``connection_created``).
+
+    Connections are per thread and async ORM calls run in a worker thread, so
+    a permanent wrapper that reads a context variable sees queries from both
+    sync and async views, where ``connection.execute_wrapper()`` in the view
+    would only see its own thread. It goes first in the list because
+    ``execute_wrapper()`` removes wrappers from the end.
+    """
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _observe_query)
+
+
+@contextmanager
+def observe_queries(observer):
+    """Call ``observer.record_query(seconds)`` for every query run in this context."""
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield observer
+    finally:
+        _query_observers.reset(token)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def record_query(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+
+class RequestTimings(QueryCounter):
+    """SQL and template totals for the request being served."""
+
+    def __init__(self):
+        super().__init__()
+        self.template_seconds = 0.0
+
+
+@contextmanager
+def request_timings():
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        with observe_queries(timings):
+            yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def record_template_render(template_name, seconds):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.template_seconds += seconds
+    metrics.template_seconds.observe((template_name,), seconds)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["count"] += 1
+            series["sum"] += value
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(
+                (labels, dict(values, buckets=list(values["buckets"]))) for labels, values in self._series.items()
+            )
+        for label_values, values in series:
+            for bound, count in zip(self.buckets, values["buckets"]):
+                labels = _format_labels((*self.labels, "le"), (*label_values, bound))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels((*self.labels, "le"), (*label_values, "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {values['count']}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {values['sum']:.6f}")
+            lines.append(f"{self.name}_count{labels} {values['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values=()):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class ScanRate:
+    """Scans seen in the last ``window`` seconds, reported as a gauge."""
+
+    name = "schoolms_qr_scans_last_minute"
+
+    def __init__(self, window=SCAN_RATE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._times = deque()
+
+    def _expire(self, now):
+        while self._times and self._times[0] <= now - self.window:
+            self._times.popleft()
+
+    def record(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            self._expire(now)
+
+    def value(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._times)
+
+    def exposition(self):
+        return [
+            f"# HELP {self.name} QR scans received in the last {self.window} seconds.",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.value()}",
+        ]
+
+
+class Metrics:
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "schoolms_request_duration_seconds",
+            "Wall time spent in the middleware and view stack.",
+            ("view", "method"),
+            DURATION_BUCKETS,
+        )
+        self.sql_queries = Histogram(
+            "schoolms_request_sql_queries", "SQL queries run per request.", ("view",), QUERY_COUNT_BUCKETS
+        )
+        self.sql_seconds = Histogram(
+            "schoolms_request_sql_seconds", "Time spent in SQL per request.", ("view",), DURATION_BUCKETS
+        )
+        self.template_seconds = Histogram(
+            "schoolms_template_render_seconds", "Time spent rendering templates.", ("template",), DURATION_BUCKETS
+        )
+        self.responses = Counter("schoolms_responses_total", "Responses by view and status code.", ("view", "status"))
+        self.scans = Counter("schoolms_qr_scans_total", "QR scans by outcome.", ("outcome",))
+        self.invalid_signatures = Counter(
+            "schoolms_qr_invalid_signatures_total", "QR scans rejected because the signature did not verify."
+        )
+        self.duplicate_scans = Counter(
+            "schoolms_qr_duplicate_scans_total", "QR scans for students already marked that day."
+        )
+        self.scan_rate = ScanRate()
+
+    def observe_request(self, view, method, status, seconds, timings):
+        self.request_seconds.observe((view, method), seconds)
+        self.sql_queries.observe((view,), timings.count)
+        self.sql_seconds.observe((view,), timings.seconds)
+        self.responses.inc((view, str(status)))
+
+    def record_scan(self, outcome):
+        """Count one scan; ``outcome`` is ``marked``, ``already_marked`` or ``invalid``."""
+        self.scans.inc((outcome,))
+        self.scan_rate.record()
+        if outcome == "already_marked":
+            self.duplicate_scans.inc()
+
+    def exposition(self):
+        lines = [
+            "# HELP schoolms_process_info The worker process these metrics come from.",
+            "# TYPE schoolms_process_info gauge",
+            f'schoolms_process_info{{pid="{os.getpid()}"}} 1',
+        ]
+        for metric in (
+            self.request_seconds,
+            self.sql_queries,
+            self.sql_seconds,
+            self.template_seconds,
+            self.responses,
+            self.scans,
+            self.invalid_signatures,
+            self.duplicate_scans,
+            self.scan_rate,
+        ):
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
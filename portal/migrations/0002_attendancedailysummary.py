@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('class_name', models.CharField(max_length=25)),
+                ('section', models.CharField(blank=True, max_length=10)),
+                ('enrolled', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('qr_count', models.PositiveIntegerField(default=0)),
+                ('manual_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', 'class_name', 'section'],
+                'unique_together': {('date', 'class_name', 'section')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_attendancedailysummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', '-date'], name='attendance_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', '-marked_at'], name='attendance_date_marked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feerecord',
+            index=models.Index(fields=['student', 'due_date', '-created_at'], name='fee_student_due_idx'),
+        ),
+    ]
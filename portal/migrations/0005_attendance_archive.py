@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_start', models.DateField()),
+                ('present', models.PositiveSmallIntegerField(default=0)),
+                ('days', models.BinaryField()),
+                ('manual_days', models.BinaryField()),
+                ('times', models.BinaryField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_archives', to='portal.studentprofile')),
+            ],
+            options={
+                'ordering': ['-year_start'],
+                'unique_together': {('student', 'year_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_parent_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolClass',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=25, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'verbose_name_plural': 'school classes',
+            },
+        ),
+        migrations.CreateModel(
+            name='Section',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=10)),
+                ('school_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='portal.schoolclass')),
+            ],
+            options={
+                'ordering': ['school_class__name', 'name'],
+                'unique_together': {('school_class', 'name')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='attendancedailysummary',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='attendancedailysummary',
+            old_name='section',
+            new_name='section_name',
+        ),
+        migrations.RenameField(
+            model_name='studentprofile',
+            old_name='section',
+            new_name='section_name',
+        ),
+        migrations.AddField(
+            model_name='attendancedailysummary',
+            name='section',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='portal.section'),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='school_class',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='portal.schoolclass'),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='section',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='portal.section'),
+        ),
+        migrations.AddField(
+            model_name='homework',
+            name='school_class',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='homework', to='portal.schoolclass'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+
+def _section_ids(apps, pairs):
+    """Create a SchoolClass/Section for every (class name, section name) and return their ids."""
+    SchoolClass = apps.get_model("portal", "SchoolClass")
+    Section = apps.get_model("portal", "Section")
+    # Stray whitespace is what typically split one class into two.
+    pairs = {(class_name.strip(), section.strip()) for class_name, section in pairs}
+    class_names = {class_name for class_name, _ in pairs}
+    SchoolClass.objects.bulk_create([SchoolClass(name=name) for name in sorted(class_names)], ignore_conflicts=True)
+    class_ids = dict(SchoolClass.objects.values_list("name", "id"))
+    Section.objects.bulk_create(
+        [Section(school_class_id=class_ids[class_name], name="") for class_name in class_names]
+        + [Section(school_class_id=class_ids[class_name], name=section) for class_name, section in pairs if section],
+        ignore_conflicts=True,
+    )
+    return class_ids, {
+        (class_name, section): (class_id, section_id)
+        for class_name, section, class_id, section_id in Section.objects.values_list(
+            "school_class__name", "name", "school_class_id", "id"
+        )
+    }
+
+
+def forwards(apps, schema_editor):
+    StudentProfile = apps.get_model("portal", "StudentProfile")
+    Homework = apps.get_model("portal", "Homework")
+    AttendanceDailySummary = apps.get_model("portal", "AttendanceDailySummary")
+
+    student_pairs = set(StudentProfile.objects.values_list("class_name", "section_name"))
+    summary_pairs = set(AttendanceDailySummary.objects.values_list("class_name", "section_name"))
+    homework_classes = set(Homework.objects.values_list("class_name", flat=True))
+    class_ids, sections = _section_ids(
+        apps, student_pairs | summary_pairs | {(class_name, "") for class_name in homework_classes}
+    )
+
+    for class_name, section in student_pairs:
+        class_id, section_id = sections[class_name.strip(), section.strip()]
+        StudentProfile.objects.filter(class_name=class_name, section_name=section).update(
+            school_class_id=class_id, section_id=section_id
+        )
+    for class_name in homework_classes:
+        Homework.objects.filter(class_name=class_name).update(school_class_id=class_ids[class_name.strip()])
+
+    sources = {}
+    for class_name, section in summary_pairs:
+        sources.setdefault(sections[class_name.strip(), section.strip()][1], []).append((class_name, section))
+    for section_id, pairs in sources.items():
+        if len(pairs) == 1:
+            [(class_name, section)] = pairs
+            AttendanceDailySummary.objects.filter(class_name=class_name, section_name=section).update(
+                section_id=section_id
+            )
+            continue
+        # Names that only differed by whitespace now share a section: merge their days.
+        kept = {}
+        for class_name, section in pairs:
+            for summary in AttendanceDailySummary.objects.filter(class_name=class_name, section_name=section):
+                row = kept.get(summary.date)
+                if row is None:
+                    summary.section_id = section_id
+                    kept[summary.date] = summary
+                    continue
+                for field in ("enrolled", "present", "qr_count", "manual_count"):
+                    setattr(row, field, getattr(row, field) + getattr(summary, field))
+                summary.delete()
+        AttendanceDailySummary.objects.bulk_update(
+            kept.values(), ["section", "enrolled", "present", "qr_count", "manual_count"], batch_size=500
+        )
+
+
+def backwards(apps, schema_editor):
+    StudentProfile = apps.get_model("portal", "StudentProfile")
+    Homework = apps.get_model("portal", "Homework")
+    AttendanceDailySummary = apps.get_model("portal", "AttendanceDailySummary")
+    Section = apps.get_model("portal", "Section")
+    for section_id, class_name, section in Section.objects.values_list("id", "school_class__name", "name"):
+        StudentProfile.objects.filter(section_id=section_id).update(class_name=class_name, section_name=section)
+        AttendanceDailySummary.objects.filter(section_id=section_id).update(class_name=class_name, section_name=section)
+    for homework in Homework.objects.select_related("school_class"):
+        homework.class_name = homework.school_class.name
+        homework.save(update_fields=["class_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_school_classes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0008_populate_school_classes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='attendancedailysummary',
+            options={'ordering': ['-date', 'section__school_class__name', 'section__name']},
+        ),
+        migrations.AlterModelOptions(
+            name='studentprofile',
+            options={'ordering': ['school_class__name', 'admission_no']},
+        ),
+        migrations.RemoveField(
+            model_name='attendancedailysummary',
+            name='class_name',
+        ),
+        migrations.RemoveField(
+            model_name='attendancedailysummary',
+            name='section_name',
+        ),
+        migrations.RemoveField(
+            model_name='homework',
+            name='class_name',
+        ),
+        migrations.RemoveField(
+            model_name='studentprofile',
+            name='class_name',
+        ),
+        migrations.RemoveField(
+            model_name='studentprofile',
+            name='section_name',
+        ),
+        migrations.AlterField(
+            model_name='attendancedailysummary',
+            name='section',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='portal.section'),
+        ),
+        migrations.AlterField(
+            model_name='homework',
+            name='school_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='homework', to='portal.schoolclass'),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='school_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='students', to='portal.schoolclass'),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='section',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='students', to='portal.section'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='attendancedailysummary',
+            unique_together={('date', 'section')},
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['school_class', 'due_date'], name='homework_class_due_idx'),
+        ),
+    ]
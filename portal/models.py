@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
@@ -46,6 +47,21 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower("first_name"), name="user_first_name_lower_idx"),
+            models.Index(Lower("last_name"), name="user_last_name_lower_idx"),
+        ]
+
+    def get_session_auth_hash(self):
+        # Users from the identity cache carry this hash in place of the password (see portal.identity).
+        session_auth_hash = self.__dict__.get("session_auth_hash")
+        return session_auth_hash if session_auth_hash is not None else super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self.__dict__.pop("session_auth_hash", None)
+        super().set_password(raw_password)
+
 
 class ParentProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="parent_profile")
@@ -62,11 +78,37 @@ class ParentProfile(models.Model):
         return f"Parent: {self.user.get_full_name() or self.user.username}"
 
 
+class SchoolClass(models.Model):
+    name = models.CharField(max_length=25, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name_plural = "school classes"
+
+    def __str__(self):
+        return self.name
+
+
+class Section(models.Model):
+    """A section of a class; every class has at least the unnamed section ``""``."""
+
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE, related_name="sections")
+    name = models.CharField(max_length=10, blank=True)
+
+    class Meta:
+        unique_together = ("school_class", "name")
+        ordering = ["school_class__name", "name"]
+
+    def __str__(self):
+        return f"{self.school_class.name} {self.name}".strip()
+
+
 class StudentProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="student_profile")
     admission_no = models.CharField(max_length=25, unique=True)
-    class_name = models.CharField(max_length=25)
-    section = models.CharField(max_length=10, blank=True)
+    # Always section.school_class; kept on the row so class-wide queries need no join.
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.PROTECT, related_name="students")
+    section = models.ForeignKey(Section, on_delete=models.PROTECT, related_name="students")
     parent = models.ForeignKey(
         ParentProfile,
         on_delete=models.SET_NULL,
@@ -78,9 +120,10 @@ class StudentProfile(models.Model):
     address = models.CharField(max_length=255, blank=True)
 
     class Meta:
-        ordering = ["class_name", "admission_no"]
+        ordering = ["school_class__name", "admission_no"]
 
     def save(self, *args, **kwargs):
+        self.school_class_id = self.section.school_class_id
         if self.user.role != UserRole.STUDENT:
             self.user.role = UserRole.STUDENT
             self.user.save(update_fields=["role"])
@@ -111,11 +154,105 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ("student", "date")
         ordering = ["-date", "-marked_at"]
+        indexes = [
+            models.Index(fields=["student", "-date"], name="attendance_student_date_idx"),
+            models.Index(fields=["date", "-marked_at"], name="attendance_date_marked_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student.admission_no} - {self.date}"
 
 
+class AttendanceArchive(models.Model):
+    """One student's attendance for a closed academic year, packed by portal.archive.
+
+    ``days`` has bit ``i`` set when the student was present ``i`` days after
+    ``year_start``; ``manual_days`` marks which of those were manual. ``times``
+    holds one big-endian uint16 per present day, in date order: the local
+    minute of the day the mark was made.
+    """
+
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="attendance_archives")
+    year_start = models.DateField()
+    present = models.PositiveSmallIntegerField(default=0)
+    days = models.BinaryField()
+    manual_days = models.BinaryField()
+    times = models.BinaryField()
+
+    class Meta:
+        unique_together = ("student", "year_start")
+        ordering = ["-year_start"]
+
+    def __str__(self):
+        return f"{self.student.admission_no} - {self.year_start.year}"
+
+
+class AttendanceDailySummary(models.Model):
+    """Per-day, per-class attendance counts kept in step with Attendance by portal.summaries."""
+
+    date = models.DateField()
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name="daily_summaries")
+    enrolled = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    qr_count = models.PositiveIntegerField(default=0)
+    manual_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("date", "section")
+        ordering = ["-date", "section__school_class__name", "section__name"]
+
+    @property
+    def absent(self):
+        return max(self.enrolled - self.present, 0)
+
+    def __str__(self):
+        return f"{self.date} - {self.section}"
+
+
+class NotificationKind(models.TextChoices):
+    ABSENCE = "ABSENCE", "Absence"
+
+
+class NotificationStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    SENT = "SENT", "Sent"
+    FAILED = "FAILED", "Failed"
+
+
+class ParentNotification(models.Model):
+    """Outbox row for one message to a parent, delivered by portal.notifications.
+
+    A worker claims pending rows by writing its ``claim`` token and a lease
+    into ``claimed_until``; rows whose lease ran out (the worker died) are
+    claimed again. ``payload`` holds what the message is about, so the text is
+    rendered when it is sent.
+    """
+
+    parent = models.ForeignKey(ParentProfile, on_delete=models.CASCADE, related_name="notifications")
+    kind = models.CharField(max_length=12, choices=NotificationKind.choices)
+    date = models.DateField()
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=8, choices=NotificationStatus.choices, default=NotificationStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("parent", "kind", "date")
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="notification_due_idx"),
+            models.Index(fields=["claim"], name="notification_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.parent_id} - {self.date}"
+
+
 class NoticeAudience(models.TextChoices):
     ALL = "ALL", "All"
     STUDENT = "STUDENT", "Students"
@@ -137,7 +274,7 @@ class Notice(models.Model):
 
 
 class Homework(models.Model):
-    class_name = models.CharField(max_length=25)
+    school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE, related_name="homework")
     subject = models.CharField(max_length=80)
     title = models.CharField(max_length=120)
     description = models.TextField(blank=True)
@@ -147,9 +284,12 @@ class Homework(models.Model):
 
     class Meta:
         ordering = ["due_date", "-created_at"]
+        indexes = [
+            models.Index(fields=["school_class", "due_date"], name="homework_class_due_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.class_name} - {self.subject}"
+        return f"{self.school_class.name} - {self.subject}"
 
 
 class FeeRecord(models.Model):
@@ -162,6 +302,9 @@ class FeeRecord(models.Model):
 
     class Meta:
         ordering = ["due_date", "-created_at"]
+        indexes = [
+            models.Index(fields=["student", "due_date", "-created_at"], name="fee_student_due_idx"),
+        ]
 
     @property
     def due_amount(self):
@@ -0,0 +1,321 @@
+"""End-of-day absence notices for parents, sent through a durable outbox.
+
+``queue_absence_notifications`` finds the day's absentees with one
+``NOT EXISTS`` query against Attendance and writes one ParentNotification
+per parent (siblings share a message). ``drain_outbox`` runs outside the web
+process: it claims batches of due rows under a lease, hands them to a pool
+of threads that each hold one transport (one SMTP connection, say), and
+records the outcome. Failures are retried with exponential backoff until
+``max_attempts``; an :class:`UndeliverableNotification` fails the row at once.
+
+Delivery is at least once: the (parent, kind, date) key stops a day being
+queued twice, but a worker that dies between sending and recording a batch
+leaves those rows to be sent again once the lease runs out. Every message
+carries its outbox id so a receiving gateway can drop the repeat.
+"""
+import json
+import logging
+import sys
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Attendance, NotificationKind, NotificationStatus, ParentNotification, StudentProfile
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_WORKERS = 8
+OUTBOX_MAX_ATTEMPTS = 5
+# A claimed batch not recorded within this long is handed to another worker.
+OUTBOX_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = timedelta(minutes=1)
+
+NotificationMessage = namedtuple("NotificationMessage", ["id", "name", "email", "phone", "subject", "body"])
+
+
+class UndeliverableNotification(Exception):
+    """Raised by a transport when retrying cannot help (no address, for example)."""
+
+
+def _full_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def absentees_by_parent(day):
+    """``{parent_id: [student, ...]}`` for linked students with no mark on ``day``, in one query.
+
+    A day on which nobody was marked is taken to be no school day and has no absentees.
+    """
+    marked = Attendance.objects.filter(student_id=OuterRef("pk"), date=day)
+    rows = (
+        StudentProfile.objects.filter(Exists(Attendance.objects.filter(date=day)), parent__isnull=False)
+        .exclude(Exists(marked))
+        .order_by("parent_id", "admission_no")
+        .values_list(
+            "parent_id",
+            "id",
+            "admission_no",
+            "user__first_name",
+            "user__last_name",
+            "user__username",
+            "school_class__name",
+            "section__name",
+        )
+    )
+    return {
+        parent_id: [
+            {
+                "id": student_id,
+                "admission_no": admission_no,
+                "name": _full_name(first, last, username),
+                "class_name": class_name,
+                "section": section,
+            }
+            for _, student_id, admission_no, first, last, username, class_name, section in students
+        ]
+        for parent_id, students in groupby(rows.iterator(), key=itemgetter(0))
+    }
+
+
+def queue_absence_notifications(day):
+    """Write an outbox row for every parent with an absent child on ``day``; returns how many were new."""
+    absentees = absentees_by_parent(day)
+    queued = set(
+        ParentNotification.objects.filter(kind=NotificationKind.ABSENCE, date=day).values_list("parent_id", flat=True)
+    )
+    rows = [
+        ParentNotification(parent_id=parent_id, kind=NotificationKind.ABSENCE, date=day, payload={"students": students})
+        for parent_id, students in absentees.items()
+        if parent_id not in queued
+    ]
+    # ignore_conflicts covers a second run racing this one.
+    ParentNotification.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+def _absence_text(notification, name):
+    students = notification.payload["students"]
+    day = notification.date.strftime("%d %B %Y")
+    names = ", ".join(
+        f"{student['name']} ({student['class_name']} {student['section']})".replace(" )", ")") for student in students
+    )
+    subject = f"Absence on {day}: {', '.join(student['name'] for student in students)}"
+    body = (
+        f"Dear {name},\n\n"
+        f"The following {'child was' if len(students) == 1 else 'children were'} not marked present at school on "
+        f"{day}: {names}.\n\nPlease contact the school office if this is unexpected.\n"
+    )
+    return subject, body
+
+
+def build_message(notification):
+    user = notification.parent.user
+    name = _full_name(user.first_name, user.last_name, user.username)
+    subject, body = _absence_text(notification, name)
+    return NotificationMessage(notification.id, name, user.email, user.phone, subject, body)
+
+
+class NotificationTransport:
+    """Delivers messages; ``send`` raises to fail one. Each worker thread gets its own instance."""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, message):
+        raise NotImplementedError
+
+
+class ConsoleTransport(NotificationTransport):
+    lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            sys.stdout.write(f"[notification {message.id}] to {message.name} <{message.email or message.phone}>\n")
+            sys.stdout.write(f"Subject: {message.subject}\n\n{message.body}\n")
+            sys.stdout.flush()
+
+
+class FileTransport(NotificationTransport):
+    """Appends one JSON line per message to ``NOTIFICATION_FILE_PATH``, standing in for an SMS gateway."""
+
+    lock = threading.Lock()
+
+    def open(self):
+        settings.NOTIFICATION_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    def send(self, message):
+        line = json.dumps(message._asdict(), ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(settings.NOTIFICATION_FILE_PATH, "a", encoding="utf-8") as handle:
+                handle.write(line)
+
+
+class EmailTransport(NotificationTransport):
+    """Sends through Django's email backend, reusing one connection per worker thread."""
+
+    def open(self):
+        self.connection = mail.get_connection()
+        self.connection.open()
+
+    def close(self):
+        self.connection.close()
+
+    def send(self, message):
+        if not message.email:
+            raise UndeliverableNotification("Parent has no email address.")
+        email = mail.EmailMessage(
+            message.subject,
+            message.body,
+            to=[message.email],
+            connection=self.connection,
+            headers={"X-SchoolMS-Notification": str(message.id)},
+        )
+        email.send()
+
+
+NOTIFICATION_TRANSPORTS = {
+    "console": ConsoleTransport,
+    "file": FileTransport,
+    "email": EmailTransport,
+}
+
+
+def get_transport_class(name=None):
+    """A transport by short name or dotted path; defaults to ``PARENT_NOTIFICATION_TRANSPORT``."""
+    name = name or settings.PARENT_NOTIFICATION_TRANSPORT
+    return NOTIFICATION_TRANSPORTS.get(name) or import_string(name)
+
+
+def _claimable(now):
+    return Q(status=NotificationStatus.PENDING, next_attempt_at__lte=now) & (
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    )
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due notifications to this worker; returns ``(claim token, messages)``."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(
+            ParentNotification.objects.filter(_claimable(now)).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return token, []
+        # Re-checking the condition leaves out rows another worker claimed in between.
+        ParentNotification.objects.filter(_claimable(now), id__in=ids).update(
+            claim=token, claimed_until=now + OUTBOX_LEASE
+        )
+    return token, [
+        build_message(notification)
+        for notification in ParentNotification.objects.filter(claim=token).select_related("parent__user").order_by("id")
+    ]
+
+
+def _deliver(transport_class, messages):
+    """Send ``messages`` over one transport; returns ``{id: None | (permanent, error)}``."""
+    results = {}
+    transport = transport_class()
+    try:
+        transport.open()
+    except Exception as exc:
+        return {message.id: (False, f"{type(exc).__name__}: {exc}") for message in messages}
+    try:
+        for message in messages:
+            try:
+                transport.send(message)
+                results[message.id] = None
+            except UndeliverableNotification as exc:
+                results[message.id] = (True, str(exc))
+            except Exception as exc:
+                results[message.id] = (False, f"{type(exc).__name__}: {exc}")
+    finally:
+        try:
+            transport.close()
+        except Exception:
+            logger.exception("Closing %s failed.", transport_class.__name__)
+    return results
+
+
+def record_results(claim, results, max_attempts):
+    """Store the outcome of a batch leased under ``claim``; returns the ``(sent, failed)`` rows recorded.
+
+    Rows whose lease ran out and were claimed again by another worker are left to that worker.
+    """
+    now = timezone.now()
+    sent = ParentNotification.objects.filter(
+        claim=claim, id__in=[notification_id for notification_id, failure in results.items() if failure is None]
+    ).update(
+        status=NotificationStatus.SENT,
+        attempts=F("attempts") + 1,
+        sent_at=now,
+        claim="",
+        claimed_until=None,
+        last_error="",
+    )
+    failed = list(
+        ParentNotification.objects.filter(claim=claim, id__in=[key for key, failure in results.items() if failure])
+    )
+    for notification in failed:
+        permanent, error = results[notification.id]
+        notification.attempts += 1
+        notification.last_error = error[:255]
+        notification.claim = ""
+        notification.claimed_until = None
+        if permanent or notification.attempts >= max_attempts:
+            notification.status = NotificationStatus.FAILED
+        else:
+            notification.next_attempt_at = now + RETRY_BASE_DELAY * 2 ** (notification.attempts - 1)
+    ParentNotification.objects.bulk_update(
+        failed, ["attempts", "last_error", "claim", "claimed_until", "status", "next_attempt_at"]
+    )
+    if sent + len(failed) < len(results):
+        logger.warning(
+            "Dropped %d notification results: their lease ran out and another worker claimed them.",
+            len(results) - sent - len(failed),
+        )
+    return sent, len(failed)
+
+
+def drain_outbox(
+    transport_class=None, batch_size=OUTBOX_BATCH_SIZE, workers=OUTBOX_WORKERS, max_attempts=OUTBOX_MAX_ATTEMPTS
+):
+    """Send every due notification; returns ``(sent, failed)`` attempt counts.
+
+    At most ``workers`` transports are open at once. Rows that fail but may
+    be retried come due again later and are left for the next run.
+    """
+    transport_class = transport_class or get_transport_class()
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            claim, messages = claim_batch(batch_size)
+            if not messages:
+                break
+            chunk_size = -(-len(messages) // workers)
+            results = {}
+            for chunk_results in pool.map(
+                lambda chunk: _deliver(transport_class, chunk),
+                [messages[start : start + chunk_size] for start in range(0, len(messages), chunk_size)],
+            ):
+                results.update(chunk_results)
+            batch_sent, batch_failed = record_results(claim, results, max_attempts)
+            sent += batch_sent
+            failed += batch_failed
+    return sent, failed
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = "schoolms-keyset-cursor"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str | None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _cursor_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    return signing.dumps([_cursor_value(value) for value in values], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature as exc:
+        raise InvalidCursor("Cursor is invalid.") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Cursor does not match this listing.")
+    return values
+
+
+def _after(ordering, values):
+    # (a, b, c) > (x, y, z) expanded as: a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+    # with ">" flipped to "<" for descending fields.
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_queryset(queryset, ordering, cursor=None):
+    """``queryset`` in ``ordering``, limited to the rows after ``cursor``."""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, len(ordering))))
+    return queryset
+
+
+def keyset_page(items, ordering, page_size):
+    """Build a page from up to ``page_size + 1`` items already sorted in ``ordering``."""
+    items = list(items)
+    if len(items) <= page_size:
+        return KeysetPage(items, None)
+
+    items = items[:page_size]
+    last = items[-1]
+    return KeysetPage(items, encode_cursor([getattr(last, field.lstrip("-")) for field in ordering]))
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=20):
+    """Return the page of ``queryset`` after ``cursor`` in ``ordering``.
+
+    The last field in ``ordering`` must be unique so the sort is total. Each
+    page is an index range scan, so page N costs the same as page 1.
+    """
+    return keyset_page(keyset_queryset(queryset, ordering, cursor)[: page_size + 1], ordering, page_size)
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import hmac
+import json
+import re
+import struct
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .files import write_atomic
+
+try:
+    import qrcode  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    qrcode = None
+
+
+QR_SIGNER = signing.Signer(salt="schoolms-qr-attendance")
+QR_RENDERING_AVAILABLE = qrcode is not None
+QR_MEMORY_CACHE_SIZE = 256
+
+# Compact tokens: "SM" + unpadded base32 of
+#   version (1 byte) | key id (1 byte) | student id (uint32) | [valid from, valid until (uint16 days)] | HMAC (8 bytes)
+# Every character is in the QR alphanumeric set, so 25-31 characters fit a version 2 code.
+COMPACT_QR_PREFIX = "SM"
+COMPACT_QR_VERSION = 1
+COMPACT_QR_MAC_BYTES = 8
+COMPACT_QR_EPOCH = date(2000, 1, 1)
+_COMPACT_HEADER = struct.Struct(">BBI")
+_COMPACT_WINDOW = struct.Struct(">HH")
+_BASE32_TOKEN = re.compile(r"[A-Z2-7]+")
+# RFC 4648 base32 digits -> the digits int(..., 32) understands; much faster than base64.b32decode.
+_BASE32_TO_INT_DIGITS = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", "0123456789abcdefghijklmnopqrstuv")
+
+
+def build_student_qr_token(student_id):
+    return QR_SIGNER.sign(str(student_id))
+
+
+@lru_cache(maxsize=16)
+def _keyed_hmac(secret):
+    key = hashlib.sha256(b"schoolms-qr-compact:" + secret.encode("utf-8")).digest()
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+
+def _compact_mac(key_id, body):
+    try:
+        secret = settings.QR_SIGNING_KEYS[key_id]
+    except KeyError:
+        raise signing.BadSignature(f"Unknown QR key id {key_id}")
+    mac = _keyed_hmac(secret).copy()
+    mac.update(body)
+    return mac.digest()[:COMPACT_QR_MAC_BYTES]
+
+
+def _base32_decode(encoded):
+    """Decode unpadded base32, rejecting anything ``b32encode`` would not have produced."""
+    if not _BASE32_TOKEN.fullmatch(encoded):
+        raise signing.BadSignature("QR token is not valid base32")
+    bits = 5 * len(encoded)
+    size, padding = divmod(bits, 8)
+    value = int(encoded.translate(_BASE32_TO_INT_DIGITS), 32)
+    if value & ((1 << padding) - 1):
+        raise signing.BadSignature("QR token is not valid base32")
+    return (value >> padding).to_bytes(size, "big")
+
+
+def _epoch_days(day):
+    return (day - COMPACT_QR_EPOCH).days
+
+
+def build_compact_qr_token(student_id, valid_from=None, valid_until=None, key_id=None):
+    """Sign ``student_id`` as a compact token, optionally valid only between two dates (inclusive)."""
+    key_id = settings.QR_ACTIVE_KEY_ID if key_id is None else key_id
+    body = _COMPACT_HEADER.pack(COMPACT_QR_VERSION, key_id, student_id)
+    if valid_from is not None or valid_until is not None:
+        body += _COMPACT_WINDOW.pack(
+            _epoch_days(valid_from or COMPACT_QR_EPOCH),
+            _epoch_days(valid_until) if valid_until is not None else 0xFFFF,
+        )
+    encoded = base64.b32encode(body + _compact_mac(key_id, body)).decode("ascii").rstrip("=")
+    return COMPACT_QR_PREFIX + encoded
+
+
+def _resolve_compact_token(token, today):
+    raw = _base32_decode(token[len(COMPACT_QR_PREFIX):])
+    body, mac = raw[:-COMPACT_QR_MAC_BYTES], raw[-COMPACT_QR_MAC_BYTES:]
+    if len(body) not in (_COMPACT_HEADER.size, _COMPACT_HEADER.size + _COMPACT_WINDOW.size):
+        raise signing.BadSignature("QR token has the wrong length")
+    version, key_id, student_id = _COMPACT_HEADER.unpack_from(body)
+    if version != COMPACT_QR_VERSION:
+        raise signing.BadSignature(f"Unsupported QR token version {version}")
+    if not hmac.compare_digest(mac, _compact_mac(key_id, body)):
+        raise signing.BadSignature("QR token signature does not match")
+
+    if len(body) > _COMPACT_HEADER.size:
+        valid_from, valid_until = _COMPACT_WINDOW.unpack_from(body, _COMPACT_HEADER.size)
+        if not valid_from <= _epoch_days(today or timezone.localdate()) <= valid_until:
+            raise signing.SignatureExpired("QR token is outside its validity window")
+    return student_id
+
+
+def resolve_student_id_from_qr(qr_data, today=None):
+    """Return the student id in a scanned QR, or raise ``BadSignature`` (``ValueError`` if malformed).
+
+    Accepts compact tokens and, for cards printed before them, the JSON
+    payload and bare ``Signer`` token formats. ``today`` (the local date by
+    default) is only needed for compact tokens with a validity window.
+    """
+    raw_token = (qr_data or "").strip()
+    if not raw_token:
+        raise signing.BadSignature("Empty QR data")
+    if raw_token.startswith(COMPACT_QR_PREFIX):
+        return _resolve_compact_token(raw_token, today)
+
+    try:
+        payload = json.loads(raw_token)
+        if isinstance(payload, dict) and payload.get("token"):
+            raw_token = payload["token"]
+    except json.JSONDecodeError:
+        pass
+
+    unsigned = QR_SIGNER.unsign(raw_token)
+    return int(unsigned)
+
+
+def build_student_qr_payload(student):
+    return build_compact_qr_token(student.id)
+
+
+def qr_version(payload_text):
+    """Smallest QR version (1-40) that holds ``payload_text``, or ``None`` without the ``qrcode`` package."""
+    if qrcode is None:
+        return None
+    code = qrcode.QRCode()
+    code.add_data(payload_text)
+    code.make(fit=True)
+    return code.version
+
+
+def qr_payload_digest(payload_text):
+    return hashlib.sha256(payload_text.encode("utf-8")).hexdigest()[:32]
+
+
+def _disk_cache_path(payload_text):
+    return settings.QR_CACHE_DIR / f"{qr_payload_digest(payload_text)}.png"
+
+
+@lru_cache(maxsize=QR_MEMORY_CACHE_SIZE)
+def render_qr_png(payload_text):
+    """PNG bytes for ``payload_text``; served from memory, then disk, rendering only on a full miss."""
+    cache_path = _disk_cache_path(payload_text)
+    try:
+        return cache_path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    qr_img = qrcode.make(payload_text)
+    qr_buf = BytesIO()
+    qr_img.save(qr_buf, format="PNG")
+    png = qr_buf.getvalue()
+    try:
+        write_atomic(cache_path, png)
+    except OSError:
+        # A read-only or full disk only costs us the on-disk cache.
+        pass
+    return png
@@ -0,0 +1,187 @@
+"""Class attendance registers: students x school days, with per-student and per-class percentages.
+
+The ``(student_id, date)`` pairs for a class and period are fetched in one
+indexed integer lookup and scattered into a NumPy boolean matrix, so totals and percentages
+are row/column sums rather than Python loops. Computed registers are cached
+per (class, section, period) and invalidated by a per-class version stamp
+that ``adjust_attendance_summary`` bumps whenever attendance for that class
+changes, or when the period gains a school day.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .archive import ARCHIVE_VERSION, archived_marks
+from .exports import csv_chunks
+from .models import Attendance, AttendanceArchive, AttendanceDailySummary
+from .roster import ROSTER_VERSION, class_roster
+from .versions import bump_version_on_commit, current_version
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+REGISTER_AVAILABLE = np is not None
+REGISTER_CACHE_TIMEOUT = 60 * 60
+MAX_REGISTER_DAYS = 366
+
+
+def register_version_name(school_class_id):
+    return f"register-{school_class_id}"
+
+
+def bump_register_version(school_class_id):
+    bump_version_on_commit(register_version_name(school_class_id))
+
+
+@dataclass
+class AttendanceRegister:
+    class_name: str
+    section: str
+    start: date
+    end: date
+    students: list
+    days: list
+    marks: "np.ndarray"
+
+    @property
+    def student_totals(self):
+        return self.marks.sum(axis=1)
+
+    @property
+    def day_totals(self):
+        return self.marks.sum(axis=0)
+
+    @property
+    def student_percentages(self):
+        if not self.days:
+            return np.zeros(len(self.students))
+        return self.student_totals * 100.0 / len(self.days)
+
+    @property
+    def day_percentages(self):
+        if not self.students:
+            return np.zeros(len(self.days))
+        return self.day_totals * 100.0 / len(self.students)
+
+    @property
+    def class_percentage(self):
+        return float(self.marks.mean() * 100) if self.marks.size else 0.0
+
+    def rows(self):
+        """One dict per student for templates; ``marks`` is a plain list of booleans."""
+        return [
+            {
+                "admission_no": admission_no,
+                "name": name,
+                "marks": marks,
+                "present": int(present),
+                "percentage": round(float(percentage), 1),
+            }
+            for (admission_no, name), marks, present, percentage in zip(
+                self.students, self.marks.tolist(), self.student_totals, self.student_percentages
+            )
+        ]
+
+    def csv_rows(self):
+        for row in self.rows():
+            yield [
+                row["admission_no"],
+                row["name"],
+                *("P" if mark else "A" for mark in row["marks"]),
+                row["present"],
+                len(self.days),
+                row["percentage"],
+            ]
+        yield [
+            "",
+            "Present",
+            *(int(total) for total in self.day_totals),
+            int(self.student_totals.sum()),
+            len(self.days) * len(self.students),
+            round(self.class_percentage, 1),
+        ]
+
+    def csv_header(self):
+        return ["Admission No", "Student", *(day.isoformat() for day in self.days), "Present", "Days", "%"]
+
+
+def recorded_school_days(start, end):
+    # There is no school calendar; a school day is any day on which some class took attendance.
+    recorded = AttendanceDailySummary.objects.filter(date__range=(start, end), present__gt=0)
+    return set(recorded.values_list("date", flat=True).distinct())
+
+
+def build_register(school_class, section, start, end, school_days=None):
+    """Register of ``school_class`` (a SchoolClass), or only of ``section`` when one is given.
+
+    ``school_days`` is :func:`recorded_school_days` for the period, if the caller already has it.
+    """
+    section_id = section.id if section else None
+    roster = class_roster(school_class.id, section_id)
+    student_index = {row[0]: position for position, row in enumerate(roster)}
+
+    pair_filter = Q(date__range=(start, end), student__school_class_id=school_class.id)
+    if section_id:
+        pair_filter &= Q(student__section_id=section_id)
+    pairs = list(Attendance.objects.filter(pair_filter).values_list("student_id", "date"))
+    archives = AttendanceArchive.objects.filter(student_id__in=list(student_index))
+    pairs.extend((mark.student_id, mark.date) for mark in archived_marks(start, end, archives))
+
+    if school_days is None:
+        school_days = recorded_school_days(start, end)
+    days = sorted(school_days | {day for _, day in pairs})
+    day_index = {day: position for position, day in enumerate(days)}
+
+    marks = np.zeros((len(roster), len(days)), dtype=bool)
+    if pairs:
+        rows = np.fromiter((student_index.get(student_id, -1) for student_id, _ in pairs), dtype=np.int64, count=len(pairs))
+        columns = np.fromiter((day_index[day] for _, day in pairs), dtype=np.int64, count=len(pairs))
+        known = rows >= 0
+        marks[rows[known], columns[known]] = True
+
+    return AttendanceRegister(
+        class_name=school_class.name,
+        section=section.name if section else "",
+        start=start,
+        end=end,
+        students=[(admission_no, name) for _, admission_no, name in roster],
+        days=days,
+        marks=marks,
+    )
+
+
+def attendance_register(school_class, section, start, end):
+    """Cached :func:`build_register`; recomputed once attendance or the roster changes.
+
+    The class's own stamp misses a day on which only other classes took attendance, which still
+    adds a column to this register, so the school days themselves are part of the key.
+    """
+    school_days = recorded_school_days(start, end)
+    key_source = "|".join(
+        [
+            str(school_class.id),
+            str(section.id if section else ""),
+            start.isoformat(),
+            end.isoformat(),
+            current_version(ROSTER_VERSION),
+            current_version(register_version_name(school_class.id)),
+            current_version(ARCHIVE_VERSION),
+            ",".join(day.isoformat() for day in sorted(school_days)),
+        ]
+    )
+    key = "register:" + hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:32]
+    register = cache.get(key)
+    if register is None:
+        register = build_register(school_class, section, start, end, school_days)
+        cache.set(key, register, REGISTER_CACHE_TIMEOUT)
+    return register
+
+
+def register_csv_chunks(register):
+    return csv_chunks(register.csv_header(), register.csv_rows())
@@ -0,0 +1,142 @@
+import threading
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import StudentProfile
+from .versions import bump_version_on_commit, current_version
+
+
+ROSTER_VERSION = "roster"
+ROSTER_FIELDS = (
+    "admission_no",
+    "user__first_name",
+    "user__last_name",
+    "user__username",
+    "school_class__name",
+    "section__name",
+    "school_class_id",
+    "section_id",
+)
+CLASS_ROSTER_TIMEOUT = 60 * 60
+
+RosterEntry = namedtuple(
+    "RosterEntry", ["admission_no", "display_name", "class_name", "section", "school_class_id", "section_id"]
+)
+
+
+def _display_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def _roster_entry(admission_no, first_name, last_name, username, class_name, section, school_class_id, section_id):
+    return RosterEntry(
+        admission_no, _display_name(first_name, last_name, username), class_name, section, school_class_id, section_id
+    )
+
+
+class RosterCache:
+    """Per-process map of student id -> RosterEntry for the scan hot path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._version = None
+        self._snapshot = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _reload(self, version):
+        rows = StudentProfile.objects.values_list("id", *ROSTER_FIELDS).order_by()
+        self._entries = {pk: _roster_entry(*fields) for pk, *fields in rows}
+        self._snapshot = None
+        self._version = version
+        self.reloads += 1
+
+    def _current_entries(self):
+        version = current_version(ROSTER_VERSION)
+        if self._entries is None or self._version != version:
+            with self._lock:
+                if self._entries is None or self._version != version:
+                    self._reload(version)
+        return self._entries
+
+    def _get(self, entries, student_id):
+        entry = entries.get(student_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        # Rows created without signals (bulk imports) are picked up here without a full reload.
+        self.misses += 1
+        row = StudentProfile.objects.filter(pk=student_id).values_list(*ROSTER_FIELDS).first()
+        if row is None:
+            return None
+        entry = entries[student_id] = _roster_entry(*row)
+        return entry
+
+    def get(self, student_id):
+        """Return the student's RosterEntry, or ``None`` if the student does not exist."""
+        return self._get(self._current_entries(), student_id)
+
+    def get_many(self, student_ids):
+        """``{student_id: RosterEntry}`` for the ids that exist, checking the roster version once for the batch."""
+        entries = self._current_entries()
+        return {
+            student_id: entry for student_id in student_ids if (entry := self._get(entries, student_id)) is not None
+        }
+
+    def snapshot(self):
+        """Return ``(version, rows)`` with one ``[id, admission_no, name, class, section]`` list per student.
+
+        The rows are built once per roster version (and again when a miss in
+        :meth:`get` has added a student), so scanner devices refreshing the
+        roster do not re-walk every entry.
+        """
+        entries = self._current_entries()
+        version, rows = self._version, self._snapshot
+        if rows is None or len(rows) != len(entries):
+            rows = self._snapshot = [
+                [pk, entry.admission_no, entry.display_name, entry.class_name, entry.section]
+                for pk, entry in list(entries.items())
+            ]
+        return version, rows
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+        bump_version_on_commit(ROSTER_VERSION)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "size": len(self._entries or ()),
+            "version": self._version,
+        }
+
+
+roster_cache = RosterCache()
+
+
+def class_roster(school_class_id, section_id=None):
+    """``[(student_id, admission_no, display_name), ...]`` of a class or one section, by admission number.
+
+    Cached per roster version, so any student save or delete rebuilds it.
+    """
+    key = f"class-roster:{current_version(ROSTER_VERSION)}:{school_class_id}:{section_id or ''}"
+    roster = cache.get(key)
+    if roster is None:
+        students = StudentProfile.objects.filter(school_class_id=school_class_id)
+        if section_id:
+            students = students.filter(section_id=section_id)
+        rows = students.order_by("admission_no").values_list(
+            "id", "admission_no", "user__first_name", "user__last_name", "user__username"
+        )
+        roster = [
+            (pk, admission_no, _display_name(first, last, username)) for pk, admission_no, first, last, username in rows
+        ]
+        cache.set(key, roster, CLASS_ROSTER_TIMEOUT)
+    return roster
@@ -0,0 +1,190 @@
+from contextlib import contextmanager
+from operator import attrgetter
+
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .attendance import daily_presence
+from .content import HOMEWORK_VERSION, NOTICES_VERSION
+from .history import FEES_VERSION
+from .identity import invalidate_identities, invalidate_identity
+from .lookup import PARENTS_VERSION
+from .metrics import install_query_observer
+from .models import (
+    Attendance,
+    FeeRecord,
+    Homework,
+    Notice,
+    ParentProfile,
+    SchoolClass,
+    Section,
+    StudentProfile,
+    User,
+    UserRole,
+)
+from .roster import roster_cache
+from .summaries import adjust_attendance_summary, refresh_enrolled
+from .versions import bump_version_on_commit
+from .writebehind import attendance_writer
+
+
+@receiver(connection_created)
+def observe_connection_queries(sender, connection, **kwargs):
+    install_query_observer(connection)
+
+
+@receiver(request_started)
+def replay_attendance_journal(sender, **kwargs):
+    # Once per process, so marks journalled by a worker that crashed are stored before the first request
+    # is served rather than whenever the next scan happens to arrive.
+    request_started.disconnect(replay_attendance_journal)
+    attendance_writer.recover()
+
+
+@receiver(pre_save, sender=StudentProfile)
+def remember_previous_parent(sender, instance, raw=False, **kwargs):
+    # A parent who loses the child has to lose it from their cached identity too.
+    instance._previous_parent_id = (
+        None if raw or instance.pk is None
+        else StudentProfile.objects.filter(pk=instance.pk).values_list("parent_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def invalidate_roster_for_student(sender, instance, **kwargs):
+    roster_cache.invalidate()
+    # The student's identity, and the children of the parents it is or was linked to.
+    parent_ids = {instance.parent_id, getattr(instance, "_previous_parent_id", None)} - {None}
+    user_ids = {instance.user_id}
+    if instance.parent_id is not None and StudentProfile.parent.is_cached(instance):
+        user_ids.add(instance.parent.user_id)
+        parent_ids.discard(instance.parent_id)
+    if parent_ids:
+        user_ids.update(ParentProfile.objects.filter(pk__in=parent_ids).values_list("user_id", flat=True))
+    for user_id in user_ids:
+        invalidate_identity(user_id)
+    refresh_enrolled(timezone.localdate())
+
+
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=SchoolClass)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def invalidate_roster_for_class(sender, instance, **kwargs):
+    # Rosters and cached profiles carry the class and section names.
+    roster_cache.invalidate()
+    invalidate_identities()
+
+
+@receiver(post_save, sender=SchoolClass)
+def create_unnamed_section(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Section.objects.get_or_create(school_class=instance, name="")
+
+
+@receiver(post_save, sender=ParentProfile)
+@receiver(post_delete, sender=ParentProfile)
+def invalidate_parent_lookup(sender, instance, **kwargs):
+    bump_version_on_commit(PARENTS_VERSION)
+    invalidate_identity(instance.user_id)
+
+
+@receiver(post_save, sender=Notice)
+@receiver(post_delete, sender=Notice)
+def invalidate_notices(sender, instance, **kwargs):
+    bump_version_on_commit(NOTICES_VERSION)
+
+
+@receiver(post_save, sender=Homework)
+@receiver(post_delete, sender=Homework)
+def invalidate_homework(sender, instance, **kwargs):
+    bump_version_on_commit(HOMEWORK_VERSION)
+
+
+@receiver(post_save, sender=FeeRecord)
+@receiver(post_delete, sender=FeeRecord)
+def invalidate_fees(sender, instance, **kwargs):
+    bump_version_on_commit(FEES_VERSION)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_rosters_for_user(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login on every user; the cached identity only goes stale on other changes.
+    # A new password must reach every worker, since the session hash is checked against it.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_identity(instance.pk)
+    # Only name/username changes matter to the rosters.
+    if update_fields is not None and set(update_fields) <= {"last_login", "password"}:
+        return
+    if instance.role == UserRole.STUDENT:
+        roster_cache.invalidate()
+    elif instance.role == UserRole.PARENT:
+        bump_version_on_commit(PARENTS_VERSION)
+
+
+# What decides which summary row and count an Attendance row is counted in.
+summary_bucket = attrgetter("date", "student_id", "method")
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_stored_attendance(sender, instance, raw=False, **kwargs):
+    # An edit can move the mark to another day, student or method; the summary has to move it too.
+    stored = (
+        None if raw or instance.pk is None
+        else Attendance.objects.filter(pk=instance.pk).values("date", "student_id", "method").first()
+    )
+    instance._stored_attendance = Attendance(**stored) if stored else None
+
+
+@receiver(post_save, sender=Attendance)
+def track_attendance_save(sender, instance, created, **kwargs):
+    # New rows are recorded in presence by the marking code itself; only edits can move a mark
+    # to another day.
+    if created:
+        adjust_attendance_summary(instance.date, [instance])
+        return
+    daily_presence.invalidate()
+    stored = getattr(instance, "_stored_attendance", None)
+    if stored is not None and summary_bucket(stored) != summary_bucket(instance):
+        adjust_attendance_summary(stored.date, [stored], sign=-1)
+        adjust_attendance_summary(instance.date, [instance])
+
+
+@receiver(post_delete, sender=Attendance)
+def track_attendance_delete(sender, instance, **kwargs):
+    daily_presence.invalidate()
+    adjust_attendance_summary(instance.date, [instance], sign=-1)
+
+
+# Receivers that keep caches and summaries in step one deleted row at a time.
+ROW_DELETE_RECEIVERS = (
+    (track_attendance_delete, Attendance),
+    (invalidate_fees, FeeRecord),
+    (invalidate_notices, Notice),
+    (invalidate_homework, Homework),
+    (invalidate_roster_for_student, StudentProfile),
+    (invalidate_parent_lookup, ParentProfile),
+    (invalidate_rosters_for_user, User),
+)
+
+
+@contextmanager
+def row_delete_receivers_disconnected():
+    """Run bulk deletes without the per-row receivers; the caller refreshes what they would have.
+
+    With no receivers left, ``QuerySet.delete()`` also deletes related rows with one query per table
+    instead of loading them.
+    """
+    for handler, sender in ROW_DELETE_RECEIVERS:
+        post_delete.disconnect(handler, sender=sender)
+    try:
+        yield
+    finally:
+        for handler, sender in ROW_DELETE_RECEIVERS:
+            post_delete.connect(handler, sender=sender)
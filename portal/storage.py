@@ -0,0 +1,69 @@
+"""Static files storage: hashed names plus precompressed ``.gz``/``.br`` variants.
+
+``collectstatic`` writes ``app.<hash>.css`` next to ``app.css`` and records
+the mapping in ``staticfiles.json``; ``{% static %}`` then emits the hashed
+name, so the web server can mark those files immutable. Compressible files
+also get ``.gz`` (and ``.br`` when the ``brotli`` package is installed)
+siblings that the ``.htaccess`` rules serve to clients that accept them.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+BROTLI_AVAILABLE = brotli is not None
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".json", ".map", ".svg", ".txt", ".html", ".xml")
+# Smaller files are not worth a second request-path lookup on the server.
+MIN_COMPRESS_SIZE = 256
+# Variants that save less than this fraction are skipped.
+MIN_COMPRESS_SAVING = 0.05
+
+
+def _encoders():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if BROTLI_AVAILABLE:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # No manifest yet (runserver with DEBUG off, the test runner): serve the unhashed name.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        names = {*paths, *self.hashed_files.values()}
+        for name in sorted(names):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write the compressed variants of ``name`` and return their names."""
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return []
+        with self.open(name) as handle:
+            data = handle.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return []
+
+        written = []
+        for suffix, encode in _encoders():
+            compressed = encode(data)
+            if len(compressed) > len(data) * (1 - MIN_COMPRESS_SAVING):
+                # Do not leave a variant from an earlier collectstatic behind.
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                continue
+            with open(self.path(name + suffix), "wb") as handle:
+                handle.write(compressed)
+            written.append(name + suffix)
+        return written
@@ -0,0 +1,171 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .archive import archive_boundary
+from .models import Attendance, AttendanceDailySummary, AttendanceMethod, StudentProfile
+from .registers import bump_register_version
+from .roster import roster_cache
+
+
+METHOD_COUNT_FIELDS = {
+    AttendanceMethod.QR: "qr_count",
+    AttendanceMethod.MANUAL: "manual_count",
+}
+
+
+def _enrolment_by_section():
+    return dict(StudentProfile.objects.values_list("section_id").annotate(total=Count("id")).order_by())
+
+
+def refresh_enrolled(day):
+    """Bring ``enrolled`` for ``day`` in line with the current roster, creating rows for new classes."""
+    enrolment = _enrolment_by_section()
+    with transaction.atomic():
+        existing = {row.section_id: row for row in AttendanceDailySummary.objects.filter(date=day)}
+        changed = []
+        for section_id, row in existing.items():
+            enrolled = enrolment.get(section_id, 0)
+            if row.enrolled != enrolled:
+                row.enrolled = enrolled
+                changed.append(row)
+        AttendanceDailySummary.objects.bulk_update(changed, ["enrolled"])
+        AttendanceDailySummary.objects.bulk_create(
+            [
+                AttendanceDailySummary(date=day, section_id=section_id, enrolled=enrolled)
+                for section_id, enrolled in enrolment.items()
+                if section_id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _summary_rows(day):
+    return list(
+        AttendanceDailySummary.objects.filter(date=day)
+        .select_related("section__school_class")
+        .order_by("section__school_class__name", "section__name")
+    )
+
+
+def daily_summary_rows(day):
+    rows = _summary_rows(day)
+    if rows:
+        return rows
+    refresh_enrolled(day)
+    return _summary_rows(day)
+
+
+def _apply_delta(day, section_id, deltas):
+    updates = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+        if delta
+    }
+    if not updates:
+        return
+    rows = AttendanceDailySummary.objects.filter(date=day, section_id=section_id)
+    if rows.update(**updates):
+        return
+    # First mark of the day (or of a class created since the rows were built).
+    refresh_enrolled(day)
+    AttendanceDailySummary.objects.get_or_create(date=day, section_id=section_id)
+    rows.update(**updates)
+
+
+def _apply_deltas(day, deltas):
+    """Apply several classes' deltas for ``day`` in one UPDATE instead of one per class."""
+    rows = AttendanceDailySummary.objects.filter(date=day, section_id__in=list(deltas))
+    existing = set(rows.values_list("section_id", flat=True))
+    if len(existing) < len(deltas):
+        refresh_enrolled(day)
+        for section_id in set(deltas) - existing:
+            AttendanceDailySummary.objects.get_or_create(date=day, section_id=section_id)
+
+    fields = sorted({field for counter in deltas.values() for field, delta in counter.items() if delta})
+    updates = {}
+    for field in fields:
+        change = Case(
+            *(
+                When(section_id=section_id, then=Value(counter[field]))
+                for section_id, counter in deltas.items()
+                if counter[field]
+            ),
+            default=Value(0),
+        )
+        updates[field] = Greatest(F(field) + change, Value(0))
+    if updates:
+        rows.update(**updates)
+
+
+def adjust_attendance_summary(day, attendances, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) Attendance rows from the summary for ``day``."""
+    students = roster_cache.get_many({attendance.student_id for attendance in attendances})
+    deltas = {}
+    class_ids = set()
+    for attendance in attendances:
+        student = students.get(attendance.student_id)
+        if student is None:
+            continue
+        class_ids.add(student.school_class_id)
+        counter = deltas.setdefault(student.section_id, Counter())
+        counter["present"] += sign
+        counter[METHOD_COUNT_FIELDS.get(attendance.method, "qr_count")] += sign
+
+    if len(deltas) == 1:
+        [(section_id, counter)] = deltas.items()
+        _apply_delta(day, section_id, counter)
+    elif deltas:
+        _apply_deltas(day, deltas)
+    for school_class_id in class_ids:
+        bump_register_version(school_class_id)
+
+
+def rebuild_daily_summary(start, end):
+    """Recompute summary rows for every date in ``[start, end]`` from Attendance; returns rows written.
+
+    Historical enrolment is not stored, so ``enrolled`` reflects the current roster.
+    Archived years are skipped: their summary rows were kept when the marks moved out.
+    """
+    boundary = archive_boundary()
+    if boundary is not None and start < boundary:
+        start = boundary
+        if end < start:
+            return 0
+    counts = (
+        Attendance.objects.filter(date__range=(start, end))
+        .values("date", "student__section_id")
+        .annotate(
+            present=Count("id"),
+            qr_count=Count("id", filter=Q(method=AttendanceMethod.QR)),
+            manual_count=Count("id", filter=Q(method=AttendanceMethod.MANUAL)),
+        )
+        .order_by()
+    )
+    by_day = {}
+    for row in counts:
+        by_day.setdefault(row["date"], {})[row["student__section_id"]] = row
+
+    enrolment = _enrolment_by_section()
+    rows = []
+    for day, sections in sorted(by_day.items()):
+        for section_id in sorted(set(enrolment) | set(sections)):
+            counted = sections.get(section_id, {})
+            rows.append(
+                AttendanceDailySummary(
+                    date=day,
+                    section_id=section_id,
+                    enrolled=enrolment.get(section_id, 0),
+                    present=counted.get("present", 0),
+                    qr_count=counted.get("qr_count", 0),
+                    manual_count=counted.get("manual_count", 0),
+                )
+            )
+
+    with transaction.atomic():
+        AttendanceDailySummary.objects.filter(date__range=(start, end)).delete()
+        AttendanceDailySummary.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
@@ -0,0 +1,28 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import record_template_render
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template_render(self.origin.template_name or "<string>", time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose top-level renders are timed for Server-Timing and ``/metrics``.
+
+    Included and extended templates render inside their parent, so each
+    response is counted once, under the template the view asked for.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,40 @@
+"""Test runner that keeps the suite's files out of the project tree."""
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedDiscoverRunner(DiscoverRunner):
+    """``DiscoverRunner`` with caches, QR images, journals and stamps under a temporary directory.
+
+    Without it the suite would write into ``var/`` next to a real deployment's data.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        self._state_dir = tempfile.TemporaryDirectory(prefix="schoolms-tests-")
+        root = Path(self._state_dir.name)
+        self._overrides = override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "schoolms-tests"},
+                "sessions": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": root / "sessions",
+                },
+            },
+            QR_CACHE_DIR=root / "qr",
+            QR_CARD_DIR=root / "qr_cards",
+            VERSION_STAMP_DIR=root / "versions",
+            ATTENDANCE_JOURNAL_DIR=root / "attendance_journal",
+            NOTIFICATION_FILE_PATH=root / "notifications" / "outbox.jsonl",
+            # Test accounts are created by the hundred; the production hasher would dominate the run.
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+        )
+        self._overrides.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._overrides.disable()
+        self._state_dir.cleanup()
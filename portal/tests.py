@@ -1,3 +1,1795 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError, SystemCheckError
+from django.core.signals import request_started
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import (
+    AsyncClient,
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .archive import archive_boundary
+from .assets import HTML5_QRCODE_STATIC
+from .attendance import MAX_SCAN_BATCH_SIZE, daily_presence
+from .benchmarks import (
+    benchmark_fixtures,
+    benchmark_requests,
+    compare_to_baseline,
+    run_benchmarks,
+    run_qr_token_benchmarks,
+    url_names,
+)
+from .cards import _class_lock, build_class_sheets, class_sheet_path, students_by_class
+from .decorators import query_budget
+from .exports import (
+    ATTENDANCE_EXPORT_HEADER,
+    EXPORT_CONTENT_TYPES,
+    FEE_EXPORT_HEADER,
+    attendance_export_rows,
+)
+from .forms import RegisterForm
+from .identity import cached_user
+from .history import attendance_history_item, attendance_history_page, fee_history_page
+from .lookup import search_parents, search_students
+from .metrics import metrics
+from .models import (
+    Attendance,
+    AttendanceArchive,
+    AttendanceDailySummary,
+    AttendanceMethod,
+    FeeRecord,
+    Homework,
+    Notice,
+    NoticeAudience,
+    NotificationStatus,
+    ParentNotification,
+    ParentProfile,
+    SchoolClass,
+    Section,
+    StudentProfile,
+    User,
+    UserRole,
+)
+from .notifications import (
+    NotificationTransport,
+    UndeliverableNotification,
+    absentees_by_parent,
+    claim_batch,
+    drain_outbox,
+    queue_absence_notifications,
+    record_results,
+)
+from .qr import (
+    QR_RENDERING_AVAILABLE,
+    build_compact_qr_token,
+    build_student_qr_payload,
+    build_student_qr_token,
+    qr_payload_digest,
+    qr_version,
+    render_qr_png,
+    resolve_student_id_from_qr,
+)
+from .registers import REGISTER_AVAILABLE, attendance_register, build_register
+from .summaries import adjust_attendance_summary
+from .roster import class_roster, roster_cache
+from .signals import replay_attendance_journal
+from .urls import urlpatterns
+from .versions import current_version
+from .writebehind import AttendanceWriteBehind, write_attendance_records
+
+
+def class_section(class_name="5", section=""):
+    school_class, _ = SchoolClass.objects.get_or_create(name=class_name)
+    return Section.objects.get_or_create(school_class=school_class, name=section)[0]
+
+
+def make_students(count):
+    section = class_section()
+    students = []
+    for index in range(count):
+        user = User.objects.create_user(
+            username=f"student{index}", password="x", role=UserRole.STUDENT, first_name=f"Student{index}"
+        )
+        students.append(StudentProfile.objects.create(user=user, admission_no=f"ADM{index:04d}", section=section))
+    return students
+
+
+def attendance_for(student, day, method=AttendanceMethod.QR):
+    return Attendance(student_id=student.id, date=day, marked_at=timezone.now(), method=method)
+
+
+class IsolatedStateMixin:
+    """Per-test version stamps in a temporary directory (``self.tmp``), starting from an empty cache.
+
+    Rolled-back tests reuse primary keys, so nothing cached by an earlier test may leak into the next.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(VERSION_STAMP_DIR=Path(self.tmp.name) / "versions")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Per-process caches outlive the rolled-back rows they were built from.
+        daily_presence.invalidate()
+        roster_cache.invalidate()
+
+
+class BatchScanTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.students = make_students(3)
+        self.client.force_login(self.admin)
+        self.today = timezone.localdate()
+
+    def post_scans(self, scans):
+        return self.client.post(
+            reverse("scan_qr_attendance_batch"), data=json.dumps({"scans": scans}), content_type="application/json"
+        )
+
+    def test_results_follow_input_order_and_repeats_in_a_batch_mark_once(self):
+        first, second, _ = (build_student_qr_payload(student) for student in self.students)
+        scans = [
+            {"qr_data": first},
+            {"qr_data": first},
+            {"qr_data": second},
+            {"qr_data": first[:-1] + ("A" if first[-1] != "A" else "B")},
+            "not-a-scan",
+            {"qr_data": build_compact_qr_token(999999)},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_scans(scans)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["marked", "already_marked", "marked", "invalid", "invalid", "invalid"],
+        )
+        self.assertEqual([result.get("student") for result in results[:3]], ["ADM0000", "ADM0000", "ADM0001"])
+        self.assertEqual(results[5]["message"], "Student not found.")
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "portal_attendance"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(Attendance.objects.filter(date=self.today).values_list("student_id", flat=True)),
+            [self.students[0].id, self.students[1].id],
+        )
+
+        repeat = self.post_scans([{"qr_data": second}, {"qr_data": build_student_qr_payload(self.students[2])}])
+        self.assertEqual([result["status"] for result in repeat.json()["results"]], ["already_marked", "marked"])
+        self.assertEqual(AttendanceDailySummary.objects.get(date=self.today).present, 3)
+
+    def test_client_scan_time_is_kept_within_the_skew_window(self):
+        scanned_at = timezone.now() - timedelta(minutes=2)
+        stale = timezone.now() - timedelta(hours=2)
+        self.post_scans(
+            [
+                {"qr_data": build_student_qr_payload(self.students[0]), "scanned_at": scanned_at.timestamp() * 1000},
+                {"qr_data": build_student_qr_payload(self.students[1]), "scanned_at": stale.timestamp() * 1000},
+            ]
+        )
+        marks = dict(Attendance.objects.values_list("student_id", "marked_at"))
+        self.assertAlmostEqual(marks[self.students[0].id], scanned_at, delta=timedelta(milliseconds=1))
+        self.assertGreater(marks[self.students[1].id], scanned_at)
+
+    def test_rejects_malformed_batches(self):
+        self.assertEqual(self.post_scans([]).status_code, 400)
+        too_many = [{"qr_data": build_student_qr_payload(self.students[0])}] * (MAX_SCAN_BATCH_SIZE + 1)
+        self.assertEqual(self.post_scans(too_many).status_code, 400)
+        response = self.client.post(reverse("scan_qr_attendance_batch"), data="{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class AttendanceFeedTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.students = make_students(3)
+        self.client.force_login(self.admin)
+        self.today = timezone.localdate()
+
+    def feed(self, after):
+        return self.client.get(reverse("attendance_feed"), {"after": after}).json()
+
+    def test_cursor_returns_only_new_marks_of_today(self):
+        Attendance.objects.create(student=self.students[2], date=self.today - timedelta(days=1))
+        first = Attendance.objects.create(student=self.students[0], date=self.today)
+        page = self.client.get(reverse("attendance_scanner"))
+        self.assertEqual(page.context["feed_cursor"], first.id)
+
+        second = Attendance.objects.create(student=self.students[1], date=self.today)
+        data = self.feed(first.id)
+        self.assertEqual(data["date"], self.today.isoformat())
+        self.assertEqual([row["id"] for row in data["rows"]], [second.id])
+        self.assertEqual((data["rows"][0]["student"], data["rows"][0]["name"]), ("ADM0001", "Student1"))
+        self.assertEqual(data["cursor"], second.id)
+
+        idle = self.feed(second.id)
+        self.assertEqual((idle["rows"], idle["cursor"]), ([], second.id))
+        self.assertEqual([row["id"] for row in self.feed(0)["rows"]], [first.id, second.id])
+
+    def test_day_rollover_reports_the_new_date_without_old_rows(self):
+        mark = Attendance.objects.create(student=self.students[0], date=self.today)
+        tomorrow = self.today + timedelta(days=1)
+        with mock.patch("portal.views.timezone.localdate", return_value=tomorrow):
+            data = self.feed(0)
+        # The scanner page reloads when the date changes, starting from a fresh cursor.
+        self.assertEqual((data["date"], data["rows"], data["cursor"]), (tomorrow.isoformat(), [], 0))
+
+        late = Attendance.objects.create(student=self.students[1], date=tomorrow)
+        with mock.patch("portal.views.timezone.localdate", return_value=tomorrow):
+            data = self.feed(mark.id)
+        self.assertEqual([row["id"] for row in data["rows"]], [late.id])
+
+    def test_rejects_a_malformed_cursor(self):
+        self.assertEqual(self.client.get(reverse("attendance_feed"), {"after": "x"}).status_code, 400)
+
+
+class AttendanceSummaryTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(3)
+        user = User.objects.create_user(username="senior", password="x", role=UserRole.STUDENT)
+        self.senior = StudentProfile.objects.create(user=user, admission_no="ADM0900", section=class_section("6"))
+        self.today = timezone.localdate()
+
+    def counts(self, day=None):
+        rows = AttendanceDailySummary.objects.filter(date=day or self.today).select_related("section__school_class")
+        return {
+            row.section.school_class.name: (row.enrolled, row.present, row.qr_count, row.manual_count) for row in rows
+        }
+
+    def test_marks_and_deletes_adjust_the_counts(self):
+        Attendance.objects.create(student=self.students[0], date=self.today)
+        manual = Attendance.objects.create(student=self.students[1], date=self.today, method=AttendanceMethod.MANUAL)
+        self.assertEqual(self.counts(), {"5": (3, 2, 1, 1), "6": (1, 0, 0, 0)})
+
+        manual.delete()
+        self.assertEqual(self.counts()["5"], (3, 1, 1, 0))
+
+        rows = Attendance.objects.bulk_create(
+            [attendance_for(self.students[2], self.today), attendance_for(self.senior, self.today)]
+        )
+        # Both classes move in one UPDATE.
+        with self.assertNumQueries(2):
+            adjust_attendance_summary(self.today, rows)
+        self.assertEqual(self.counts(), {"5": (3, 2, 2, 0), "6": (1, 1, 1, 0)})
+
+    def test_edits_move_the_mark_between_buckets(self):
+        yesterday = self.today - timedelta(days=1)
+        mark = Attendance.objects.create(student=self.students[0], date=self.today)
+        Attendance.objects.create(student=self.students[1], date=yesterday)
+
+        mark.method = AttendanceMethod.MANUAL
+        mark.save()
+        self.assertEqual(self.counts()["5"], (3, 1, 0, 1))
+
+        mark.date = yesterday
+        mark.save()
+        self.assertEqual(self.counts()["5"], (3, 0, 0, 0))
+        self.assertEqual(self.counts(yesterday)["5"], (3, 2, 1, 1))
+
+        mark.student = self.senior
+        mark.save()
+        self.assertEqual(self.counts(yesterday), {"5": (3, 1, 1, 0), "6": (1, 1, 0, 1)})
+
+        # Saving without a change leaves the counts alone.
+        mark.save()
+        self.assertEqual(self.counts(yesterday), {"5": (3, 1, 1, 0), "6": (1, 1, 0, 1)})
+
+    def test_rebuild_command_recomputes_drifted_rows(self):
+        yesterday = self.today - timedelta(days=1)
+        Attendance.objects.bulk_create(
+            [
+                attendance_for(self.students[0], yesterday),
+                attendance_for(self.students[1], yesterday, AttendanceMethod.MANUAL),
+                attendance_for(self.senior, self.today),
+            ]
+        )
+        AttendanceDailySummary.objects.create(date=yesterday, section=self.senior.section, enrolled=5, present=4)
+
+        out = StringIO()
+        call_command("rebuild_attendance_summary", start=yesterday.isoformat(), end=self.today.isoformat(), stdout=out)
+        self.assertIn(f"Rebuilt 4 summary rows for {yesterday} to {self.today}.", out.getvalue())
+        self.assertEqual(self.counts(yesterday), {"5": (3, 2, 1, 1), "6": (1, 0, 0, 0)})
+        self.assertEqual(self.counts(), {"5": (3, 0, 0, 0), "6": (1, 1, 1, 0)})
+
+    def test_rebuild_command_rejects_bad_ranges(self):
+        with self.assertRaisesMessage(CommandError, "--start must be a date in YYYY-MM-DD format."):
+            call_command("rebuild_attendance_summary", start="yesterday")
+        with self.assertRaisesMessage(CommandError, "--end must not be before --start."):
+            call_command("rebuild_attendance_summary", start="2024-05-02", end="2024-05-01")
+
+
+class KeysetHistoryTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_students(1)[0]
+        self.today = timezone.localdate()
+        days = [self.today - timedelta(days=n) for n in range(25)]
+        Attendance.objects.bulk_create([attendance_for(self.student, day) for day in days])
+
+    def walk(self, page_func, page_size):
+        items, cursor = [], None
+        while True:
+            page = page_func(self.student, cursor, page_size)
+            items.extend(page.items)
+            if not page.has_next:
+                return items
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        dates = [row.date for row in self.walk(attendance_history_page, 7)]
+        self.assertEqual(dates, [self.today - timedelta(days=n) for n in range(25)])
+
+    def test_cursor_is_stable_while_new_marks_arrive(self):
+        first = attendance_history_page(self.student, page_size=10)
+        Attendance.objects.create(student=self.student, date=self.today + timedelta(days=1))
+        rest = attendance_history_page(self.student, first.next_cursor, page_size=20)
+        # An offset page would now start one row earlier and repeat the last row of page one.
+        seen = [row.id for row in first.items + rest.items]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(rest.items[0].date, self.today - timedelta(days=10))
+        self.assertFalse(rest.has_next)
+
+    def test_ties_on_the_sort_key_are_not_skipped(self):
+        due = self.today + timedelta(days=30)
+        fees = FeeRecord.objects.bulk_create(
+            [FeeRecord(student=self.student, term=f"T{n}", total_amount=100, due_date=due) for n in range(5)]
+        )
+        FeeRecord.objects.update(created_at=timezone.now())
+        walked = [fee.id for fee in self.walk(fee_history_page, 2)]
+        self.assertEqual(walked, sorted(fee.id for fee in fees))
+
+    def test_history_endpoint_rejects_a_tampered_cursor(self):
+        self.client.force_login(self.student.user)
+        url = reverse("history_page", args=["attendance"])
+        data = self.client.get(url).json()
+        self.assertEqual(len(data["items"]), 20)
+        self.assertEqual(len(self.client.get(url, {"cursor": data["next_cursor"]}).json()["items"]), 5)
+        self.assertEqual(self.client.get(url, {"cursor": data["next_cursor"] + "x"}).status_code, 400)
+
+
+SPREADSHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def xlsx_sheets(content):
+    """``[(title, rows), ...]`` read back from XLSX bytes with the standard library only."""
+    archive = zipfile.ZipFile(BytesIO(content))
+    assert archive.testzip() is None
+    assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels"} <= set(
+        archive.namelist()
+    )
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    sheets = []
+    for index, sheet in enumerate(workbook.iterfind("s:sheets/s:sheet", SPREADSHEET_NS), start=1):
+        root = ElementTree.fromstring(archive.read(f"xl/worksheets/sheet{index}.xml"))
+        rows = []
+        for row in root.iterfind("s:sheetData/s:row", SPREADSHEET_NS):
+            rows.append(
+                [
+                    cell.findtext("s:is/s:t", namespaces=SPREADSHEET_NS)
+                    if cell.get("t") == "inlineStr"
+                    else Decimal(cell.findtext("s:v", namespaces=SPREADSHEET_NS))
+                    for cell in row
+                ]
+            )
+        sheets.append((sheet.get("name"), rows))
+    return sheets
+
+
+class DashboardFragmentCacheTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.student = make_students(1)[0]
+        self.other_class = class_section("6").school_class
+        self.student_client = Client()
+        self.student_client.force_login(self.student.user)
+        self.client.force_login(self.admin)
+
+    def dashboard(self):
+        return self.student_client.get(reverse("student_dashboard")).content.decode()
+
+    def publish(self, action, **fields):
+        data = {"action": action, **{f"{action}-{name}": value for name, value in fields.items()}}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("manage_academics"), data)
+        self.assertRedirects(response, reverse("manage_academics"))
+
+    def test_panels_are_served_from_cache_until_something_is_published(self):
+        self.assertIn("No notices.", self.dashboard())
+        with CaptureQueriesContext(connection) as queries:
+            self.dashboard()
+        self.assertFalse([query for query in queries if "portal_notice" in query["sql"]])
+
+        self.publish("notice", title="Sports day", message="Friday", audience=NoticeAudience.STUDENT)
+        self.assertIn("Sports day", self.dashboard())
+
+        due = (timezone.localdate() + timedelta(days=7)).isoformat()
+        self.publish("homework", school_class=self.other_class.id, subject="Maths", title="Fractions", due_date=due)
+        page = self.dashboard()
+        self.assertIn("No homework.", page)
+        own_class = self.student.school_class_id
+        self.publish("homework", school_class=own_class, subject="Art", title="Collage", due_date=due)
+        page = self.dashboard()
+        self.assertIn("Collage", page)
+        self.assertNotIn("Fractions", page)
+
+
+@skipUnless(REGISTER_AVAILABLE, "numpy is not installed")
+class RegisterTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(3)
+        user = User.objects.create_user(username="senior", password="x", role=UserRole.STUDENT)
+        self.senior = StudentProfile.objects.create(user=user, admission_no="ADM0900", section=class_section("6"))
+        self.school_class = self.students[0].school_class
+        self.days = [date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for student, day in [
+                (self.students[0], self.days[0]),
+                (self.students[1], self.days[0]),
+                (self.students[0], self.days[1]),
+                (self.senior, self.days[2]),
+            ]:
+                Attendance.objects.create(student=student, date=day)
+
+    def test_matrix_has_a_column_for_every_school_day(self):
+        register = build_register(self.school_class, None, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(register.days, self.days)
+        self.assertEqual(register.students, [("ADM0000", "Student0"), ("ADM0001", "Student1"), ("ADM0002", "Student2")])
+        self.assertEqual(register.marks.tolist(), [[True, True, False], [True, False, False], [False, False, False]])
+        self.assertEqual(register.day_totals.tolist(), [2, 1, 0])
+        self.assertEqual([row["percentage"] for row in register.rows()], [66.7, 33.3, 0.0])
+        self.assertEqual(list(register.csv_rows())[-1], ["", "Present", 2, 1, 0, 3, 9, 33.3])
+
+    def test_cached_register_gains_a_day_only_another_class_attended(self):
+        start, end = date(2025, 3, 1), date(2025, 3, 31)
+        self.assertEqual(len(attendance_register(self.school_class, None, start, end).days), 3)
+        with self.assertNumQueries(1):
+            attendance_register(self.school_class, None, start, end)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=self.senior, date=date(2025, 3, 6))
+        register = attendance_register(self.school_class, None, start, end)
+        self.assertEqual(register.days[-1], date(2025, 3, 6))
+        self.assertEqual(register.marks[:, -1].tolist(), [False, False, False])
+
+
+class ExportTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.client.force_login(self.admin)
+        self.students = make_students(3)
+        user = self.students[0].user
+        user.first_name, user.last_name = 'Ann "Annie", O\'Neil', "& Co\x07"
+        user.save()
+        self.day = date(2025, 3, 3)
+        self.marked_at = timezone.make_aware(datetime(2025, 3, 3, 8, 15))
+        Attendance.objects.bulk_create(
+            [
+                Attendance(student=student, date=self.day, marked_at=self.marked_at, marked_by=self.admin)
+                for student in self.students
+            ]
+        )
+        FeeRecord.objects.create(
+            student=self.students[0], term="Term 1", total_amount=Decimal("1200.50"), paid_amount=200, due_date=self.day
+        )
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_attendance_csv_quotes_awkward_names(self):
+        response, content = self.download("export_attendance", start="2025-03-01", end="2025-03-31", format="csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="attendance-2025-03-01-to-2025-03-31.csv"'
+        )
+        rows = list(csv.reader(StringIO(content.decode("utf-8"))))
+        self.assertEqual(rows[0], ATTENDANCE_EXPORT_HEADER)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][:3], ["2025-03-03", "ADM0000", 'Ann "Annie", O\'Neil & Co\x07'])
+        marked_at = timezone.localtime(self.marked_at).isoformat(sep=" ", timespec="seconds")
+        self.assertEqual(rows[1][5:], ["QR Scan", marked_at, "admin"])
+
+    def test_attendance_xlsx_is_a_valid_workbook(self):
+        response, content = self.download("export_attendance", start="2025-03-01", end="2025-03-31", format="xlsx")
+        self.assertEqual(response["Content-Type"], EXPORT_CONTENT_TYPES["xlsx"])
+        [(title, rows)] = xlsx_sheets(content)
+        self.assertEqual((title, rows[0]), ("Attendance", ATTENDANCE_EXPORT_HEADER))
+        # Control characters are not allowed in XML and are dropped; markup characters are escaped.
+        self.assertEqual(rows[1][2], 'Ann "Annie", O\'Neil & Co')
+        self.assertEqual([row[1] for row in rows[1:]], ["ADM0000", "ADM0001", "ADM0002"])
+
+    def test_xlsx_starts_a_new_sheet_when_one_is_full(self):
+        with mock.patch("portal.exports.XLSX_MAX_SHEET_ROWS", 3):
+            _, content = self.download("export_attendance", start="2025-03-01", end="2025-03-31", format="xlsx")
+        sheets = xlsx_sheets(content)
+        self.assertEqual([title for title, _ in sheets], ["Attendance", "Attendance 2"])
+        self.assertEqual([rows[0] for _, rows in sheets], [ATTENDANCE_EXPORT_HEADER] * 2)
+        self.assertEqual([len(rows) for _, rows in sheets], [3, 2])
+
+    def test_fee_exports_write_amounts_as_numbers(self):
+        _, content = self.download("export_fees", status="unpaid", format="xlsx")
+        [(title, rows)] = xlsx_sheets(content)
+        self.assertEqual((title, rows[0]), ("Fees", FEE_EXPORT_HEADER))
+        self.assertEqual(
+            rows[1][4:], ["Term 1", Decimal("1200.50"), Decimal("200.00"), Decimal("1000.50"), "2025-03-03", "Unpaid"]
+        )
+
+        path = Path(self.tmp.name) / "fees.csv"
+        call_command("export_fees", str(path), status="paid", stdout=StringIO())
+        self.assertEqual(list(csv.reader(StringIO(path.read_text(encoding="utf-8")))), [FEE_EXPORT_HEADER])
+
+
+class LookupTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        section = class_section("7", "B")
+        for index, (first, last) in enumerate([("Asha", "Verma"), ("Ashok", "Kumar"), ("Ravi", "Ashford")]):
+            user = User.objects.create_user(
+                username=f"pupil{index}", password="x", role=UserRole.STUDENT, first_name=first, last_name=last
+            )
+            StudentProfile.objects.create(user=user, admission_no=f"ADM{index + 1:04d}", section=section)
+        user = User.objects.create_user(username="mkumar", password="x", role=UserRole.PARENT, first_name="Meera")
+        ParentProfile.objects.create(user=user)
+
+    def labels(self, results):
+        return [result["label"] for result in results]
+
+    def test_prefixes_match_admission_numbers_then_first_and_last_names(self):
+        self.assertEqual(
+            self.labels(search_students("ash")),
+            ["ADM0001 - Asha Verma (7 B)", "ADM0002 - Ashok Kumar (7 B)", "ADM0003 - Ravi Ashford (7 B)"],
+        )
+        self.assertEqual(self.labels(search_students("adm0002")), ["ADM0002 - Ashok Kumar (7 B)"])
+        self.assertEqual(self.labels(search_students("Asha V")), ["ADM0001 - Asha Verma (7 B)"])
+        self.assertEqual(search_students("sha"), [])
+        self.assertEqual(len(search_students("a", limit=2)), 2)
+        self.assertEqual(self.labels(search_parents("mku")), ["Meera (mkumar)"])
+
+    def test_results_are_cached_until_the_roster_changes(self):
+        search_students("ash")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(search_students("  ASH ")), 3)
+            self.assertEqual(search_students("   "), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(username="late", password="x", role=UserRole.STUDENT, first_name="Ashwin")
+            StudentProfile.objects.create(user=user, admission_no="ADM0009", section=class_section("7", "B"))
+        self.assertEqual(len(search_students("ash")), 4)
+
+        search_parents("m")
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(username="mona", password="x", role=UserRole.PARENT, first_name="Mona")
+            ParentProfile.objects.create(user=user)
+        self.assertEqual(self.labels(search_parents("m")), ["Meera (mkumar)", "Mona (mona)"])
+
+    def test_lookup_endpoint_is_admin_only(self):
+        admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.client.force_login(admin)
+        response = self.client.get(reverse("lookup_students"), {"q": "ravi"})
+        self.assertEqual(response.json(), {"ok": True, "results": search_students("ravi")})
+        self.client.force_login(User.objects.get(username="pupil0"))
+        self.assertNotEqual(self.client.get(reverse("lookup_students"), {"q": "ravi"}).status_code, 200)
+
+
+class QrCardSheetTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        if not QR_RENDERING_AVAILABLE:
+            self.skipTest("qrcode is not installed")
+        root = Path(self.tmp.name)
+        overrides = override_settings(QR_CARD_DIR=root / "cards", QR_CACHE_DIR=root / "qr")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.students = make_students(9)
+
+    def generate(self):
+        out = StringIO()
+        call_command("generate_qr_cards", workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_unchanged_classes_are_skipped_and_edits_rerender_one_card(self):
+        self.assertIn("5: 9 students, 9 cards rendered", self.generate())
+        sheet_path = class_sheet_path("5")
+        with zipfile.ZipFile(sheet_path) as archive:
+            self.assertEqual(archive.namelist(), ["sheet-001.png", "sheet-002.png"])
+        built_at = sheet_path.stat().st_mtime_ns
+
+        self.assertIn("5: 9 students, unchanged", self.generate())
+        self.assertEqual(sheet_path.stat().st_mtime_ns, built_at)
+
+        user = self.students[4].user
+        user.first_name = "Renamed"
+        user.save()
+        self.assertIn("5: 9 students, 1 cards rendered", self.generate())
+
+    def test_builds_of_a_class_wait_for_each_other_and_leave_other_classes_alone(self):
+        self.students[8].section = class_section("6")
+        self.students[8].save()
+        classes = dict(students_by_class())
+        self.assertEqual(build_class_sheets("6", classes["6"])[1], 1)
+
+        with _class_lock(class_sheet_path("5")):
+            builder = threading.Thread(target=build_class_sheets, args=("5", classes["5"]))
+            builder.start()
+            builder.join(timeout=0.2)
+            self.assertTrue(builder.is_alive())
+            self.assertFalse(class_sheet_path("5").exists())
+        builder.join()
+
+        self.assertTrue(class_sheet_path("5").exists())
+        self.assertEqual(build_class_sheets("5", classes["5"])[1], 0)
+        self.assertEqual(build_class_sheets("6", classes["6"])[1], 0)
+
+
+class ImportRosterTests(IsolatedStateMixin, TestCase):
+    def import_roster(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content, encoding="utf-8")
+        out, err = StringIO(), StringIO()
+        call_command("import_roster", str(path), workers=1, chunk_size=2, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_creates_parents_and_linked_students(self):
+        out, err = self.import_roster(
+            "roster.csv",
+            "role,username,password,first_name,admission_no,class_name,section,parent_username\n"
+            "student,kid1,pw,Kid,ADM0100,5,A,mum\n"
+            "parent,mum,pw,Mum,,,,\n"
+            "student,kid2,pw,Kid,ADM0101,5 ,,\n",
+        )
+        self.assertEqual(err, "")
+        self.assertIn("1 parents, 2 students created, 0 rows rejected", out)
+        kid = StudentProfile.objects.select_related("parent__user", "section").get(admission_no="ADM0100")
+        self.assertEqual((kid.parent.user.username, kid.section.name), ("mum", "A"))
+        self.assertEqual(StudentProfile.objects.get(admission_no="ADM0101").school_class, kid.school_class)
+        self.assertTrue(User.objects.get(username="kid1").check_password("pw"))
+
+    def test_jsonl_reports_bad_lines_and_keeps_going(self):
+        out, err = self.import_roster(
+            "roster.jsonl",
+            '{"role": "parent", "username": "dad", "password": "pw", "first_name": "Dad"}\n'
+            "\n"
+            '{"role": "student", "username": "kid", "password": "pw"\n'
+            '["not", "an", "object"]\n'
+            '{"role": "student", "username": "dad", "password": "pw", "first_name": "Dup",'
+            ' "admission_no": "ADM0200", "class_name": "6"}\n'
+            '{"role": "student", "username": "kid", "password": "pw", "first_name": "Kid",'
+            ' "admission_no": "ADM0201", "class_name": "6", "parent_username": "dad"}\n',
+        )
+        self.assertIn("1 parents, 1 students created, 3 rows rejected", out)
+        lines = err.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("line 3: invalid JSON:"))
+        self.assertEqual(lines[1:], ["line 4: Row must be an object.", "line 5: username 'dad' is already taken."])
+        self.assertEqual(StudentProfile.objects.get(admission_no="ADM0201").parent.user.username, "dad")
+
+    def test_existing_parent_sees_an_imported_child(self):
+        parent = ParentProfile.objects.create(
+            user=User.objects.create_user(username="mum", password="x", role=UserRole.PARENT)
+        )
+        self.client.force_login(parent.user)
+        self.client.get(reverse("parent_dashboard"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_roster(
+                "roster.csv",
+                "role,username,password,first_name,admission_no,class_name,parent_username\n"
+                "student,kid,pw,Kid,ADM0300,5,mum\n",
+            )
+        kid = StudentProfile.objects.get(admission_no="ADM0300")
+        url = reverse("history_page", kwargs={"kind": "attendance"})
+        self.assertEqual(self.client.get(url, {"student": kid.id}).status_code, 200)
+
+    def test_rejects_unknown_formats(self):
+        with self.assertRaisesMessage(CommandError, "Roster file must be .csv, .jsonl/.ndjson or .json."):
+            self.import_roster("roster.txt", "")
+
+
+class DailyPresenceTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(2)
+        self.today = timezone.localdate()
+
+    def test_reseeds_once_when_the_day_rolls_over(self):
+        mark = Attendance.objects.create(student=self.students[0], date=self.today)
+        self.assertEqual(daily_presence.lookup(self.students[0].id, self.today), mark.marked_at)
+
+        tomorrow = self.today + timedelta(days=1)
+        with self.assertNumQueries(1):
+            self.assertIsNone(daily_presence.lookup(self.students[0].id, tomorrow))
+        # A late mark for the old day must not leak into the new one.
+        daily_presence.record(self.students[1].id, self.today, mark.marked_at)
+        with self.assertNumQueries(0):
+            self.assertEqual(daily_presence.lookup_many([student.id for student in self.students], tomorrow), {})
+
+    def test_deleting_or_moving_a_mark_forgets_it(self):
+        first = Attendance.objects.create(student=self.students[0], date=self.today)
+        second = Attendance.objects.create(student=self.students[1], date=self.today)
+        ids = [student.id for student in self.students]
+        self.assertEqual(set(daily_presence.lookup_many(ids, self.today)), set(ids))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(set(daily_presence.lookup_many(ids, self.today)), {self.students[1].id})
+        with self.captureOnCommitCallbacks(execute=True):
+            second.date = self.today - timedelta(days=1)
+            second.save()
+        self.assertIsNone(daily_presence.lookup(self.students[1].id, self.today))
+
+    def test_lookup_many_checks_the_version_once_per_batch(self):
+        Attendance.objects.create(student=self.students[0], date=self.today)
+        with mock.patch("portal.attendance.current_version", wraps=current_version) as version:
+            marked = daily_presence.lookup_many([student.id for student in self.students], self.today)
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual(list(marked), [self.students[0].id])
+
+
+class StudentQrImageTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        if not QR_RENDERING_AVAILABLE:
+            self.skipTest("qrcode is not installed")
+        overrides = override_settings(QR_CACHE_DIR=Path(self.tmp.name) / "qr")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        render_qr_png.cache_clear()
+        self.student, self.other = make_students(2)
+        self.url = reverse("student_qr_image", args=[build_student_qr_token(self.student.id)])
+        self.client.force_login(self.student.user)
+
+    def test_revalidation_with_the_etag_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/png"))
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertEqual(response["Cache-Control"], "private, max-age=31536000, immutable")
+        etag = response["ETag"]
+        self.assertEqual(etag, f'"{qr_payload_digest(build_student_qr_payload(self.student))}"')
+        self.assertTrue((settings.QR_CACHE_DIR / f"{etag.strip(chr(34))}.png").exists())
+
+        cached = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual((cached.status_code, cached.content, cached["ETag"]), (304, b"", etag))
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_parent_of_the_student_is_served(self):
+        parent_user = User.objects.create_user(username="parent", password="x", role=UserRole.PARENT)
+        self.student.parent = ParentProfile.objects.create(user=parent_user)
+        self.student.save()
+        self.client.force_login(parent_user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_only_owners_and_valid_tokens_are_served(self):
+        self.client.force_login(self.other.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        bad = reverse("student_qr_image", args=["not-a-token"])
+        self.assertEqual(self.client.get(bad).status_code, 404)
+
+
+class AttendanceWriteBehindTests(IsolatedStateMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal_dir = Path(self.tmp.name) / "journal"
+        self.today = timezone.localdate()
+        self.students = make_students(5)
+
+    def journal_files(self):
+        return sorted(self.journal_dir.glob("*.journal"))
+
+    def test_group_commit_flushes_marks(self):
+        writer = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        for student in self.students:
+            writer.enqueue(attendance_for(student, self.today))
+        self.assertEqual(Attendance.objects.count(), 0)
+        self.assertEqual(writer.pending_count(), 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(writer.flush())
+
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "portal_attendance"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(Attendance.objects.filter(date=self.today).count(), 5)
+        self.assertEqual(writer.pending_count(), 0)
+        summary = AttendanceDailySummary.objects.get(date=self.today, section__school_class__name="5")
+        self.assertEqual(summary.present, 5)
+        # Only the fresh, empty segment the writer is appending to remains.
+        self.assertEqual(len(self.journal_files()), 1)
+
+    def test_replay_skips_marks_already_stored(self):
+        first = attendance_for(self.students[0], self.today)
+        self.assertEqual(write_attendance_records([first]), 1)
+        replay = [attendance_for(self.students[0], self.today), attendance_for(self.students[1], self.today)]
+        self.assertEqual(write_attendance_records(replay), 1)
+        self.assertEqual(Attendance.objects.count(), 2)
+        summary = AttendanceDailySummary.objects.get(date=self.today, section__school_class__name="5")
+        self.assertEqual(summary.present, 2)
+
+    def crash_with_unflushed_marks(self):
+        student_ids = [student.id for student in self.students]
+        day = self.today
+
+        def crashing_worker():
+            # A long commit window guarantees the process dies with every mark still unflushed.
+            writer = AttendanceWriteBehind(journal_dir=self.journal_dir, commit_delay=60)
+            writer.enqueue_many(
+                [
+                    Attendance(student_id=student_id, date=day, marked_at=timezone.now(), method=AttendanceMethod.QR)
+                    for student_id in student_ids
+                ]
+            )
+            os._exit(0)
+
+        worker = multiprocessing.get_context("fork").Process(target=crashing_worker)
+        worker.start()
+        worker.join(10)
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(Attendance.objects.count(), 0)
+        self.assertTrue(self.journal_files())
+        return student_ids
+
+    def assert_marks_stored(self, student_ids):
+        self.assertEqual(
+            sorted(Attendance.objects.filter(date=self.today).values_list("student_id", flat=True)), sorted(student_ids)
+        )
+        self.assertEqual(self.journal_files(), [])
+
+    def test_no_mark_lost_across_crash_restart(self):
+        student_ids = self.crash_with_unflushed_marks()
+        restarted = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        self.assertEqual(restarted.recover(), len(student_ids))
+        self.assert_marks_stored(student_ids)
+
+    def test_first_request_after_a_crash_replays_the_journal(self):
+        student_ids = self.crash_with_unflushed_marks()
+        request_started.connect(replay_attendance_journal)
+        self.addCleanup(request_started.disconnect, replay_attendance_journal)
+        restarted = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        with mock.patch("portal.signals.attendance_writer", restarted):
+            self.client.get(reverse("login"))
+        self.assert_marks_stored(student_ids)
+
+    def test_replay_command_stores_orphaned_marks(self):
+        student_ids = self.crash_with_unflushed_marks()
+        restarted = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        out = StringIO()
+        with mock.patch("portal.management.commands.replay_attendance_journal.attendance_writer", restarted):
+            call_command("replay_attendance_journal", stdout=out)
+        self.assertIn(f"Replayed {len(student_ids)} attendance marks.", out.getvalue())
+        self.assert_marks_stored(student_ids)
+
+    def test_a_batch_is_journalled_with_one_fsync(self):
+        writer = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        with mock.patch("portal.writebehind.os.fsync") as fsync:
+            writer.enqueue_many([attendance_for(student, self.today) for student in self.students])
+        self.assertEqual(fsync.call_count, 1)
+        self.assertEqual(writer.pending_count(), 5)
+        self.assertEqual(len(self.journal_files()[0].read_bytes().splitlines()), 5)
+
+    def test_recover_leaves_live_segments_alone(self):
+        live = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        live.enqueue(attendance_for(self.students[0], self.today))
+
+        other = AttendanceWriteBehind(journal_dir=self.journal_dir, background=False)
+        self.assertEqual(other.recover(), 0)
+        self.assertEqual(Attendance.objects.count(), 0)
+        self.assertTrue(live.flush())
+        self.assertEqual(Attendance.objects.count(), 1)
+
+
+def seed_school(**options):
+    options = {"students": 24, "days": 21, "end": "2025-06-30", **options}
+    call_command("seed_school", stdout=StringIO(), **options)
+
+
+class SeedAndBenchmarkTests(IsolatedStateMixin, TestCase):
+    def attendance_snapshot(self):
+        return list(
+            Attendance.objects.order_by("date", "student__admission_no").values_list(
+                "date", "student__admission_no", "method", "marked_at"
+            )
+        )
+
+    def test_seed_school_is_deterministic(self):
+        seed_school()
+        self.assertEqual(StudentProfile.objects.count(), 24)
+        self.assertEqual(ParentProfile.objects.count(), 16)
+        self.assertEqual(User.objects.filter(role=UserRole.ADMIN).count(), 1)
+        self.assertEqual(Notice.objects.count(), 3)
+        self.assertEqual(Homework.objects.count(), 3 * 12)
+        self.assertEqual(FeeRecord.objects.count(), 24)
+        self.assertEqual(
+            sum(AttendanceDailySummary.objects.values_list("present", flat=True)), Attendance.objects.count()
+        )
+        first = self.attendance_snapshot()
+        self.assertTrue(first)
+
+        seed_school(replace=True)
+        self.assertEqual(StudentProfile.objects.count(), 24)
+        self.assertEqual(self.attendance_snapshot(), first)
+
+    def test_replace_deletes_without_per_row_receivers(self):
+        seed_school(students=6, days=5)
+        with (
+            mock.patch("portal.signals.adjust_attendance_summary") as adjust,
+            mock.patch("portal.signals.refresh_enrolled") as refresh,
+        ):
+            seed_school(students=6, days=5, replace=True)
+        adjust.assert_not_called()
+        refresh.assert_not_called()
+
+        # The receivers are back once the delete is done.
+        mark = Attendance.objects.select_related("student").latest("date")
+        present = AttendanceDailySummary.objects.get(date=mark.date, section=mark.student.section_id).present
+        mark.delete()
+        summary = AttendanceDailySummary.objects.get(date=mark.date, section=mark.student.section_id)
+        self.assertEqual(summary.present, present - 1)
+
+    def test_benchmark_covers_every_url(self):
+        seed_school()
+        attendance_count = Attendance.objects.count()
+        report = run_benchmarks(iterations=2, warmup=0)
+
+        self.assertEqual(sorted(report["results"]), sorted(url_names()))
+        for name, result in report["results"].items():
+            self.assertLess(result["status"], 400, name)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"], name)
+        # The scan views marked attendance, but the run is rolled back.
+        self.assertEqual(Attendance.objects.count(), attendance_count)
+
+        self.assertEqual(compare_to_baseline(report, report), [])
+        login = report["results"]["login"]
+        chattier = {"results": {"login": {**login, "queries": login["queries"] + 1}}}
+        self.assertEqual(
+            compare_to_baseline(chattier, report), [("login", f"queries {login['queries']} -> {login['queries'] + 1}")]
+        )
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        cls.enterClassContext(override_settings(VERSION_STAMP_DIR=Path(tmp.name) / "versions"))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        # Enough students to fill every list page, so an N+1 shows up as dozens of extra queries.
+        seed_school(students=150, days=45, end=None)
+
+    def setUp(self):
+        cache.clear()
+        self.fixtures = benchmark_fixtures()
+        self.users = {
+            "admin": self.fixtures["admin"],
+            "student": self.fixtures["student"].user,
+            "parent": self.fixtures["parent"].user,
+        }
+
+    def client_for(self, role):
+        client = Client()
+        if role != "anonymous":
+            client.force_login(self.users[role])
+        return client
+
+    def assertWithinBudget(self, name, role, method="get", kwargs=None, data=None, json_body=None):
+        url = reverse(name, kwargs=kwargs)
+        budget = resolve(url).func.query_budget
+        client = self.client_for(role)
+        # The first request runs with cold caches; the second shows the steady state.
+        for attempt in ("cold", "warm"):
+            with CaptureQueriesContext(connection) as queries:
+                if json_body is not None:
+                    response = client.post(url, data=json.dumps(json_body), content_type="application/json")
+                else:
+                    response = getattr(client, method)(url, data=data or {})
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 400, f"{name} ({attempt})")
+            self.assertLessEqual(
+                len(queries),
+                budget,
+                f"{name} ({attempt}) ran {len(queries)} queries, budget {budget}:\n"
+                + "\n".join(query["sql"] for query in queries),
+            )
+            if method == "post" or json_body is not None:
+                break
+
+    def test_debug_logs_requests_over_budget(self):
+        @query_budget(1)
+        def chatty_view(request):
+            User.objects.count()
+            User.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get("/chatty/")
+        with override_settings(DEBUG=True), self.assertLogs("portal.decorators", "WARNING") as logs:
+            chatty_view(request)
+        self.assertIn("GET /chatty/ ran 2 SQL queries; chatty_view allows 1.", logs.output[0])
+
+    def test_every_url_has_a_budget(self):
+        for pattern in urlpatterns:
+            self.assertIsInstance(getattr(pattern.callback, "query_budget", None), int, pattern.name)
+
+    def test_get_requests_stay_within_budget(self):
+        for name, request in benchmark_requests(self.fixtures).items():
+            with self.subTest(name):
+                self.assertWithinBudget(
+                    name, request.role, request.method, request.kwargs, request.data, request.json_body
+                )
+
+    def test_variants_stay_within_budget(self):
+        student = self.fixtures["student"]
+        parent = self.fixtures["parent"]
+        sibling_ids = list(parent.children.values_list("id", flat=True))
+        cases = [
+            ("login", "anonymous", "post", {"username": self.users["admin"].username, "password": "seed-password"}),
+            ("manage_students", "admin", "get", {"q": student.user.first_name[:3], "page": 2}),
+            ("parent_dashboard", "parent", "get", {"child": sibling_ids[-1]}),
+            (
+                "student_dashboard",
+                "student",
+                "get",
+                {"attendance_cursor": attendance_history_page(student).next_cursor},
+            ),
+            (
+                "manage_students",
+                "admin",
+                "post",
+                {
+                    "first_name": "Budget",
+                    "username": "budget-student",
+                    "password": "Budget-pass-123",
+                    "admission_no": "BUDGET001",
+                    "section": Section.objects.get(school_class__name="5", name="A").id,
+                    "parent": parent.id,
+                },
+            ),
+            (
+                "manage_parents",
+                "admin",
+                "post",
+                {"first_name": "Budget", "username": "budget-parent", "password": "Budget-pass-123"},
+            ),
+            (
+                "manage_academics",
+                "admin",
+                "post",
+                {"action": "notice", "notice-title": "Budget", "notice-message": "Hello", "notice-audience": "ALL"},
+            ),
+            (
+                "manage_fees",
+                "admin",
+                "post",
+                {
+                    "student": student.id,
+                    "term": "Budget term",
+                    "total_amount": "100",
+                    "paid_amount": "0",
+                    "due_date": "2030-01-01",
+                },
+            ),
+        ]
+        for name, role, method, data in cases:
+            with self.subTest(name, method=method):
+                self.assertWithinBudget(name, role, method, data=data)
+
+    def test_new_marks_stay_within_budget(self):
+        unmarked = StudentProfile.objects.exclude(attendance_records__date=timezone.localdate()).order_by("id")[:8]
+        manual, scanned, *batched = unmarked
+        self.assertWithinBudget("manual_attendance_mark", "admin", "post", data={"student_id": manual.id})
+        self.assertWithinBudget(
+            "scan_qr_attendance", "admin", json_body={"qr_data": build_student_qr_payload(scanned)}
+        )
+        self.assertWithinBudget(
+            "scan_qr_attendance_batch",
+            "admin",
+            json_body={"scans": [{"qr_data": build_student_qr_payload(student)} for student in batched]},
+        )
+        today = timezone.localdate()
+        self.assertEqual(
+            sum(AttendanceDailySummary.objects.filter(date=today).values_list("present", flat=True)),
+            Attendance.objects.filter(date=today).count(),
+        )
+
+
+class RequestMetricsTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.student = make_students(1)[0]
+        self.client.force_login(self.admin)
+
+    def scan(self, qr_data):
+        return self.client.post(
+            reverse("scan_qr_attendance"), data=json.dumps({"qr_data": qr_data}), content_type="application/json"
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("admin_dashboard"))
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$')
+        self.assertNotIn("tpl;dur=0.0", timing)
+
+    def test_scan_counters_and_exposition(self):
+        invalid = metrics.invalid_signatures.value()
+        duplicates = metrics.duplicate_scans.value()
+        marked = metrics.scans.value(("marked",))
+
+        self.client.get(reverse("admin_dashboard"))
+        self.assertEqual(self.scan("forged:token").status_code, 400)
+        payload = build_student_qr_payload(self.student)
+        self.assertEqual(self.scan(payload).json()["status"], "marked")
+        self.assertEqual(self.scan(payload).json()["status"], "already_marked")
+
+        self.assertEqual(metrics.invalid_signatures.value(), invalid + 1)
+        self.assertEqual(metrics.duplicate_scans.value(), duplicates + 1)
+        self.assertEqual(metrics.scans.value(("marked",)), marked + 1)
+        self.assertGreaterEqual(metrics.scan_rate.value(), 3)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        body = response.content.decode()
+        self.assertIn('schoolms_request_sql_queries_count{view="scan_qr_attendance"}', body)
+        self.assertIn(
+            'schoolms_template_render_seconds_bucket{template="dashboard/admin_dashboard.html",le="+Inf"}', body
+        )
+        self.assertIn('schoolms_qr_scans_total{outcome="already_marked"}', body)
+        self.assertRegex(body, r"schoolms_qr_scans_last_minute \d+")
+
+    def test_metrics_is_admin_only(self):
+        self.client.force_login(self.student.user)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+
+class AsyncScanTests(IsolatedStateMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.students = make_students(30)
+
+    async def scan(self, client, qr_data):
+        response = await client.post(
+            reverse("scan_qr_attendance_async"), data=json.dumps({"qr_data": qr_data}), content_type="application/json"
+        )
+        return response.status_code, response.json()["status"] if response.status_code == 200 else None
+
+    async def test_role_check_runs_on_the_event_loop(self):
+        payload = build_student_qr_payload(self.students[0])
+        anonymous = AsyncClient()
+        status, _ = await self.scan(anonymous, payload)
+        self.assertEqual(status, 302)
+
+        student_client = AsyncClient()
+        await student_client.aforce_login(self.students[0].user)
+        status, _ = await self.scan(student_client, payload)
+        self.assertEqual(status, 403)
+        self.assertFalse(await Attendance.objects.aexists())
+
+    async def test_concurrent_scanners(self):
+        scanners = [AsyncClient() for _ in range(6)]
+        for scanner in scanners:
+            await scanner.aforce_login(self.admin)
+        payloads = [build_student_qr_payload(student) for student in self.students]
+
+        # Every scanner sees every student, so each student is marked once and reported five times as a repeat.
+        results = await asyncio.gather(
+            *(self.scan(scanner, payload) for payload in payloads for scanner in scanners)
+        )
+
+        statuses = [status for _, status in results]
+        self.assertEqual(statuses.count("marked"), len(self.students))
+        self.assertEqual(statuses.count("already_marked"), len(self.students) * (len(scanners) - 1))
+        today = timezone.localdate()
+        self.assertEqual(await Attendance.objects.filter(date=today).acount(), len(self.students))
+        summary = await AttendanceDailySummary.objects.filter(date=today).values_list("present", flat=True).afirst()
+        self.assertEqual(summary, len(self.students))
+
+    async def test_rejects_unknown_and_tampered_codes(self):
+        scanner = AsyncClient()
+        await scanner.aforce_login(self.admin)
+        status, _ = await self.scan(scanner, build_compact_qr_token(999999))
+        self.assertEqual(status, 404)
+        payload = build_student_qr_payload(self.students[0])
+        status, _ = await self.scan(scanner, payload[:-1] + ("A" if payload[-1] != "A" else "B"))
+        self.assertEqual(status, 400)
+        self.assertFalse(await Attendance.objects.aexists())
+
+    async def test_scanner_page_posts_batches_to_the_async_view(self):
+        scanner = AsyncClient()
+        await scanner.aforce_login(self.admin)
+        page = (await scanner.get(reverse("attendance_scanner"))).content.decode()
+        endpoint = re.search(r'window\.scanBatchEndpoint = "([^"]+)"', page).group(1)
+        self.assertEqual(endpoint, reverse("scan_qr_attendance_batch_async"))
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(endpoint).func))
+
+        scans = [{"qr_data": build_student_qr_payload(student)} for student in self.students[:3]]
+        scans.append(scans[0])
+        response = await scanner.post(endpoint, data=json.dumps({"scans": scans}), content_type="application/json")
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]], ["marked"] * 3 + ["already_marked"]
+        )
+        self.assertEqual(await Attendance.objects.acount(), 3)
+        empty = await scanner.post(endpoint, data=json.dumps({"scans": []}), content_type="application/json")
+        self.assertEqual(empty.status_code, 400)
+
+
+class SingleScanTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.student = make_students(1)[0]
+        self.client.force_login(self.admin)
+
+    def scan(self, qr_data):
+        return self.client.post(
+            reverse("scan_qr_attendance"), data=json.dumps({"qr_data": qr_data}), content_type="application/json"
+        )
+
+    def test_wsgi_route_stays_synchronous(self):
+        self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse("scan_qr_attendance")).func))
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse("scan_qr_attendance_async")).func))
+
+    def test_scanner_page_posts_batches_to_the_sync_view_under_wsgi(self):
+        page = self.client.get(reverse("attendance_scanner"))
+        self.assertContains(page, f'window.scanBatchEndpoint = "{reverse("scan_qr_attendance_batch")}"')
+
+    def test_marks_once_and_reports_repeats(self):
+        payload = build_student_qr_payload(self.student)
+        first = self.scan(payload).json()
+        self.assertEqual((first["status"], first["student"]), ("marked", "ADM0000"))
+        self.assertEqual(self.scan(payload).json()["status"], "already_marked")
+        self.assertEqual(Attendance.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(self.scan(build_compact_qr_token(999999)).status_code, 404)
+        malformed = self.client.post(reverse("scan_qr_attendance"), data="{", content_type="application/json")
+        self.assertEqual(malformed.status_code, 400)
+
+
+class RosterCacheTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(2)
+        self.ids = [student.id for student in self.students]
+
+    def test_counts_hits_and_picks_up_rows_created_without_signals(self):
+        user = User.objects.create_user(username="bulk", password="x", role=UserRole.STUDENT)
+        section = class_section()
+        before = roster_cache.stats()
+        self.assertEqual(roster_cache.get(self.ids[0]).display_name, "Student0")
+        self.assertEqual(roster_cache.get(self.ids[0]).admission_no, "ADM0000")
+        profile = StudentProfile(
+            user=user, admission_no="ADM0100", section=section, school_class_id=section.school_class_id
+        )
+        bulk = StudentProfile.objects.bulk_create([profile])[0]
+
+        self.assertIsNone(roster_cache.get(0))
+        self.assertEqual(roster_cache.get(bulk.id).admission_no, "ADM0100")
+        self.assertEqual(roster_cache.get(bulk.id).admission_no, "ADM0100")
+        stats = roster_cache.stats()
+        counted = tuple(stats[name] - before[name] for name in ("hits", "misses", "reloads"))
+        self.assertEqual(counted, (3, 2, 1))
+        self.assertEqual(stats["size"], 3)
+
+    def test_student_and_user_saves_reload_the_roster(self):
+        roster_cache.get(self.ids[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.students[0].user
+            user.first_name = "Renamed"
+            user.save()
+        self.assertEqual(roster_cache.get(self.ids[0]).display_name, "Renamed")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[1].delete()
+        self.assertEqual(roster_cache.get_many(self.ids), {self.ids[0]: roster_cache.get(self.ids[0])})
+
+    def test_get_many_checks_the_version_once_per_batch(self):
+        roster_cache.get(self.ids[0])
+        with mock.patch("portal.roster.current_version", wraps=current_version) as version:
+            entries = roster_cache.get_many(self.ids + [0])
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual([entries[pk].admission_no for pk in self.ids], ["ADM0000", "ADM0001"])
+
+
+class ScannerRosterTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN)
+        self.students = make_students(3)
+        self.client.force_login(self.admin)
+        self.today = timezone.localdate()
+
+    def fetch(self, **params):
+        return self.client.get(reverse("scanner_roster"), data=params)
+
+    def test_full_snapshot_and_etag(self):
+        Attendance.objects.create(student=self.students[1], date=self.today)
+        response = self.fetch()
+        data = response.json()
+        self.assertFalse(data["delta"])
+        self.assertEqual(data["fields"], ["id", "admission_no", "name", "class_name", "section", "present"])
+        self.assertEqual([row[-1] for row in sorted(data["students"])], [0, 1, 0])
+        self.assertEqual(sorted(data["students"])[0][:4], [self.students[0].id, "ADM0000", "Student0", "5"])
+
+        cached = self.client.get(reverse("scanner_roster"), headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_delta_since_version(self):
+        first = self.fetch().json()
+        Attendance.objects.create(student=self.students[2], date=self.today)
+
+        delta = self.fetch(since=first["version"], after=first["cursor"]).json()
+        self.assertTrue(delta["delta"])
+        self.assertEqual(delta["present"], [self.students[2].id])
+        self.assertNotIn("students", delta)
+        unchanged = self.fetch(since=delta["version"], after=delta["cursor"]).json()
+        self.assertEqual((unchanged["present"], unchanged["cursor"]), ([], delta["cursor"]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(username="late", password="x", role=UserRole.STUDENT)
+            StudentProfile.objects.create(user=user, admission_no="ADM9999", section=class_section())
+        refreshed = self.fetch(since=delta["version"], after=delta["cursor"]).json()
+        self.assertFalse(refreshed["delta"])
+        self.assertEqual(len(refreshed["students"]), 4)
+
+
+class CompactQrTokenTests(SimpleTestCase):
+    def test_round_trip_fits_a_small_alphanumeric_code(self):
+        token = build_compact_qr_token(48213)
+        self.assertRegex(token, r"^SM[A-Z2-7]+$")
+        self.assertEqual(resolve_student_id_from_qr(f"  {token}\n"), 48213)
+        self.assertLessEqual(qr_version(token), 2)
+
+    def test_printed_legacy_cards_still_resolve(self):
+        legacy_token = build_student_qr_token(7)
+        legacy_json = json.dumps({"token": legacy_token, "admission_no": "ADM0007", "name": "Student Seven"})
+        self.assertEqual(resolve_student_id_from_qr(legacy_token), 7)
+        self.assertEqual(resolve_student_id_from_qr(legacy_json), 7)
+
+    def test_tampered_tokens_are_rejected(self):
+        token = build_compact_qr_token(7)
+        forged = token[:8] + ("B" if token[8] == "A" else "A") + token[9:]
+        for bad in (forged, token[:-1], token + "A", token.lower().replace("sm", "SM", 1), "SM0189"):
+            with self.subTest(bad), self.assertRaises(signing.BadSignature):
+                resolve_student_id_from_qr(bad)
+
+    def test_key_rotation(self):
+        with override_settings(QR_SIGNING_KEYS={1: "old-key"}, QR_ACTIVE_KEY_ID=1):
+            old_card = build_compact_qr_token(7)
+        with override_settings(QR_SIGNING_KEYS={1: "old-key", 2: "new-key"}, QR_ACTIVE_KEY_ID=2):
+            new_card = build_compact_qr_token(7)
+            self.assertEqual(resolve_student_id_from_qr(old_card), 7)
+            self.assertEqual(resolve_student_id_from_qr(new_card), 7)
+        with override_settings(QR_SIGNING_KEYS={2: "new-key"}, QR_ACTIVE_KEY_ID=2):
+            self.assertEqual(resolve_student_id_from_qr(new_card), 7)
+            with self.assertRaises(signing.BadSignature):
+                resolve_student_id_from_qr(old_card)
+
+    def test_validity_window(self):
+        token = build_compact_qr_token(7, valid_from=date(2026, 4, 1), valid_until=date(2027, 3, 31))
+        self.assertEqual(resolve_student_id_from_qr(token, today=date(2026, 4, 1)), 7)
+        self.assertEqual(resolve_student_id_from_qr(token, today=date(2027, 3, 31)), 7)
+        for day in (date(2026, 3, 31), date(2027, 4, 1)):
+            with self.subTest(day), self.assertRaises(signing.SignatureExpired):
+                resolve_student_id_from_qr(token, today=day)
+
+    def test_token_benchmark_covers_every_format(self):
+        results = run_qr_token_benchmarks(iterations=10)
+        self.assertEqual(set(results), {"legacy_json", "legacy_token", "compact", "compact_window"})
+        self.assertLess(results["compact"]["chars"], results["legacy_token"]["chars"])
+
+
+class IdentityCacheTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student, self.other = make_students(2)
+        parent_user = User.objects.create_user(username="parent", password="x", role=UserRole.PARENT)
+        self.parent = ParentProfile.objects.create(user=parent_user)
+        self.student.parent = self.parent
+        self.student.save()
+
+    def warm_queries(self, client, url):
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query["sql"] for query in queries]
+
+    def test_warm_dashboards_run_no_auth_queries(self):
+        for user, name in ((self.student.user, "student_dashboard"), (self.parent.user, "parent_dashboard")):
+            with self.subTest(name):
+                client = Client()
+                client.force_login(user)
+                for sql in self.warm_queries(client, reverse(name)):
+                    self.assertNotIn('FROM "django_session"', sql)
+                    self.assertNotIn('FROM "portal_user"', sql)
+                    self.assertNotIn('FROM "portal_studentprofile" WHERE "portal_studentprofile"."user_id"', sql)
+
+    def test_saves_invalidate_cached_identity(self):
+        self.client.force_login(self.student.user)
+        self.client.get(reverse("student_dashboard"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.student.user_id)
+            user.first_name = "Renamed"
+            user.save()
+        self.assertContains(self.client.get(reverse("student_dashboard")), "Renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.set_password("changed")
+            user.save(update_fields=["password"])
+        self.assertRedirects(
+            self.client.get(reverse("student_dashboard")), f"{reverse('login')}?next={reverse('student_dashboard')}"
+        )
+
+    def test_cached_user_holds_no_password_hash(self):
+        password = User.objects.get(pk=self.student.user_id).password
+        user = cached_user(self.student.user_id)
+        self.assertNotIn("password", user.__dict__)
+        self.assertNotIn(password.encode(), pickle.dumps(user))
+
+        self.client.force_login(self.student.user)
+        self.client.get(reverse("student_dashboard"))
+        self.assertEqual(self.client.get(reverse("student_dashboard")).status_code, 200)
+
+    def test_save_keeps_other_users_cached(self):
+        cached_user(self.student.user_id)
+        cached_user(self.other.user_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.student.user_id).first().save(update_fields=["first_name"])
+
+        with self.assertNumQueries(0):
+            cached_user(self.other.user_id)
+        with self.assertNumQueries(1):
+            cached_user(self.student.user_id)
+
+    def test_relinking_a_child_updates_both_parents(self):
+        other_parent = ParentProfile.objects.create(
+            user=User.objects.create_user(username="other-parent", password="x", role=UserRole.PARENT)
+        )
+        self.assertEqual(cached_user(self.parent.user_id).identity.children_ids, {self.student.id})
+        self.assertEqual(cached_user(other_parent.user_id).identity.children_ids, set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.parent = other_parent
+            self.student.save()
+        self.assertEqual(cached_user(self.parent.user_id).identity.children_ids, set())
+        self.assertEqual(cached_user(other_parent.user_id).identity.children_ids, {self.student.id})
+
+    def test_parent_history_is_limited_to_cached_children(self):
+        self.client.force_login(self.parent.user)
+        url = reverse("history_page", kwargs={"kind": "attendance"})
+        self.assertEqual(self.client.get(url, {"student": self.student.id}).status_code, 200)
+        self.assertEqual(self.client.get(url, {"student": self.other.id}).status_code, 404)
+
+
+class StaticPipelineTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Stands in for the vendored scanner library, which collectstatic refuses to run without.
+        vendored = Path(self.tmp.name) / "vendored"
+        (vendored / HTML5_QRCODE_STATIC).parent.mkdir(parents=True)
+        (vendored / HTML5_QRCODE_STATIC).write_text("/* html5-qrcode */\n" * 20)
+        overrides = override_settings(
+            STATIC_ROOT=Path(self.tmp.name) / "staticfiles", STATICFILES_DIRS=[*settings.STATICFILES_DIRS, vendored]
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_collectstatic_refuses_to_run_without_the_scanner_library(self):
+        with override_settings(STATICFILES_DIRS=[Path(self.tmp.name) / "empty"]):
+            with self.assertRaisesMessage(SystemCheckError, "portal.E001"):
+                call_command("collectstatic", interactive=False, verbosity=0)
+        self.assertFalse((Path(self.tmp.name) / "staticfiles").exists())
+
+    def test_scanner_page_loads_the_hashed_vendored_library(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.client.force_login(User.objects.create_user(username="admin", password="x", role=UserRole.ADMIN))
+        response = self.client.get(reverse("attendance_scanner"))
+        self.assertContains(response, static(HTML5_QRCODE_STATIC))
+        self.assertRegex(static(HTML5_QRCODE_STATIC), r"html5-qrcode-2\.3\.8\.min\.[0-9a-f]{12}\.js$")
+        self.assertNotContains(response, "unpkg.com")
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        root = Path(self.tmp.name) / "staticfiles"
+        manifest = json.loads((root / "staticfiles.json").read_text())
+        hashed = manifest["paths"]["css/app.css"]
+        self.assertRegex(hashed, r"^css/app\.[0-9a-f]{12}\.css$")
+        self.assertEqual(gzip.decompress((root / f"{hashed}.gz").read_bytes()), (root / hashed).read_bytes())
+        self.assertEqual(static("css/app.css"), f"{settings.STATIC_URL}{hashed}")
+
+    def test_student_dashboard_never_sends_the_token_to_a_third_party(self):
+        student = make_students(1)[0]
+        self.client.force_login(student.user)
+        with mock.patch("portal.views.QR_RENDERING_AVAILABLE", False):
+            response = self.client.get(reverse("student_dashboard"))
+        self.assertNotContains(response, "api.qrserver.com")
+        self.assertNotContains(response, 'id="student-qr-image"')
+
+
+@override_settings(ACADEMIC_YEAR_START_MONTH=4)
+class AttendanceArchiveTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(3)
+        rows = []
+        # Two closed years (2023-24, 2024-25) and the open 2025-26 year.
+        for offset in range(0, 900, 7):
+            day = date(2023, 4, 3) + timedelta(days=offset)
+            for index, student in enumerate(self.students):
+                if (offset + index) % 3 == 0:
+                    continue
+                method = AttendanceMethod.MANUAL if offset % 2 else AttendanceMethod.QR
+                marked_at = timezone.make_aware(datetime(day.year, day.month, day.day, 8, index * 7 + offset % 40))
+                rows.append(Attendance(student=student, date=day, marked_at=marked_at, method=method))
+        Attendance.objects.bulk_create(rows)
+
+    def snapshot(self):
+        student = self.students[0]
+        history = []
+        cursor = None
+        while True:
+            page = attendance_history_page(student, cursor, page_size=7)
+            history.extend(attendance_history_item(item) for item in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        export = list(attendance_export_rows(date(2023, 1, 1), date(2026, 12, 31)))
+        register = build_register(self.students[0].school_class, None, date(2025, 2, 1), date(2025, 5, 31))
+        return history, export, list(register.csv_rows())
+
+    def archive(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_attendance", *args, stdout=StringIO())
+
+    def test_archived_years_read_back_unchanged(self):
+        before = self.snapshot()
+        self.archive("--before", "2025-04-01")
+
+        self.assertFalse(Attendance.objects.filter(date__lt=date(2025, 4, 1)).exists())
+        self.assertTrue(Attendance.objects.filter(date__gte=date(2025, 4, 1)).exists())
+        self.assertEqual(AttendanceArchive.objects.count(), 6)
+        self.assertEqual(archive_boundary(), date(2025, 4, 1))
+        self.assertEqual(self.snapshot(), before)
+
+    def test_archiving_is_idempotent_and_merges_late_marks(self):
+        self.archive("--before", "2025-04-01")
+        late = timezone.make_aware(datetime(2024, 6, 4, 9, 30))
+        Attendance.objects.create(
+            student=self.students[0], date=date(2024, 6, 4), marked_at=late, method=AttendanceMethod.MANUAL
+        )
+        before = self.snapshot()
+        self.archive("--before", "2025-04-01")
+        self.archive("--before", "2025-04-01")
+
+        self.assertFalse(Attendance.objects.filter(date__lt=date(2025, 4, 1)).exists())
+        self.assertEqual(AttendanceArchive.objects.count(), 6)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_dry_run_changes_nothing(self):
+        count = Attendance.objects.count()
+        self.archive("--before", "2025-04-01", "--dry-run")
+        self.assertEqual(Attendance.objects.count(), count)
+        self.assertIsNone(archive_boundary())
+
+
+class FlakyTransport(NotificationTransport):
+    """Fails each message once, then delivers it; a parent without a phone cannot be reached."""
+
+    delivered = []
+    failed_once = set()
+
+    def send(self, message):
+        if not message.phone:
+            raise UndeliverableNotification("No phone number.")
+        if message.id not in self.failed_once:
+            self.failed_once.add(message.id)
+            raise ConnectionError("gateway timeout")
+        self.delivered.append(message)
+
+
+class ParentNotificationTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        FlakyTransport.delivered = []
+        FlakyTransport.failed_once = set()
+        self.day = date(2026, 3, 2)
+        self.students = make_students(5)
+        self.parents = []
+        for index in range(3):
+            user = User.objects.create_user(
+                username=f"parent{index}",
+                password="x",
+                role=UserRole.PARENT,
+                first_name=f"Parent{index}",
+                email=f"parent{index}@example.com",
+                phone=f"98000000{index}" if index else "",
+            )
+            self.parents.append(ParentProfile.objects.create(user=user))
+        # parent0 has students 0 and 1, parent1 student 2, parent2 student 3; student 4 has no parent.
+        for student, parent in zip(self.students, [0, 0, 1, 2]):
+            student.parent = self.parents[parent]
+            student.save()
+        Attendance.objects.bulk_create([attendance_for(self.students[index], self.day) for index in (1, 3)])
+
+    def test_absentees_come_from_one_query_grouped_by_parent(self):
+        with self.assertNumQueries(1):
+            absentees = absentees_by_parent(self.day)
+        self.assertEqual(
+            {parent_id: [student["id"] for student in students] for parent_id, students in absentees.items()},
+            {self.parents[0].id: [self.students[0].id], self.parents[1].id: [self.students[2].id]},
+        )
+        self.assertEqual(absentees_by_parent(self.day + timedelta(days=1)), {})
+
+    def test_queueing_is_idempotent(self):
+        self.assertEqual(queue_absence_notifications(self.day), 2)
+        self.assertEqual(queue_absence_notifications(self.day), 0)
+        self.assertEqual(ParentNotification.objects.count(), 2)
+
+    def test_drain_retries_then_delivers_once(self):
+        self.students[3].attendance_records.all().delete()
+        call_command("queue_absence_notifications", "--date", self.day.isoformat(), stdout=StringIO())
+
+        self.assertEqual(drain_outbox(FlakyTransport, batch_size=1, workers=2), (0, 3))
+        self.assertEqual(drain_outbox(FlakyTransport), (0, 0))
+        ParentNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(FlakyTransport), (2, 0))
+        self.assertEqual(drain_outbox(FlakyTransport), (0, 0))
+
+        self.assertEqual(sorted(message.name for message in FlakyTransport.delivered), ["Parent1", "Parent2"])
+        unreachable = ParentNotification.objects.get(parent=self.parents[0])
+        self.assertEqual((unreachable.status, unreachable.attempts), (NotificationStatus.FAILED, 1))
+        self.assertEqual(ParentNotification.objects.filter(status=NotificationStatus.SENT).count(), 2)
+
+    def test_results_after_lease_expiry_are_left_to_the_new_claim(self):
+        queue_absence_notifications(self.day)
+        late_claim, late_messages = claim_batch(10)
+        ParentNotification.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        claim, messages = claim_batch(10)
+        self.assertEqual([message.id for message in messages], [message.id for message in late_messages])
+
+        with self.assertLogs("portal.notifications", "WARNING"):
+            self.assertEqual(record_results(late_claim, {message.id: None for message in late_messages}, 5), (0, 0))
+        self.assertFalse(ParentNotification.objects.exclude(claim=claim).exists())
+        self.assertFalse(ParentNotification.objects.filter(status=NotificationStatus.SENT).exists())
+
+        failures = {message.id: (False, "gateway timeout") for message in messages}
+        self.assertEqual(record_results(claim, failures, 5), (0, 2))
+        self.assertEqual(
+            list(ParentNotification.objects.values_list("status", "attempts", "claim")),
+            [(NotificationStatus.PENDING, 1, "")] * 2,
+        )
+
+    def test_email_transport_reaches_parents(self):
+        queue_absence_notifications(self.day)
+        call_command("send_parent_notifications", "--transport", "email", stdout=StringIO())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox), ["parent0@example.com", "parent1@example.com"]
+        )
+        siblings = next(message for message in mail.outbox if message.to == ["parent0@example.com"])
+        self.assertIn("Student0", siblings.body)
+        self.assertNotIn("Student1", siblings.body)
+
+
+class SchoolClassTests(IsolatedStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = make_students(3)
+        self.section_a = class_section("5", "A")
+        self.students[2].section = self.section_a
+        self.students[2].save()
+
+    def test_class_roster_is_cached_until_a_student_changes(self):
+        school_class = self.section_a.school_class
+        roster = class_roster(school_class.id)
+        self.assertEqual([row[1] for row in roster], ["ADM0000", "ADM0001", "ADM0002"])
+        with self.assertNumQueries(0):
+            self.assertEqual(class_roster(school_class.id), roster)
+        self.assertEqual([row[0] for row in class_roster(school_class.id, self.section_a.id)], [self.students[2].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[0].section = class_section("6")
+            self.students[0].save()
+        self.assertEqual(len(class_roster(school_class.id)), 2)
+        self.assertEqual(self.students[0].school_class.name, "6")
+
+    def test_register_form_rejects_a_section_of_another_class(self):
+        other = class_section("6", "A")
+        form = RegisterForm(
+            data={"school_class": self.section_a.school_class_id, "section": other.id, "month": "2026-03"}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("section", form.errors)
+
+    def test_roster_import_reuses_classes_by_name(self):
+        path = Path(self.tmp.name) / "roster.csv"
+        path.write_text(
+            "role,username,password,first_name,admission_no,class_name,section\n"
+            "student,imported1,Import-pass-123,One,IMP001, 5 ,A\n"
+            "student,imported2,Import-pass-123,Two,IMP002,7,\n",
+            encoding="utf-8",
+        )
+        call_command("import_roster", str(path), stdout=StringIO())
+        first, second = StudentProfile.objects.filter(admission_no__startswith="IMP").order_by("admission_no")
+        self.assertEqual(first.section_id, self.section_a.id)
+        self.assertEqual((second.school_class.name, second.section.name), ("7", ""))
+        self.assertEqual(SchoolClass.objects.count(), 2)
+
+
+class SchoolClassMigrationTests(TransactionTestCase):
+    before = [("portal", "0006_parent_notification_outbox")]
+    after = [("portal", "0009_school_class_constraints")]
+
+    def tearDown(self):
+        call_command("migrate", "portal", verbosity=0)
+
+    def test_free_text_classes_become_foreign_keys(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User = apps.get_model("portal", "User")
+        StudentProfile = apps.get_model("portal", "StudentProfile")
+        Homework = apps.get_model("portal", "Homework")
+        Summary = apps.get_model("portal", "AttendanceDailySummary")
+        day = date(2026, 3, 2)
+        for index, (class_name, section) in enumerate([("5", "A"), ("5 ", "A"), ("5", ""), ("6", "B")]):
+            user = User.objects.create(username=f"migrated{index}", role=UserRole.STUDENT)
+            StudentProfile.objects.create(user=user, admission_no=f"MIG{index}", class_name=class_name, section=section)
+        admin = User.objects.create(username="migrator", role=UserRole.ADMIN)
+        Homework.objects.create(class_name="6", subject="Maths", title="Sums", due_date=day, created_by=admin)
+        Summary.objects.create(date=day, class_name="5", section="A", enrolled=1, present=1, qr_count=1)
+        Summary.objects.create(date=day, class_name="5 ", section="A", enrolled=1, manual_count=0)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        StudentProfile = apps.get_model("portal", "StudentProfile")
+        self.assertEqual(
+            list(
+                StudentProfile.objects.order_by("admission_no").values_list("school_class__name", "section__name")
+            ),
+            [("5", "A"), ("5", "A"), ("5", ""), ("6", "B")],
+        )
+        self.assertEqual(apps.get_model("portal", "Homework").objects.get().school_class.name, "6")
+        summary = apps.get_model("portal", "AttendanceDailySummary").objects.get()
+        self.assertEqual((summary.section.name, summary.enrolled, summary.present), ("A", 2, 1))
@@ -8,12 +8,40 @@ urlpatterns = [
     path("redirect/", views.role_redirect, name="role_redirect"),
     path("dashboard/admin/", views.admin_dashboard, name="admin_dashboard"),
     path("dashboard/admin/students/", views.manage_students, name="manage_students"),
+    path("dashboard/admin/lookup/students/", views.lookup_students, name="lookup_students"),
+    path("dashboard/admin/lookup/parents/", views.lookup_parents, name="lookup_parents"),
     path("dashboard/admin/parents/", views.manage_parents, name="manage_parents"),
     path("dashboard/admin/academics/", views.manage_academics, name="manage_academics"),
     path("dashboard/admin/fees/", views.manage_fees, name="manage_fees"),
+    path("dashboard/admin/qr-cards/", views.qr_cards, name="qr_cards"),
+    path("dashboard/admin/register/", views.class_register, name="class_register"),
+    path("dashboard/admin/exports/", views.exports, name="exports"),
+    path("dashboard/admin/exports/attendance/", views.export_attendance, name="export_attendance"),
+    path("dashboard/admin/exports/fees/", views.export_fees, name="export_fees"),
     path("dashboard/admin/attendance/", views.attendance_scanner, name="attendance_scanner"),
+    path("dashboard/admin/attendance/feed/", views.attendance_feed, name="attendance_feed"),
+    path("dashboard/admin/attendance/roster/", views.scanner_roster, name="scanner_roster"),
     path("dashboard/admin/attendance/manual/", views.manual_attendance_mark, name="manual_attendance_mark"),
     path("dashboard/admin/attendance/scan/", views.scan_qr_attendance, name="scan_qr_attendance"),
+    path(
+        "dashboard/admin/attendance/scan/async/",
+        views.scan_qr_attendance_async,
+        name="scan_qr_attendance_async",
+    ),
+    path(
+        "dashboard/admin/attendance/scan/batch/",
+        views.scan_qr_attendance_batch,
+        name="scan_qr_attendance_batch",
+    ),
+    path(
+        "dashboard/admin/attendance/scan/batch/async/",
+        views.scan_qr_attendance_batch_async,
+        name="scan_qr_attendance_batch_async",
+    ),
+    path("dashboard/admin/attendance/roster-cache/", views.roster_cache_stats, name="roster_cache_stats"),
     path("dashboard/student/", views.student_dashboard, name="student_dashboard"),
+    path("dashboard/history/<str:kind>/", views.history_page, name="history_page"),
+    path("dashboard/qr/<str:token>.png", views.student_qr_image, name="student_qr_image"),
     path("dashboard/parent/", views.parent_dashboard, name="parent_dashboard"),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
@@ -0,0 +1,35 @@
+"""Cross-process version stamps.
+
+Each stamp is a small file under ``settings.VERSION_STAMP_DIR``. Per-process
+caches remember the stamp they were built from and rebuild when it changes,
+so every Passenger worker notices an invalidation made by any other worker.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .files import write_atomic
+
+
+def _stamp_path(name):
+    return settings.VERSION_STAMP_DIR / name
+
+
+def current_version(name):
+    try:
+        return _stamp_path(name).read_text()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_version(name):
+    token = f"{time.time_ns()}-{os.getpid()}"
+    write_atomic(_stamp_path(name), token.encode("ascii"))
+    return token
+
+
+def bump_version_on_commit(name):
+    # Bumping before commit would let another worker rebuild from pre-commit data under the new stamp.
+    transaction.on_commit(lambda: bump_version(name))
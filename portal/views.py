@@ -1,27 +1,58 @@
 import json
-import base64
-from io import BytesIO
-from urllib.parse import quote
+import os
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.core import signing
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
 from django.db.models import Count, Sum
-from django.http import JsonResponse
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.utils.text import slugify
 from django.views.decorators.http import require_POST
 
-from .decorators import role_required
+from .assets import scanner_library_url
+from .attendance import (
+    MAX_SCAN_BATCH_SIZE,
+    amark_attendance,
+    attendance_feed_since,
+    mark_attendance,
+    mark_qr_batch,
+    roster_snapshot,
+)
+from .cards import build_class_sheets, students_by_class
+from .content import fragment_cache_context
+from .decorators import query_budget, role_required
+from .exports import EXPORT_CONTENT_TYPES, attendance_export, fee_export
 from .forms import (
+    AttendanceExportForm,
+    FeeExportForm,
     FeeRecordForm,
     HomeworkForm,
     NoticeForm,
     ParentCreateForm,
+    RegisterForm,
     StudentCreateForm,
     StyledAuthenticationForm,
 )
+from .history import HISTORY_KINDS, attendance_history_page, fee_history_page
+from .identity import user_identity
+from .lookup import search_parents, search_students
+from .metrics import metrics
 from .models import (
     Attendance,
     AttendanceMethod,
@@ -30,39 +61,29 @@ from .models import (
     Notice,
     NoticeAudience,
     ParentProfile,
+    SchoolClass,
     StudentProfile,
     UserRole,
 )
+from .pagination import InvalidCursor, KeysetPage
+from .qr import (
+    QR_RENDERING_AVAILABLE,
+    QR_SIGNER,
+    build_student_qr_payload,
+    build_student_qr_token,
+    qr_payload_digest,
+    render_qr_png,
+    resolve_student_id_from_qr,
+)
+from .registers import REGISTER_AVAILABLE, attendance_register, register_csv_chunks
+from .roster import roster_cache
+from .summaries import daily_summary_rows
 
-try:
-    import qrcode  # type: ignore
-except ImportError:  # pragma: no cover - optional dependency
-    qrcode = None
-
-
-QR_SIGNER = signing.Signer(salt="schoolms-qr-attendance")
-
-
-def build_student_qr_token(student_id):
-    return QR_SIGNER.sign(str(student_id))
-
-
-def resolve_student_id_from_qr(qr_data):
-    raw_token = (qr_data or "").strip()
-    if not raw_token:
-        raise signing.BadSignature("Empty QR data")
-
-    try:
-        payload = json.loads(raw_token)
-        if isinstance(payload, dict) and payload.get("token"):
-            raw_token = payload["token"]
-    except json.JSONDecodeError:
-        pass
 
-    unsigned = QR_SIGNER.unsign(raw_token)
-    return int(unsigned)
+STUDENT_PAGE_SIZE = 50
 
 
+@query_budget(2)
 def role_redirect(request):
     if not request.user.is_authenticated:
         return redirect("login")
@@ -77,6 +98,7 @@ def role_redirect(request):
     return redirect("login")
 
 
+@query_budget(9)
 def login_view(request):
     if request.user.is_authenticated:
         return role_redirect(request)
@@ -89,34 +111,47 @@ def login_view(request):
     return render(request, "auth/login.html", {"form": form})
 
 
+@query_budget(4)
 def logout_view(request):
     logout(request)
     return redirect("login")
 
 
+@query_budget(6)
 @role_required(UserRole.ADMIN)
 def admin_dashboard(request):
     today = timezone.localdate()
-    total_students = StudentProfile.objects.count()
-    present_today = Attendance.objects.filter(date=today).count()
+    summary_rows = daily_summary_rows(today)
+    total_students = sum(row.enrolled for row in summary_rows)
+    present_today = sum(row.present for row in summary_rows)
     pending_fees = FeeRecord.objects.filter(total_amount__gt=0).aggregate(total=Sum("total_amount"), paid=Sum("paid_amount"))
     total_fee = pending_fees.get("total") or 0
     paid_fee = pending_fees.get("paid") or 0
     due_fee = total_fee - paid_fee
 
+    students_by_class = {}
+    for row in summary_rows:
+        school_class = row.section.school_class
+        class_row = students_by_class.setdefault(
+            school_class.id, {"class_name": school_class.name, "total": 0, "present": 0}
+        )
+        class_row["total"] += row.enrolled
+        class_row["present"] += row.present
+
     context = {
         "today": today,
         "total_students": total_students,
         "present_today": present_today,
         "absent_today": max(total_students - present_today, 0),
         "recent_attendance": Attendance.objects.select_related("student", "student__user").all()[:12],
-        "students_by_class": StudentProfile.objects.values("class_name").annotate(total=Count("id")).order_by("class_name"),
+        "students_by_class": [row for row in students_by_class.values() if row["total"] or row["present"]],
         "due_fee": due_fee,
         "notices": Notice.objects.all()[:5],
     }
     return render(request, "dashboard/admin_dashboard.html", context)
 
 
+@query_budget(13)
 @role_required(UserRole.ADMIN)
 def manage_students(request):
     form = StudentCreateForm(request.POST or None)
@@ -128,10 +163,33 @@ def manage_students(request):
         )
         return redirect("manage_students")
 
-    students = StudentProfile.objects.select_related("user", "parent", "parent__user").all()
-    return render(request, "dashboard/manage_students.html", {"form": form, "students": students})
+    query = request.GET.get("q", "").strip()
+    students = StudentProfile.objects.select_related("user", "parent__user", "section__school_class").order_by(
+        "admission_no"
+    )
+    if query:
+        students = students.filter(pk__in=[match["id"] for match in search_students(query, limit=STUDENT_PAGE_SIZE)])
+    page = Paginator(students, STUDENT_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(
+        request,
+        "dashboard/manage_students.html",
+        {"form": form, "students": page.object_list, "page": page, "query": query},
+    )
+
+
+@query_budget(6)
+@role_required(UserRole.ADMIN)
+def lookup_students(request):
+    return JsonResponse({"ok": True, "results": search_students(request.GET.get("q", ""))})
+
+
+@query_budget(5)
+@role_required(UserRole.ADMIN)
+def lookup_parents(request):
+    return JsonResponse({"ok": True, "results": search_parents(request.GET.get("q", ""))})
 
 
+@query_budget(5)
 @role_required(UserRole.ADMIN)
 def manage_parents(request):
     form = ParentCreateForm(request.POST or None)
@@ -149,6 +207,7 @@ def manage_parents(request):
     return render(request, "dashboard/manage_parents.html", {"form": form, "parents": parents})
 
 
+@query_budget(4)
 @role_required(UserRole.ADMIN)
 def manage_academics(request):
     notice_form = NoticeForm(prefix="notice", data=request.POST or None)
@@ -173,11 +232,12 @@ def manage_academics(request):
         "notice_form": notice_form,
         "homework_form": homework_form,
         "notices": Notice.objects.all()[:20],
-        "homework_items": Homework.objects.all()[:20],
+        "homework_items": Homework.objects.select_related("school_class")[:20],
     }
     return render(request, "dashboard/manage_academics.html", context)
 
 
+@query_budget(5)
 @role_required(UserRole.ADMIN)
 def manage_fees(request):
     form = FeeRecordForm(request.POST or None)
@@ -190,32 +250,160 @@ def manage_fees(request):
     return render(request, "dashboard/manage_fees.html", {"form": form, "fee_records": fee_records})
 
 
+def _render_exports(request, attendance_form=None, fee_form=None, status=200):
+    today = timezone.localdate()
+    context = {
+        "attendance_form": attendance_form or AttendanceExportForm(initial={"start": today.replace(day=1), "end": today}),
+        "fee_form": fee_form or FeeExportForm(),
+    }
+    return render(request, "dashboard/exports.html", context, status=status)
+
+
+def _export_response(form, build_export):
+    filename, chunks = build_export(form.cleaned_data)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[form.cleaned_data["format"]])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@query_budget(2)
+@role_required(UserRole.ADMIN)
+def exports(request):
+    return _render_exports(request)
+
+
+@query_budget(3)
+@role_required(UserRole.ADMIN)
+def export_attendance(request):
+    form = AttendanceExportForm(request.GET)
+    if not form.is_valid():
+        return _render_exports(request, attendance_form=form, status=400)
+    return _export_response(form, attendance_export)
+
+
+@query_budget(3)
+@role_required(UserRole.ADMIN)
+def export_fees(request):
+    form = FeeExportForm(request.GET)
+    if not form.is_valid():
+        return _render_exports(request, fee_form=form, status=400)
+    return _export_response(form, fee_export)
+
+
+@query_budget(7)
+@role_required(UserRole.ADMIN)
+def class_register(request):
+    form = RegisterForm(request.GET or None, initial={"month": timezone.localdate().strftime("%Y-%m")})
+    context = {"form": form, "register_available": REGISTER_AVAILABLE}
+    if REGISTER_AVAILABLE and form.is_valid():
+        data = form.cleaned_data
+        register = attendance_register(data["school_class"], data["section"], data["start"], data["end"])
+        if data["format"] == "csv":
+            response = StreamingHttpResponse(register_csv_chunks(register), content_type=EXPORT_CONTENT_TYPES["csv"])
+            filename = f"register-{slugify(register.class_name)}-{register.start}-to-{register.end}.csv"
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+        context.update(
+            {
+                "register": register,
+                "register_rows": register.rows(),
+                "day_totals": register.day_totals.tolist(),
+                "class_percentage": round(register.class_percentage, 1),
+            }
+        )
+    return render(request, "dashboard/class_register.html", context)
+
+
+@query_budget(3)
 @role_required(UserRole.ADMIN)
 def attendance_scanner(request):
     today = timezone.localdate()
-    attendance_today = Attendance.objects.select_related("student", "student__user").filter(date=today)
-    students = StudentProfile.objects.select_related("user").order_by("admission_no")
+    attendance_today = list(Attendance.objects.select_related("student", "student__user").filter(date=today))
     return render(
         request,
         "dashboard/attendance_scanner.html",
         {
             "attendance_today": attendance_today,
-            "students": students,
+            "feed_cursor": max((item.id for item in attendance_today), default=0),
+            # Under ASGI the scanner posts to the async view, so a batch waits on the event loop, not a thread.
+            "scan_batch_url": reverse(
+                "scan_qr_attendance_batch_async" if isinstance(request, ASGIRequest) else "scan_qr_attendance_batch"
+            ),
+            "scanner_library_url": scanner_library_url(),
             "today": today,
         },
     )
 
 
+@query_budget(3)
+@role_required(UserRole.ADMIN)
+def attendance_feed(request):
+    try:
+        after_id = int(request.GET.get("after", 0))
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "Invalid cursor."}, status=400)
+
+    today = timezone.localdate()
+    rows = attendance_feed_since(today, after_id)
+    return JsonResponse(
+        {
+            "ok": True,
+            "date": today.isoformat(),
+            "cursor": rows[-1]["id"] if rows else after_id,
+            "rows": rows,
+        }
+    )
+
+
+@query_budget(4)
+@role_required(UserRole.ADMIN)
+def scanner_roster(request):
+    try:
+        after_id = int(request.GET.get("after", 0))
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "Invalid cursor."}, status=400)
+
+    snapshot = roster_snapshot(timezone.localdate(), request.GET.get("since"), after_id)
+    etag = '"{version}-{cursor}"'.format(**snapshot)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({"ok": True, **snapshot}, json_dumps_params={"separators": (",", ":")})
+    response["ETag"] = etag
+    # Revalidate every time: the ETag moves with each new mark.
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@query_budget(3)
+@role_required(UserRole.ADMIN)
+def qr_cards(request):
+    class_name = request.GET.get("class_name")
+    if class_name:
+        if not QR_RENDERING_AVAILABLE:
+            messages.error(request, "QR rendering is not available on this server.")
+            return redirect("qr_cards")
+        for _, students in students_by_class([class_name]):
+            # Rendered inline: web workers should not fork pools. Unchanged cards come from the card cache.
+            path, _ = build_class_sheets(class_name, students)
+            return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+        messages.error(request, f"No students found in class {class_name}.")
+        return redirect("qr_cards")
+
+    classes = SchoolClass.objects.annotate(total=Count("students")).filter(total__gt=0).order_by("name")
+    return render(request, "dashboard/qr_cards.html", {"classes": classes})
+
+
+@query_budget(10)
 @role_required(UserRole.ADMIN)
 @require_POST
 def manual_attendance_mark(request):
-    student_id = request.POST.get("student_id")
+    student_id = request.POST.get("student_id", "")
+    if not student_id.isdigit():
+        messages.error(request, "Pick a student from the search results first.")
+        return redirect("attendance_scanner")
     student = get_object_or_404(StudentProfile, pk=student_id)
-    attendance, created = Attendance.objects.get_or_create(
-        student=student,
-        date=timezone.localdate(),
-        defaults={"method": AttendanceMethod.MANUAL, "marked_by": request.user},
-    )
+    _, created = mark_attendance(student.id, timezone.localdate(), AttendanceMethod.MANUAL, request.user)
     if created:
         messages.success(request, f"Attendance marked for {student.admission_no}.")
     else:
@@ -223,40 +411,38 @@ def manual_attendance_mark(request):
     return redirect("attendance_scanner")
 
 
-@role_required(UserRole.ADMIN)
-@require_POST
-def scan_qr_attendance(request):
+def _scanned_student_id(request, today):
+    """``(student_id, None)`` for a well-formed single-scan request, otherwise ``(None, error response)``."""
     try:
         payload = json.loads(request.body.decode("utf-8"))
     except json.JSONDecodeError:
-        return JsonResponse({"ok": False, "message": "Invalid JSON payload"}, status=400)
+        return None, JsonResponse({"ok": False, "message": "Invalid JSON payload"}, status=400)
 
     qr_data = payload.get("qr_data", "")
     try:
-        student_id = resolve_student_id_from_qr(qr_data)
+        return resolve_student_id_from_qr(qr_data, today), None
     except signing.BadSignature:
-        return JsonResponse({"ok": False, "message": "QR is invalid or tampered."}, status=400)
+        metrics.record_scan("invalid")
+        metrics.invalid_signatures.inc()
+        return None, JsonResponse({"ok": False, "message": "QR is invalid or tampered."}, status=400)
     except ValueError:
-        return JsonResponse({"ok": False, "message": "QR payload is malformed."}, status=400)
+        metrics.record_scan("invalid")
+        return None, JsonResponse({"ok": False, "message": "QR payload is malformed."}, status=400)
 
-    student = get_object_or_404(StudentProfile.objects.select_related("user"), pk=student_id)
-    attendance, created = Attendance.objects.get_or_create(
-        student=student,
-        date=timezone.localdate(),
-        defaults={"method": AttendanceMethod.QR, "marked_by": request.user},
-    )
 
+def _scan_response(student, marked_at, created):
+    metrics.record_scan("marked" if created else "already_marked")
     if created:
         return JsonResponse(
             {
                 "ok": True,
                 "status": "marked",
-                "message": f"Attendance marked for {student.user.get_full_name() or student.user.username}",
+                "message": f"Attendance marked for {student.display_name}",
                 "student": student.admission_no,
             }
         )
 
-    marked_time = timezone.localtime(attendance.marked_at).strftime("%I:%M %p")
+    marked_time = timezone.localtime(marked_at).strftime("%I:%M %p")
     return JsonResponse(
         {
             "ok": True,
@@ -267,6 +453,168 @@ def scan_qr_attendance(request):
     )
 
 
+@query_budget(8)
+@role_required(UserRole.ADMIN)
+@require_POST
+def scan_qr_attendance(request):
+    today = timezone.localdate()
+    student_id, error = _scanned_student_id(request, today)
+    if error is not None:
+        return error
+    student = roster_cache.get(student_id)
+    if student is None:
+        metrics.record_scan("invalid")
+        raise Http404("No StudentProfile matches the given query.")
+    marked_at, created = mark_attendance(student_id, today, AttendanceMethod.QR, request.user)
+    return _scan_response(student, marked_at, created)
+
+
+@query_budget(8)
+@role_required(UserRole.ADMIN)
+@require_POST
+async def scan_qr_attendance_async(request):
+    """:func:`scan_qr_attendance` for ASGI servers, where a scan waits on the event loop instead of a thread.
+
+    Under WSGI each call would be driven through an event loop of its own, so WSGI clients keep the sync route.
+    """
+    today = timezone.localdate()
+    student_id, error = _scanned_student_id(request, today)
+    if error is not None:
+        return error
+    student = await sync_to_async(roster_cache.get)(student_id)
+    if student is None:
+        metrics.record_scan("invalid")
+        raise Http404("No StudentProfile matches the given query.")
+    user = await request.auser()
+    marked_at, created = await amark_attendance(student_id, today, AttendanceMethod.QR, user)
+    return _scan_response(student, marked_at, created)
+
+
+def _scan_batch(request):
+    """``(scans, None)`` for a well-formed batch request, otherwise ``(None, error response)``."""
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except json.JSONDecodeError:
+        return None, JsonResponse({"ok": False, "message": "Invalid JSON payload"}, status=400)
+
+    scans = payload.get("scans") if isinstance(payload, dict) else None
+    if not isinstance(scans, list) or not scans:
+        return None, JsonResponse({"ok": False, "message": "No scans supplied."}, status=400)
+    if len(scans) > MAX_SCAN_BATCH_SIZE:
+        return None, JsonResponse(
+            {"ok": False, "message": f"At most {MAX_SCAN_BATCH_SIZE} scans per batch."},
+            status=400,
+        )
+    return scans, None
+
+
+def _scan_batch_response(results):
+    for result in results:
+        metrics.record_scan(result["status"])
+    return JsonResponse({"ok": True, "results": results})
+
+
+@query_budget(8)
+@role_required(UserRole.ADMIN)
+@require_POST
+def scan_qr_attendance_batch(request):
+    scans, error = _scan_batch(request)
+    if error is not None:
+        return error
+    return _scan_batch_response(mark_qr_batch(scans, request.user))
+
+
+@query_budget(8)
+@role_required(UserRole.ADMIN)
+@require_POST
+async def scan_qr_attendance_batch_async(request):
+    """:func:`scan_qr_attendance_batch` for ASGI servers; the scanner page posts here when served over ASGI.
+
+    The batch is marked in one hop to Django's database thread, as the async ORM would run its queries.
+    """
+    scans, error = _scan_batch(request)
+    if error is not None:
+        return error
+    user = await request.auser()
+    return _scan_batch_response(await sync_to_async(mark_qr_batch)(scans, user))
+
+
+@query_budget(2)
+@role_required(UserRole.ADMIN)
+def roster_cache_stats(request):
+    return JsonResponse({"ok": True, "pid": os.getpid(), "roster_cache": roster_cache.stats()})
+
+
+@query_budget(2)
+@role_required(UserRole.ADMIN)
+def metrics_view(request):
+    return HttpResponse(metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _history_page(page_func, student, cursor, page_size):
+    if student is None:
+        return KeysetPage([], None)
+    try:
+        return page_func(student, cursor, page_size)
+    except InvalidCursor:
+        # Stale or hand-edited links fall back to the newest page.
+        return page_func(student, None, page_size)
+
+
+def _history_pager(request, param, page):
+    pager = {"first_url": None, "next_url": None}
+    if request.GET.get(param):
+        query = request.GET.copy()
+        query.pop(param)
+        pager["first_url"] = f"?{query.urlencode()}"
+    if page.has_next:
+        query = request.GET.copy()
+        query[param] = page.next_cursor
+        pager["next_url"] = f"?{query.urlencode()}"
+    return pager
+
+
+def _history_student(request):
+    user = request.user
+    if user.role == UserRole.STUDENT and not user.is_superuser:
+        return getattr(user, "student_profile", None)
+
+    student_id = int(request.GET.get("student", ""))
+    if user.role == UserRole.PARENT and not user.is_superuser and student_id not in user_identity(user).children_ids:
+        return None
+    return StudentProfile.objects.filter(pk=student_id).first()
+
+
+@query_budget(4)
+@role_required(UserRole.STUDENT, UserRole.PARENT, UserRole.ADMIN)
+def history_page(request, kind):
+    if kind not in HISTORY_KINDS:
+        raise Http404("Unknown history.")
+    page_func, serialize = HISTORY_KINDS[kind]
+
+    try:
+        student = _history_student(request)
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "A numeric student id is required."}, status=400)
+    if student is None:
+        raise Http404("No StudentProfile matches the given query.")
+
+    try:
+        page = page_func(student, request.GET.get("cursor"))
+    except InvalidCursor as exc:
+        return JsonResponse({"ok": False, "message": str(exc)}, status=400)
+
+    return JsonResponse(
+        {
+            "ok": True,
+            "student": student.admission_no,
+            "items": [serialize(item) for item in page.items],
+            "next_cursor": page.next_cursor,
+        }
+    )
+
+
+@query_budget(7)
 @role_required(UserRole.STUDENT)
 def student_dashboard(request):
     try:
@@ -276,41 +624,72 @@ def student_dashboard(request):
         return redirect("logout")
 
     today = timezone.localdate()
-    qr_payload = {
-        "token": build_student_qr_token(student.id),
-        "admission_no": student.admission_no,
-        "name": student.user.get_full_name() or student.user.username,
-    }
-
     notices = Notice.objects.filter(audience__in=[NoticeAudience.ALL, NoticeAudience.STUDENT])[:10]
-    homework_items = Homework.objects.filter(class_name=student.class_name)[:10]
-    fees = student.fee_records.all()[:10]
-    attendance_records = student.attendance_records.all()[:20]
-
-    qr_payload_text = json.dumps(qr_payload, separators=(",", ":"))
-    qr_image_src = f"https://api.qrserver.com/v1/create-qr-code/?size=260x260&data={quote(qr_payload_text, safe='')}"
+    homework_items = Homework.objects.filter(school_class_id=student.school_class_id)[:10]
+    attendance_page = _history_page(attendance_history_page, student, request.GET.get("attendance_cursor"), 20)
+    fee_page = _history_page(fee_history_page, student, request.GET.get("fee_cursor"), 10)
+
+    qr_payload_text = build_student_qr_payload(student)
+    # Without the qrcode package the page shows the token text instead of sending it to a third party.
+    qr_image_src = None
+    if QR_RENDERING_AVAILABLE:
+        qr_image_src = "{}?v={}".format(
+            reverse("student_qr_image", args=[build_student_qr_token(student.id)]),
+            qr_payload_digest(qr_payload_text),
+        )
 
-    # Prefer local QR generation when optional dependency is available.
-    if qrcode is not None:
-        qr_img = qrcode.make(qr_payload_text)
-        qr_buf = BytesIO()
-        qr_img.save(qr_buf, format="PNG")
-        qr_image_src = f"data:image/png;base64,{base64.b64encode(qr_buf.getvalue()).decode('ascii')}"
+    # The first history page starts at the newest mark, so today's mark (if any) is already on it.
+    if request.GET.get("attendance_cursor"):
+        today_attendance = student.attendance_records.filter(date=today).first()
+    else:
+        today_attendance = next((item for item in attendance_page.items[:1] if item.date == today), None)
 
     context = {
         "student": student,
         "today": today,
-        "today_attendance": student.attendance_records.filter(date=today).first(),
-        "attendance_records": attendance_records,
+        "today_attendance": today_attendance,
+        "attendance_records": attendance_page.items,
+        "attendance_pager": _history_pager(request, "attendance_cursor", attendance_page),
         "notices": notices,
         "homework_items": homework_items,
-        "fees": fees,
+        "fees": fee_page.items,
+        "fee_pager": _history_pager(request, "fee_cursor", fee_page),
         "qr_payload": qr_payload_text,
         "qr_image_src": qr_image_src,
+        **fragment_cache_context(),
     }
     return render(request, "dashboard/student_dashboard.html", context)
 
 
+@query_budget(3)
+@role_required(UserRole.STUDENT, UserRole.PARENT, UserRole.ADMIN)
+def student_qr_image(request, token):
+    if not QR_RENDERING_AVAILABLE:
+        raise Http404("QR rendering is not available.")
+    try:
+        student_id = int(QR_SIGNER.unsign(token))
+    except (signing.BadSignature, ValueError):
+        raise Http404("Unknown QR token.")
+
+    student = get_object_or_404(StudentProfile.objects.select_related("user", "parent"), pk=student_id)
+    user = request.user
+    is_owner = student.user_id == user.id or (student.parent is not None and student.parent.user_id == user.id)
+    if not (is_owner or user.role == UserRole.ADMIN or user.is_superuser):
+        return HttpResponseForbidden("You do not have permission to view this QR code.")
+
+    qr_payload_text = build_student_qr_payload(student)
+    etag = f'"{qr_payload_digest(qr_payload_text)}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render_qr_png(qr_payload_text), content_type="image/png")
+    response["ETag"] = etag
+    # The dashboard links with ?v=<digest>, so a new name or token always gets a new URL.
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+
+@query_budget(6)
 @role_required(UserRole.PARENT)
 def parent_dashboard(request):
     try:
@@ -319,24 +698,25 @@ def parent_dashboard(request):
         messages.error(request, "Parent profile missing. Contact admin.")
         return redirect("logout")
 
-    children = parent.children.select_related("user").all()
-    selected_child_id = request.GET.get("child")
-    selected_child = None
-
-    if selected_child_id:
-        selected_child = children.filter(id=selected_child_id).first()
-    if not selected_child and children:
+    # One query for the selector; the selected child is picked from the same list.
+    children = list(parent.children.select_related("user", "section__school_class"))
+    selected_child_id = request.GET.get("child", "")
+    selected_child = next((child for child in children if str(child.id) == selected_child_id), None)
+    if selected_child is None and children:
         selected_child = children[0]
 
-    attendance_records = selected_child.attendance_records.all()[:15] if selected_child else []
-    fee_records = selected_child.fee_records.all()[:10] if selected_child else []
+    attendance_page = _history_page(attendance_history_page, selected_child, request.GET.get("attendance_cursor"), 15)
+    fee_page = _history_page(fee_history_page, selected_child, request.GET.get("fee_cursor"), 10)
     notices = Notice.objects.filter(audience__in=[NoticeAudience.ALL, NoticeAudience.PARENT])[:10]
 
     context = {
         "children": children,
         "selected_child": selected_child,
-        "attendance_records": attendance_records,
-        "fee_records": fee_records,
+        "attendance_records": attendance_page.items,
+        "attendance_pager": _history_pager(request, "attendance_cursor", attendance_page),
+        "fee_records": fee_page.items,
+        "fee_pager": _history_pager(request, "fee_cursor", fee_page),
         "notices": notices,
+        **fragment_cache_context(),
     }
     return render(request, "dashboard/parent_dashboard.html", context)
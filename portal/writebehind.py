@@ -0,0 +1,257 @@
+"""Write-behind queue for Attendance inserts.
+
+Marks are appended to an fsynced journal segment and acknowledged straight
+away; a single writer thread per process then inserts them in group commits.
+Each process writes its own segments and holds an exclusive ``flock`` on
+them, so a segment that can be locked by somebody else belongs to a process
+that died before flushing it and is replayed on the next start. Replays are
+idempotent because existing (student, date) pairs are skipped.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+
+from .models import Attendance, StudentProfile, User
+from .summaries import adjust_attendance_summary
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+RETRY_DELAY = 1.0
+
+
+def _encode_record(attendance):
+    return {
+        "s": attendance.student_id,
+        "d": attendance.date.isoformat(),
+        "t": attendance.marked_at.isoformat(),
+        "m": attendance.method,
+        "b": attendance.marked_by_id,
+    }
+
+
+def _decode_record(record):
+    return Attendance(
+        student_id=record["s"],
+        date=date.fromisoformat(record["d"]),
+        marked_at=datetime.fromisoformat(record["t"]),
+        method=record["m"],
+        marked_by_id=record["b"],
+    )
+
+
+def write_attendance_records(rows):
+    """Insert unsaved Attendance rows, skipping (student, date) pairs that are already stored.
+
+    Rows for students or markers deleted in the meantime are dropped (or lose
+    their marker) instead of blocking the queue on a foreign key error.
+    """
+    unique_rows = {}
+    for attendance in rows:
+        unique_rows.setdefault((attendance.student_id, attendance.date), attendance)
+    if not unique_rows:
+        return 0
+
+    student_ids = {student_id for student_id, _ in unique_rows}
+    with transaction.atomic():
+        live_students = set(StudentProfile.objects.filter(id__in=student_ids).values_list("id", flat=True))
+        marker_ids = {attendance.marked_by_id for attendance in unique_rows.values()} - {None}
+        live_markers = set(User.objects.filter(id__in=marker_ids).values_list("id", flat=True))
+        stored = set(
+            Attendance.objects.filter(
+                student_id__in=student_ids, date__in={day for _, day in unique_rows}
+            ).values_list("student_id", "date")
+        )
+
+        new_rows = []
+        for key, attendance in unique_rows.items():
+            if key in stored or attendance.student_id not in live_students:
+                continue
+            if attendance.marked_by_id not in live_markers:
+                attendance.marked_by_id = None
+            new_rows.append(attendance)
+
+        try:
+            with transaction.atomic():
+                Attendance.objects.bulk_create(new_rows)
+                by_day = {}
+                for attendance in new_rows:
+                    by_day.setdefault(attendance.date, []).append(attendance)
+                for day, day_rows in by_day.items():
+                    adjust_attendance_summary(day, day_rows)
+        except IntegrityError:
+            # Another process inserted one of these pairs after our SELECT.
+            for attendance in new_rows:
+                Attendance.objects.get_or_create(
+                    student_id=attendance.student_id,
+                    date=attendance.date,
+                    defaults={
+                        "marked_at": attendance.marked_at,
+                        "method": attendance.method,
+                        "marked_by_id": attendance.marked_by_id,
+                    },
+                )
+    return len(new_rows)
+
+
+class JournalSegment:
+    def __init__(self, path, handle):
+        self.path = path
+        self.handle = handle
+
+    @classmethod
+    def create(cls, journal_dir):
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{os.getpid()}-{uuid.uuid4().hex}"
+        tmp_path = journal_dir / f"{name}.tmp"
+        handle = open(tmp_path, "ab")
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        # Only locked segments ever carry the .journal suffix that recovery looks for.
+        path = journal_dir / f"{name}{JOURNAL_SUFFIX}"
+        os.replace(tmp_path, path)
+        return cls(path, handle)
+
+    def append(self, records):
+        """Write ``records`` and fsync once for all of them."""
+        lines = (json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n" for record in records)
+        self.handle.write(b"".join(lines))
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+        self.handle.close()
+
+
+def _read_segment(path):
+    rows = []
+    with open(path, "rb") as handle:
+        for line in handle:
+            try:
+                rows.append(_decode_record(json.loads(line)))
+            except (ValueError, KeyError):
+                # A torn final line was never acknowledged to the scanner.
+                continue
+    return rows
+
+
+class AttendanceWriteBehind:
+    def __init__(self, journal_dir=None, commit_delay=0.005, max_batch=500, background=True):
+        self.journal_dir = journal_dir
+        self.commit_delay = commit_delay
+        self.max_batch = max_batch
+        self.background = background
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._segment = None
+        self._pending = []
+        self._inflight = []
+        self.flushed = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Forked workers inherit neither the writer thread nor the parent's pending marks.
+            if self.journal_dir is None:
+                self.journal_dir = settings.ATTENDANCE_JOURNAL_DIR
+            self._pending = []
+            self._inflight = []
+            self._segment = JournalSegment.create(self.journal_dir)
+            self._pid = os.getpid()
+        self.recover()
+        if self.background:
+            threading.Thread(target=self._run, name="attendance-write-behind", daemon=True).start()
+            atexit.register(self.flush)
+
+    def enqueue(self, attendance):
+        """Durably journal one mark; it reaches the Attendance table on the next group commit."""
+        self.enqueue_many([attendance])
+
+    def enqueue_many(self, attendances):
+        """Durably journal a batch of marks with a single fsync."""
+        self._ensure_started()
+        with self._lock:
+            self._segment.append([_encode_record(attendance) for attendance in attendances])
+            self._pending.extend(attendances)
+        self._wakeup.set()
+
+    def recover(self):
+        """Replay segments left behind by processes that died before flushing them."""
+        recovered = 0
+        journal_dir = self.journal_dir or settings.ATTENDANCE_JOURNAL_DIR
+        for path in sorted(journal_dir.glob(f"*{JOURNAL_SUFFIX}")):
+            try:
+                handle = open(path, "ab")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            segment = JournalSegment(path, handle)
+            rows = _read_segment(path)
+            recovered += write_attendance_records(rows)
+            segment.discard()
+            logger.info("Replayed %s attendance marks from %s", len(rows), path.name)
+        return recovered
+
+    def _take_batch(self):
+        with self._lock:
+            if not self._pending:
+                return
+            # Rotate so the flushed segment can be deleted as soon as its rows are committed.
+            self._inflight.append((self._pending, self._segment))
+            self._pending = []
+            self._segment = JournalSegment.create(self.journal_dir)
+
+    def flush(self):
+        """Commit everything journalled so far; returns False if the database was unavailable."""
+        if self._pid != os.getpid():
+            return True
+        with self._flush_lock:
+            self._take_batch()
+            close_old_connections()
+            while self._inflight:
+                rows, segment = self._inflight[0]
+                try:
+                    for start in range(0, len(rows), self.max_batch):
+                        write_attendance_records(rows[start : start + self.max_batch])
+                except DatabaseError:
+                    logger.exception("Attendance write-behind flush failed; will retry.")
+                    return False
+                self._inflight.pop(0)
+                segment.discard()
+                self.flushed += len(rows)
+        return True
+
+    def pending_count(self):
+        return len(self._pending) + sum(len(rows) for rows, _ in self._inflight)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Group commit window: marks arriving in the next few ms share one transaction.
+            time.sleep(self.commit_delay)
+            self._wakeup.clear()
+            if not self.flush():
+                time.sleep(RETRY_DELAY)
+                self._wakeup.set()
+
+
+attendance_writer = AttendanceWriteBehind()
@@ -2,6 +2,7 @@
 Django settings for schoolms project.
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,11 +18,13 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
-    "django.contrib.staticfiles",
+    # Ahead of staticfiles so its collectstatic (which checks vendored assets) takes precedence.
     "portal",
+    "django.contrib.staticfiles",
 ]
 
 MIDDLEWARE = [
+    "portal.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -35,7 +38,7 @@ ROOT_URLCONF = "schoolms.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "portal.templating.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -57,6 +60,18 @@ DATABASES = {
     }
 }
 
+# Production SQLite mode for several scanner devices writing at once: WAL lets readers
+# proceed during a write, IMMEDIATE transactions take the write lock up front so the
+# busy timeout applies instead of failing with "database is locked" mid-transaction.
+if os.environ.get("DJANGO_SQLITE_PRODUCTION") == "1":
+    DATABASES["default"]["OPTIONS"] = {
+        "timeout": 20,
+        "transaction_mode": "IMMEDIATE",
+        "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+    }
+    DATABASES["default"]["CONN_MAX_AGE"] = 600
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -72,6 +87,64 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# Hashed file names plus .gz/.br variants; .htaccess serves them with far-future cache headers.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "portal.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# "locmem" keeps a cache per worker process; "file" shares one under var/cache between all
+# Passenger workers. Cached content is keyed on version stamps (see portal.versions), so
+# neither backend serves data older than the last save.
+CACHE_BACKENDS = {
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "schoolms"},
+    "file": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": BASE_DIR / "var" / "cache"},
+}
+CACHES = {
+    "default": CACHE_BACKENDS[os.environ.get("DJANGO_CACHE_BACKEND", "locmem")],
+    # Always shared between workers, so a logout in one worker ends the session in all of them.
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        # Set DJANGO_SESSION_CACHE_DIR to keep sessions outside the app tree; .htaccess denies var/ either way.
+        "LOCATION": os.environ.get("DJANGO_SESSION_CACHE_DIR", BASE_DIR / "var" / "cache" / "sessions"),
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+
+# Sessions are read from the shared file cache and only fall back to the database on a miss,
+# so a logged-in request costs no session query.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+# The per-request user (with profile) comes from the identity cache (see portal.identity).
+AUTHENTICATION_BACKENDS = ["portal.identity.CachedModelBackend"]
+
+# Rendered student QR images, keyed by payload digest.
+QR_CACHE_DIR = BASE_DIR / "var" / "qr"
+# Keys for compact QR tokens by id, 0-255 (see portal.qr). New codes are signed with
+# QR_ACTIVE_KEY_ID; to rotate, add a key under a new id and make it active, and keep the
+# old one listed until every card printed with it has been replaced.
+QR_SIGNING_KEYS = {1: SECRET_KEY}
+QR_ACTIVE_KEY_ID = 1
+# Printable QR ID-card sheets (see portal.cards).
+QR_CARD_DIR = BASE_DIR / "var" / "qr_cards"
+# Cross-process cache invalidation stamps (see portal.versions).
+VERSION_STAMP_DIR = BASE_DIR / "var" / "versions"
+# Academic years start on the 1st of this month; closed years can be moved out of the live
+# Attendance table with `manage.py archive_attendance` (see portal.archive).
+ACADEMIC_YEAR_START_MONTH = 4
+# Write-behind queue for attendance marks (see portal.writebehind).
+ATTENDANCE_WRITE_BEHIND = os.environ.get("DJANGO_ATTENDANCE_WRITE_BEHIND") == "1"
+ATTENDANCE_JOURNAL_DIR = BASE_DIR / "var" / "attendance_journal"
+# Parent notification outbox (see portal.notifications): "console", "file" (JSON lines at
+# NOTIFICATION_FILE_PATH), "email" (the EMAIL_* settings below) or a dotted path to a transport.
+PARENT_NOTIFICATION_TRANSPORT = os.environ.get("DJANGO_NOTIFICATION_TRANSPORT", "console")
+NOTIFICATION_FILE_PATH = BASE_DIR / "var" / "notifications" / "outbox.jsonl"
+EMAIL_HOST = os.environ.get("DJANGO_EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("DJANGO_EMAIL_PORT", "25"))
+DEFAULT_FROM_EMAIL = os.environ.get("DJANGO_DEFAULT_FROM_EMAIL", "webmaster@localhost")
+
+# Runs the tests with caches, QR images and journals in a temporary directory instead of var/.
+TEST_RUNNER = "portal.testing.IsolatedDiscoverRunner"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "portal.User"
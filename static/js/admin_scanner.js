@@ -8,11 +8,29 @@
     return;
   }
 
-  const endpoint = window.scanEndpoint;
+  const endpoint = window.scanBatchEndpoint;
+  const feedEndpoint = window.attendanceFeedEndpoint;
+  const rosterEndpoint = window.scannerRosterEndpoint;
+  const feedBody = document.getElementById("attendance-today-body");
+  const feedIntervalMs = 1000;
+  const flushDelayMs = 300;
+  const retryDelayMs = 2000;
+  const maxBatchSize = 50;
+  const rosterRefreshMs = 30000;
   let scanner = null;
   let scanning = false;
   let lastPayload = "";
   let lastHitAt = 0;
+  let pendingScans = [];
+  let flushTimer = null;
+  let flushing = false;
+  let feedCursor = window.attendanceFeedCursor || 0;
+  let feedTimer = null;
+  let feedInFlight = false;
+  let roster = null;
+  let rosterDb = null;
+  let rosterTimer = null;
+  let rosterSyncing = false;
 
   function getCsrfToken() {
     const cookies = document.cookie ? document.cookie.split(";") : [];
@@ -30,7 +48,204 @@
     statusEl.className = "scan-status" + (type ? " " + type : "");
   }
 
-  async function submitQrData(decodedText) {
+  async function readJson(response) {
+    // Login redirects, CSRF failures and proxy error pages come back as HTML; only parse real JSON.
+    const type = response.headers.get("Content-Type") || "";
+    if (response.redirected || !type.includes("application/json")) {
+      return null;
+    }
+    try {
+      return await response.json();
+    } catch (error) {
+      return null;
+    }
+  }
+
+  function isRefused(response, data) {
+    // Resending cannot fix a 4xx or a bounce to the login page, so these are not retried.
+    return (response.status >= 400 && response.status < 500) || (response.ok && !data);
+  }
+
+  function openRosterDb() {
+    if (!rosterDb) {
+      rosterDb = new Promise(function (resolve, reject) {
+        if (!window.indexedDB) {
+          reject(new Error("IndexedDB is not available."));
+          return;
+        }
+        const request = window.indexedDB.open("schoolms-scanner", 1);
+        request.onupgradeneeded = function () {
+          request.result.createObjectStore("roster");
+        };
+        request.onsuccess = function () {
+          resolve(request.result);
+        };
+        request.onerror = function () {
+          reject(request.error);
+        };
+      });
+    }
+    return rosterDb;
+  }
+
+  function rosterStore(mode, action) {
+    return openRosterDb().then(function (db) {
+      return new Promise(function (resolve, reject) {
+        const request = action(db.transaction("roster", mode).objectStore("roster"));
+        request.onsuccess = function () {
+          resolve(request.result);
+        };
+        request.onerror = function () {
+          reject(request.error);
+        };
+      });
+    });
+  }
+
+  function loadRoster(data) {
+    const index = {};
+    data.fields.forEach(function (name, position) {
+      index[name] = position;
+    });
+    const students = new Map();
+    for (const row of data.students) {
+      students.set(row[index.id], row);
+    }
+    roster = { version: data.version, cursor: data.cursor, fields: data.fields, index: index, students: students };
+  }
+
+  function saveRoster() {
+    const record = {
+      version: roster.version,
+      cursor: roster.cursor,
+      fields: roster.fields,
+      students: Array.from(roster.students.values()),
+    };
+    rosterStore("readwrite", function (store) {
+      return store.put(record, "roster");
+    }).catch(function () {
+      // Without IndexedDB the roster is simply refetched on the next page load.
+    });
+  }
+
+  function markPresent(studentId) {
+    const row = roster && roster.students.get(studentId);
+    if (row) {
+      row[roster.index.present] = 1;
+    }
+  }
+
+  async function syncRoster() {
+    if (!rosterEndpoint || rosterSyncing) {
+      return;
+    }
+    clearTimeout(rosterTimer);
+    rosterTimer = null;
+
+    rosterSyncing = true;
+    let stopped = false;
+    try {
+      if (!roster) {
+        const cached = await rosterStore("readonly", function (store) {
+          return store.get("roster");
+        }).catch(function () {
+          return null;
+        });
+        if (cached) {
+          loadRoster(cached);
+        }
+      }
+
+      let url = rosterEndpoint;
+      if (roster) {
+        url += "?since=" + encodeURIComponent(roster.version) + "&after=" + roster.cursor;
+      }
+      const response = await fetch(url, { headers: { Accept: "application/json" } });
+      const data = await readJson(response);
+      if (isRefused(response, data)) {
+        // Signed out: keep the stored roster for offline feedback, but stop asking until the page is shown again.
+        stopped = true;
+      } else if (response.ok && data.ok) {
+        if (data.delta) {
+          data.present.forEach(markPresent);
+          roster.cursor = data.cursor;
+        } else {
+          loadRoster(data);
+        }
+        saveRoster();
+      }
+    } catch (error) {
+      // The scanner still works without a roster; feedback just waits for the server.
+    } finally {
+      rosterSyncing = false;
+    }
+
+    if (!stopped && !document.hidden) {
+      rosterTimer = setTimeout(syncRoster, rosterRefreshMs);
+    }
+  }
+
+  function base32Bytes(text, count) {
+    const alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567";
+    const bytes = [];
+    let bits = 0;
+    let value = 0;
+    for (const char of text) {
+      const digit = alphabet.indexOf(char);
+      if (digit < 0) {
+        return null;
+      }
+      value = ((value << 5) | digit) & 0xffff;
+      bits += 5;
+      if (bits >= 8) {
+        bits -= 8;
+        bytes.push((value >>> bits) & 0xff);
+        if (bytes.length === count) {
+          break;
+        }
+      }
+    }
+    return bytes;
+  }
+
+  function studentIdFromQr(decodedText) {
+    let token = decodedText.trim();
+    if (token.startsWith("SM")) {
+      // Compact token: version, key id, then the student id as a big-endian uint32.
+      const bytes = base32Bytes(token.slice(2), 6);
+      if (!bytes || bytes.length < 6) {
+        return null;
+      }
+      return bytes[2] * 0x1000000 + (bytes[3] << 16) + (bytes[4] << 8) + bytes[5];
+    }
+    try {
+      const payload = JSON.parse(token);
+      if (payload && payload.token) {
+        token = payload.token;
+      }
+    } catch (error) {
+      // Bare tokens are not JSON.
+    }
+    const studentId = parseInt(token.split(":")[0], 10);
+    return isNaN(studentId) ? null : studentId;
+  }
+
+  function showLocalFeedback(decodedText) {
+    // The signature is only checked by the server; its answer replaces this message.
+    const row = roster && roster.students.get(studentIdFromQr(decodedText));
+    if (!row) {
+      return;
+    }
+    const index = roster.index;
+    const label = row[index.name] + " (" + row[index.admission_no] + ", class " + row[index.class_name] + ")";
+    if (row[index.present]) {
+      setStatus("Already here: " + label, "warning");
+    } else {
+      setStatus("Scanned " + label + ". Saving...", "success");
+    }
+  }
+
+  function queueQrData(decodedText) {
     const now = Date.now();
     if (decodedText === lastPayload && now - lastHitAt < 3500) {
       return;
@@ -38,6 +253,44 @@
     lastPayload = decodedText;
     lastHitAt = now;
 
+    showLocalFeedback(decodedText);
+    pendingScans.push({ qr_data: decodedText, scanned_at: now });
+    if (pendingScans.length >= maxBatchSize) {
+      flushScans();
+    } else if (!flushTimer) {
+      flushTimer = setTimeout(flushScans, flushDelayMs);
+    }
+  }
+
+  function showResults(results) {
+    if (results.length === 1) {
+      const item = results[0];
+      const suffix = item.student ? " (" + item.student + ")" : "";
+      const type = item.status === "marked" ? "success" : item.status === "already_marked" ? "warning" : "error";
+      setStatus(item.message + suffix, type);
+      return;
+    }
+
+    const counts = { marked: 0, already_marked: 0, invalid: 0 };
+    for (const item of results) {
+      counts[item.status] = (counts[item.status] || 0) + 1;
+    }
+    setStatus(
+      results.length + " scans: " + counts.marked + " marked, " + counts.already_marked +
+        " already marked, " + counts.invalid + " invalid.",
+      counts.invalid ? "warning" : "success"
+    );
+  }
+
+  async function flushScans() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    if (flushing || !pendingScans.length) {
+      return;
+    }
+
+    const batch = pendingScans.splice(0, maxBatchSize);
+    flushing = true;
     try {
       const response = await fetch(endpoint, {
         method: "POST",
@@ -45,26 +298,103 @@
           "Content-Type": "application/json",
           "X-CSRFToken": getCsrfToken(),
         },
-        body: JSON.stringify({ qr_data: decodedText }),
+        body: JSON.stringify({ scans: batch }),
       });
 
-      const data = await response.json();
-      if (!response.ok || !data.ok) {
-        setStatus(data.message || "Could not mark attendance.", "error");
+      const data = await readJson(response);
+      if (isRefused(response, data)) {
+        setStatus(
+          (data && data.message) ||
+            batch.length + " scan(s) were not saved: the session has expired or lacks permission. " +
+              "Sign in again and rescan.",
+          "error"
+        );
         return;
       }
+      if (!response.ok || !data || !data.ok) {
+        throw new Error("Server error " + response.status);
+      }
 
-      if (data.status === "marked") {
-        setStatus(data.message + " (" + data.student + ")", "success");
-      } else {
-        setStatus(data.message + " (" + data.student + ")", "warning");
+      data.results.forEach(function (item, position) {
+        if (item.status === "marked" || item.status === "already_marked") {
+          markPresent(studentIdFromQr(batch[position].qr_data));
+        }
+      });
+      showResults(data.results);
+      if (data.results.some(function (item) { return item.status === "marked"; })) {
+        pollFeed();
       }
+    } catch (error) {
+      // Network failures and 5xx pages are transient: keep the scans (with their original
+      // timestamps) and retry shortly.
+      pendingScans.unshift.apply(pendingScans, batch);
+      setStatus("Could not reach the server while sending QR data. Retrying...", "error");
+      flushTimer = setTimeout(flushScans, retryDelayMs);
+    } finally {
+      flushing = false;
+    }
+
+    if (pendingScans.length && !flushTimer) {
+      flushTimer = setTimeout(flushScans, flushDelayMs);
+    }
+  }
+
+  function appendFeedRows(rows) {
+    const emptyRow = document.getElementById("attendance-empty-row");
+    if (emptyRow && rows.length) {
+      emptyRow.remove();
+    }
+
+    for (const row of rows) {
+      if (feedBody.querySelector('tr[data-id="' + row.id + '"]')) {
+        continue;
+      }
+      const tr = document.createElement("tr");
+      tr.dataset.id = row.id;
+      for (const text of [row.student + " - " + row.name, row.time, row.method]) {
+        const td = document.createElement("td");
+        td.textContent = text;
+        tr.appendChild(td);
+      }
+      feedBody.insertBefore(tr, feedBody.firstChild);
+    }
+  }
+
+  async function pollFeed() {
+    if (feedInFlight || !feedEndpoint || !feedBody) {
+      return;
+    }
+    clearTimeout(feedTimer);
+    feedTimer = null;
 
-      setTimeout(function () {
-        window.location.reload();
-      }, 900);
+    feedInFlight = true;
+    let stopped = false;
+    try {
+      const response = await fetch(feedEndpoint + "?after=" + feedCursor, {
+        headers: { Accept: "application/json" },
+      });
+      const data = await readJson(response);
+      if (isRefused(response, data)) {
+        // Signed out or no longer an admin: polling again would only fetch the same refusal.
+        stopped = true;
+        setStatus("The live feed stopped: sign in again to keep it updating.", "warning");
+      } else if (response.ok && data.ok) {
+        if (data.date !== window.attendanceDate) {
+          // New school day: the page-level table no longer applies.
+          window.location.reload();
+          return;
+        }
+        appendFeedRows(data.rows);
+        feedCursor = data.cursor;
+      }
     } catch (error) {
-      setStatus("Network error while sending QR data.", "error");
+      // Transient network errors are retried on the next tick.
+    } finally {
+      feedInFlight = false;
+    }
+
+    if (!stopped && !document.hidden) {
+      feedTimer = setTimeout(pollFeed, feedIntervalMs);
     }
   }
 
@@ -83,7 +413,7 @@
       await scanner.start(
         { facingMode: "environment" },
         { fps: 10, qrbox: { width: 250, height: 250 } },
-        submitQrData,
+        queueQrData,
         function () {}
       );
       scanning = true;
@@ -109,7 +439,19 @@
     }
   }
 
+  document.addEventListener("visibilitychange", function () {
+    if (!document.hidden) {
+      pollFeed();
+      syncRoster();
+    }
+  });
+
   startBtn.addEventListener("click", startScanner);
   stopBtn.addEventListener("click", stopScanner);
-  window.addEventListener("beforeunload", stopScanner);
+  window.addEventListener("beforeunload", function () {
+    flushScans();
+    stopScanner();
+  });
+  pollFeed();
+  syncRoster();
 })();
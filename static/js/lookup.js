@@ -0,0 +1,81 @@
+(function () {
+  const debounceMs = 200;
+
+  function setupLookup(container) {
+    const url = container.dataset.lookupUrl;
+    const hidden = container.querySelector('input[type="hidden"]');
+    const input = container.querySelector(".lookup-input");
+    const list = container.querySelector(".lookup-results");
+    let timer = null;
+    let requestId = 0;
+    let currentResults = [];
+
+    function close() {
+      currentResults = [];
+      list.hidden = true;
+      list.innerHTML = "";
+    }
+
+    function choose(item) {
+      hidden.value = item.id;
+      input.value = item.label;
+      close();
+    }
+
+    function show(results) {
+      currentResults = results;
+      list.innerHTML = "";
+      for (const item of results) {
+        const li = document.createElement("li");
+        li.textContent = item.label;
+        li.addEventListener("mousedown", function (event) {
+          event.preventDefault();
+          choose(item);
+        });
+        list.appendChild(li);
+      }
+      if (!results.length) {
+        const li = document.createElement("li");
+        li.textContent = "No matches.";
+        list.appendChild(li);
+      }
+      list.hidden = false;
+    }
+
+    async function search() {
+      const query = input.value.trim();
+      if (!query) {
+        close();
+        return;
+      }
+      const current = ++requestId;
+      try {
+        const response = await fetch(url + "?q=" + encodeURIComponent(query), {
+          headers: { Accept: "application/json" },
+        });
+        const data = await response.json();
+        // Ignore responses that arrive after a newer keystroke.
+        if (current === requestId && data.ok) {
+          show(data.results);
+        }
+      } catch (error) {
+        close();
+      }
+    }
+
+    input.addEventListener("input", function () {
+      hidden.value = "";
+      clearTimeout(timer);
+      timer = setTimeout(search, debounceMs);
+    });
+    input.addEventListener("blur", close);
+    input.addEventListener("keydown", function (event) {
+      if (event.key === "Enter" && currentResults.length) {
+        event.preventDefault();
+        choose(currentResults[0]);
+      }
+    });
+  }
+
+  document.querySelectorAll(".lookup[data-lookup-url]").forEach(setupLookup);
+})();